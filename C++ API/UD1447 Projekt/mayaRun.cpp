@@ -1,6 +1,9 @@
 
 #include "maya_includes.h"
 #include <maya/MTimer.h>
+#include <maya/MAnimUtil.h>
+#include <maya/MTimeArray.h>
+#include <maya/MDoubleArray.h>
 #include <iostream>
 #include <algorithm>
 #include <vector>
@@ -13,6 +16,10 @@ using namespace std;
 std::vector<MObject> sourceList;
 std::vector<MObject> targetList;
 
+// Parent index of every joint in the lists, -1 for the root
+std::vector<int> sourceParents;
+std::vector<int> targetParents;
+
 MMatrixArray sourceBindPoseRotation; 
 MMatrixArray  targetBindPoseRotation;
 
@@ -22,14 +29,34 @@ MMatrixArray  translatedRotation;
 MMatrixArray  sourceParentMatrices;
 MMatrixArray  targetParentMatrices;
 
-void loadList(MObject node, bool source)
+// Frame-invariant products on each side of the animated rotation
+MMatrixArray  sourceLeftMatrices;
+MMatrixArray  sourceRightMatrices;
+MMatrixArray  targetLeftMatrices;
+MMatrixArray  targetRightMatrices;
+
+// Keys for the whole clip, pushed into the anim curves in one call per channel
+MTimeArray keyTimes;
+std::vector<MDoubleArray> targetRotationKeys;
+std::vector<MDoubleArray> rootTranslationKeys;
+
+void loadList(MObject node, bool source, int parent = -1)
 {
 	MFnIkJoint joint(node);
+	int current;
 
 	if (source)
+	{
+		current = (int)sourceList.size();
 		sourceList.push_back(node);
+		sourceParents.push_back(parent);
+	}
 	else
+	{
+		current = (int)targetList.size();
 		targetList.push_back(node);
+		targetParents.push_back(parent);
+	}
 
 	if (joint.childCount() > 0)
 	{
@@ -40,7 +67,7 @@ void loadList(MObject node, bool source)
 			MFnIkJoint joint(joint.child(i));
 			if (child.hasFn(MFn::kJoint))
 			{
-				loadList(child, source);
+				loadList(child, source, current);
 			}
 		}
 	}
@@ -56,32 +83,82 @@ void allocateMemory()
 	targetParentMatrices.setLength(sourceList.size());
 	worldRotation.setLength(sourceList.size());
 	translatedRotation.setLength(sourceList.size());
+	sourceLeftMatrices.setLength(sourceList.size());
+	sourceRightMatrices.setLength(sourceList.size());
+	targetLeftMatrices.setLength(sourceList.size());
+	targetRightMatrices.setLength(sourceList.size());
+
+	// Three rotation channels per target joint, the root included
+	targetRotationKeys.assign(3 * sourceList.size(), MDoubleArray());
+	rootTranslationKeys.assign(3, MDoubleArray());
+	keyTimes.clear();
 }
 
-MMatrix getParentMatrix(MObject node, MMatrix parentMatrix)
+MEulerRotation::RotationOrder eulerOrder(MFnIkJoint& joint)
 {
-	MFnIkJoint joint(node);
-	if (joint.parent(0).hasFn(MFn::kJoint))
+	// MTransformationMatrix orders start with kInvalid, MEulerRotation orders do not
+	return (MEulerRotation::RotationOrder)(joint.rotationOrder() - 1);
+}
+
+void writeCurve(MObject node, const char* attribute, MDoubleArray& values)
+{
+	MStatus status;
+	MFnDependencyNode dependNode(node);
+	MPlug plug = dependNode.findPlug(attribute, true, &status);
+
+	// Reuse the curve already driving the attribute, or create one
+	MObjectArray curves;
+	MFnAnimCurve animCurve;
+
+	if (MAnimUtil::findAnimation(plug, curves))
+		animCurve.setObject(curves[0]);
+	else
+		animCurve.create(plug, NULL, &status);
+
+	animCurve.addKeys(&keyTimes, &values, MFnAnimCurve::kTangentGlobal, MFnAnimCurve::kTangentGlobal, false);
+}
+
+void writeKeys(std::vector<MObject> skeleton)
+{
+	const char* rotateAttributes[3] = { "rotateX", "rotateY", "rotateZ" };
+	const char* translateAttributes[3] = { "translateX", "translateY", "translateZ" };
+
+	for (int i = 0; i < skeleton.size(); i++)
 	{
-		double x, y, z, w;
-		MQuaternion orientation;
-		MMatrix keyframeOrientation;
-		MMatrix keyframeRotation;
+		for (int c = 0; c < 3; c++)
+			writeCurve(skeleton[i], rotateAttributes[c], targetRotationKeys[3 * i + c]);
+	}
+
+	for (int c = 0; c < 3; c++)
+		writeCurve(skeleton[0], translateAttributes[c], rootTranslationKeys[c]);
+}
+
+void loadParentMatrices(std::vector<MObject> skeleton, std::vector<int> parents, MMatrixArray& parentMatrices)
+{
+	double x, y, z, w;
+	MQuaternion orientation;
+	MMatrixArray worldMatrices;
+	worldMatrices.setLength(skeleton.size());
+
+	// One forward pass, every parent comes before its children in the list
+	for (int i = 0; i < skeleton.size(); i++)
+	{
+		MFnIkJoint joint(skeleton[i]);
+		MMatrix parentMatrix;
 
-		MFnIkJoint parent(joint.parent(0));
-		parentMatrix = getParentMatrix(joint.parent(0), parentMatrix);
+		if (parents[i] >= 0)
+			parentMatrix = worldMatrices[parents[i]];
 
-		parent.getRotationQuaternion(x, y, z, w);
+		joint.getRotationQuaternion(x, y, z, w);
 		MQuaternion rotation(x, y, z, w);
-		parent.getOrientation(orientation);
+		joint.getOrientation(orientation);
 
-		keyframeOrientation = orientation.asMatrix();
-		keyframeRotation = rotation.asMatrix();
+		worldMatrices.set((rotation.asMatrix() * orientation.asMatrix()) * parentMatrix, i);
 
-		parentMatrix = (keyframeRotation * keyframeOrientation) * parentMatrix;
+		// The root is not part of the matrix arrays
+		if (i > 0)
+			parentMatrices.set(parentMatrix, i - 1);
 	}
-	
-	return parentMatrix;
 }
 
 void calculateSourceSkeleton(std::vector<MObject> skeleton, int keyframe)
@@ -90,7 +167,6 @@ void calculateSourceSkeleton(std::vector<MObject> skeleton, int keyframe)
 	MQuaternion orientation;
 	MMatrix keyframeOrientation;
 	MMatrix keyframeRotation;
-	MMatrix identity;
 	MStatus status;
 
 	for (int i = 0; i < skeleton.size(); i++)
@@ -107,20 +183,20 @@ void calculateSourceSkeleton(std::vector<MObject> skeleton, int keyframe)
 				MQuaternion bindPoserotation(x, y, z, w);
 				sourceBindPoseRotation.set(bindPoserotation.asMatrix(), i-1);
 
-				identity.setToIdentity();
-				sourceParentMatrices.set(getParentMatrix(skeleton[i], identity), i-1);
+				// Rotations are orthonormal, so the transpose is the inverse
+				joint.getOrientation(orientation);
+				keyframeOrientation = orientation.asMatrix();
+
+				sourceLeftMatrices.set(keyframeOrientation.transpose() * sourceParentMatrices[i - 1].transpose() * sourceBindPoseRotation[i - 1].transpose(), i - 1);
+				sourceRightMatrices.set(sourceParentMatrices[i - 1] * keyframeOrientation, i - 1);
 			}
 			
 			joint.getRotationQuaternion(x, y, z, w);
 			MQuaternion rotation(x, y, z, w);
-			joint.getOrientation(orientation);
 
-			keyframeOrientation = orientation.asMatrix();
 			keyframeRotation = rotation.asMatrix();
 
-			MMatrix isolatedRotation = sourceBindPoseRotation[i - 1].inverse() * keyframeRotation;
-
-			worldRotation.append(keyframeOrientation.inverse() * sourceParentMatrices[i - 1].inverse() * isolatedRotation * sourceParentMatrices[i - 1] * keyframeOrientation);
+			worldRotation.append(sourceLeftMatrices[i - 1] * keyframeRotation * sourceRightMatrices[i - 1]);
 		}
 	}
 }
@@ -131,7 +207,6 @@ void calculateTargetSkeleton(std::vector<MObject> skeleton, int keyframe)
 	MQuaternion orientation;
 	MMatrix keyframeOrientation;
 	MMatrix keyframeRotation;
-	MMatrix identity;
 	MStatus status;
 
 	for (int i = 0; i < skeleton.size(); i++)
@@ -146,29 +221,21 @@ void calculateTargetSkeleton(std::vector<MObject> skeleton, int keyframe)
 				MQuaternion bindPoserotation(x, y, z, w);
 				targetBindPoseRotation.set(bindPoserotation.asMatrix(), i-1);
 
-				identity.setToIdentity();
-				targetParentMatrices.set(getParentMatrix(skeleton[i], identity), i-1);
-			}
-
-			joint.getRotationQuaternion(x, y, z, w);
-			MQuaternion rotation(x, y, z, w);
-			joint.getOrientation(orientation);
-
-			keyframeOrientation = orientation.asMatrix();
-			keyframeRotation = rotation.asMatrix();
+				joint.getOrientation(orientation);
+				keyframeOrientation = orientation.asMatrix();
 
-			MMatrix b = (keyframeOrientation * targetParentMatrices[i - 1] * worldRotation[i - 1] * targetParentMatrices[i - 1].inverse() * keyframeOrientation.inverse());
-			MMatrix c = targetBindPoseRotation[i - 1] * b;
-
-			MQuaternion quat; quat = c;
+				targetLeftMatrices.set(targetBindPoseRotation[i - 1] * keyframeOrientation * targetParentMatrices[i - 1], i - 1);
+				targetRightMatrices.set(targetParentMatrices[i - 1].transpose() * keyframeOrientation.transpose(), i - 1);
+			}
 
-			double dest[4];
-			quat.get(dest);
+			MMatrix c = targetLeftMatrices[i - 1] * worldRotation[i - 1] * targetRightMatrices[i - 1];
 
-			joint.setRotationQuaternion(dest[0], dest[1], dest[2], dest[3]);
+			// Collect the key, the curves are written after the last frame
+			MEulerRotation euler = MEulerRotation::decompose(c, eulerOrder(joint));
 
-			MGlobal::select(skeleton[i], MGlobal::ListAdjustment::kReplaceList);
-			MGlobal::executeCommand("setKeyframe");
+			targetRotationKeys[3 * i].append(euler.x);
+			targetRotationKeys[3 * i + 1].append(euler.y);
+			targetRotationKeys[3 * i + 2].append(euler.z);
 		}
 	}
 }
@@ -205,6 +272,10 @@ void start()
 	// Load target skeleton
 	loadList(targetNode, false);
 
+	MGlobal::viewFrame(0);
+	loadParentMatrices(sourceList, sourceParents, sourceParentMatrices);
+	loadParentMatrices(targetList, targetParents, targetParentMatrices);
+
 	MItDependencyGraph dgIter(sourceNode, MFn::kAnimCurve, MItDependencyGraph::kUpstream, MItDependencyGraph::kBreadthFirst, MItDependencyGraph::kNodeLevel, &status);
 
 	if (status)
@@ -244,21 +315,30 @@ void start()
 		keyframeOrientation = orientation.asMatrix();
 		keyframeRotation = rotation.asMatrix();
 
-		double rot[4];
-		rotation.get(rot);
+		keyTimes.append(MTime((double)i, MTime::uiUnit()));
 
 		calculateSourceSkeleton(sourceList, i);
 		calculateTargetSkeleton(targetList, i);
 
+		// Target root keys
 		MFnIkJoint targetRoot(targetList[0]);
-		targetRoot.setTranslation(translation, MSpace::kTransform);
-		targetRoot.setRotateOrientation(orientation, MSpace::kTransform, true);
-		targetRoot.setRotationQuaternion(rot[0], rot[1], rot[2], rot[3]);
+		MEulerRotation rootEuler = rotation.asEulerRotation().reorder(eulerOrder(targetRoot));
 
-		MGlobal::select(targetNode, MGlobal::ListAdjustment::kReplaceList);
-		MGlobal::executeCommand("setKeyframe");
+		targetRotationKeys[0].append(rootEuler.x);
+		targetRotationKeys[1].append(rootEuler.y);
+		targetRotationKeys[2].append(rootEuler.z);
+
+		rootTranslationKeys[0].append(translation.x);
+		rootTranslationKeys[1].append(translation.y);
+		rootTranslationKeys[2].append(translation.z);
+
+		if (i == 0)
+			targetRoot.setRotateOrientation(orientation, MSpace::kTransform, true);
 	}
 
+	// Write the whole clip one channel at a time, without changing the time
+	writeKeys(targetList);
+
 	myTimer.endTimer();
 	float time = myTimer.elapsedTime();
 
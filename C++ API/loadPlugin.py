@@ -1,29 +1,25 @@
-import sys
 import os
-import socket
+import sys
+
+# The repository root, so TransferCore imports without setting PYTHONPATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-s.connect(('127.0.0.1', 1234))
+from TransferCore import backends
+from TransferCore import commandPort
 
 """ NOT WORKING WITH VS2017 and Maya 2019 in H470
 # ask Maya for its PID :) 
 """
 
-s.send(b'getpid\n')
-answer = s.recv(1024)
-answer = answer[0:answer.find(b"\n")]
+pid, = commandPort.execute(['getpid'])
 
 # attach maya process (dialog pops up)
-os.system("vsjitdebugger -p " + str(answer))
+os.system("vsjitdebugger -p " + pid)
 print("K")
-# new file
-s.send(b"file -f -new\n")
-answer = s.recv(1024)
-
-
-# load plugin
-#s.send(b'loadPlugin("E:\C++ projekt\Animation transfer\Kandidatarbete\x64\Debug\MayaAPI.mll")\n')
-s.send(b'loadPlugin("C:\ProgramFiles\Autodesk\Maya2022\bin\MayaAPI.mll")\n')
 
-# close socket with Maya
-s.close()
\ No newline at end of file
+# new file and load plugin, sent together and answered in order
+#plugin = "E:/C++ projekt/Animation transfer/Kandidatarbete/x64/Debug/MayaAPI.mll"
+plugin = backends.findPlugin()
+if plugin is None:
+    raise RuntimeError(backends.registry['cpp'].missing())
+commandPort.execute([commandPort.newScene(), commandPort.loadPlugin(plugin)])
@@ -1,5 +1,9 @@
-import socket
-s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-s.connect(('127.0.0.1', 1234))
-s.send(b'unloadPlugin MayaAPI\n')
-s.close()
\ No newline at end of file
+import os
+import sys
+
+# The repository root, so TransferCore imports without setting PYTHONPATH
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from TransferCore import commandPort
+
+commandPort.execute([commandPort.unloadPlugin('MayaAPI')])
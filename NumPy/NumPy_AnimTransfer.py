@@ -1,150 +1,71 @@
-import maya.cmds as cmds
-import pymel.core as pm
-import pymel.core.datatypes as dt
-import numpy as np
-
-# Root joints for source and target
-sRoot = pm.ls(sl=True, type='joint')[0]
-tRoot = pm.ls(sl=True, type='joint')[1]
-
-size = np.intc(len(pm.ls(type = 'joint')) / 2)
-
-# Source and target lists
-sourceJnts = [pm.nodetypes.Joint] * size
-targetJnts = [pm.nodetypes.Joint] * size
-
-# Animationlength
-animationLength = (pm.keyframe(sRoot, q=True, kc=True)) / 10
-animLength = np.intc(animationLength)
-
-# Source and target rotation/orientation
-sBindposeRot = np.zeros((size, 4, 4), dtype=np.float32)
-tBindposeRot = np.zeros((size, 4, 4), dtype=np.float32)
-
-# Different space matrices
-worldRot = np.zeros((size, 4, 4), dtype=np.float32)
-
-# Parent matrices
-sParentMat = np.zeros((size, 4, 4), dtype=np.float32)
-tParentMat = np.zeros((size, 4, 4), dtype=np.float32)
-
-index = 0
-def loadList(node, string):
-    global index
-    
-    if string == "source":
-        sourceJnts[index] = node 
-        index += 1       
-        
-    if string == "target":
-        targetJnts[index] = node
-        index += 1      
-             
-    if node.numChildren() > 0:    
-        for child in node.getChildren():
-            loadList(child, string)  
-            
-    if index == size:
-        index = 0   
-
-
-def loadSource(node, keys):
-    for i, joint in enumerate(node):
-        if i > 0:
-            if keys == 0:                
-                sBindposeRot[i-1] = np.matrix(joint.getRotation().asMatrix())                
-                sParentMat[i-1] = getParentsMatrix(joint, np.identity(4))                
-            
-            keyRot = np.matrix(joint.getRotation().asMatrix())
-            keyOrient = np.matrix(joint.getOrientation().asMatrix())
-            
-            #Isolate rotation
-            sBindInv = np.linalg.inv(sBindposeRot[i-1])
-            isolatedRotation = np.matmul(sBindInv,keyRot)
-            
-            # World rotation
-            keyOrientInv = np.linalg.inv(keyOrient)
-            sParentInv = np.linalg.inv(sParentMat[i-1])
-            
-            f1 = np.matmul(keyOrientInv, sParentInv)
-            f2 = np.matmul(isolatedRotation, sParentMat[i-1])            
-            
-            worldRot[i-1] = np.matmul(np.matmul(f1, f2),keyOrient)
-            
-
-def loadTarget(node, keys):
-    for i, joint in enumerate(node):
-        if i > 0:   
-            if keys == 0:                
-                tBindposeRot[i-1] = np.matrix(joint.getRotation().asMatrix())                
-                tParentMat[i-1] = getParentsMatrix(joint, np.identity(4))
-                 
-            keyOrient = np.matrix(joint.getOrientation().asMatrix())
-                        
-            # Calculate the rotation from the source relative to the target
-            tParentMatInv = np.linalg.inv(tParentMat[i-1])
-            keyOrientInv = np.linalg.inv(keyOrient)
-            
-            f1 = np.matmul(np.matmul(np.matmul(keyOrient, tParentMat[i-1]), np.matmul(worldRot[i-1], tParentMatInv)), keyOrientInv)
-            
-            # Set the rotation and keyframe
-            joint.setRotation(dt.degrees(dt.EulerRotation(dt.Matrix(np.matmul(tBindposeRot[i-1], f1).tolist()))))
-            pm.setKeyframe(joint)
-            
-            
-def getParentsMatrix(child, parentMatrix): 
-    # If the parent is a joint, we calculates the matrix, then check if their is another parent
-    if type(child.getParent()) == pm.nodetypes.Joint:
-        parentMatrix = getParentsMatrix(child.getParent(), parentMatrix)
-                
-        jointParentRotation = np.matrix(child.getParent().getRotation().asMatrix())               
-        jointParentOrient = np.matrix(child.getParent().getOrientation().asMatrix()) 
-                
-        parentMatrix = np.matmul((jointParentRotation * jointParentOrient), parentMatrix)
-  
-    return parentMatrix                            
-    
-
-def transferData():
-        
-    loadList(sRoot, "source")
-    loadList(tRoot, "target")
-       
-    for keys in range(np.intc(animLength)):
-        cmds.currentTime(keys)         
-        
-        loadSource(sourceJnts, keys)
-        loadTarget(targetJnts, keys)
-        
-        tRoot.setOrientation(np.array(sRoot.getOrientation()))
-        tRoot.setRotation(np.array(sRoot.getRotation()))
-        tRoot.setTranslation(np.array(sRoot.getTranslation()))      
-       
-        pm.setKeyframe(tRoot)
-         
-    pm.currentTime(0)
-
-              
-def doTest():    
-    nrOfTimes = 2
-      
-    textfilepath = "C:/Users/Pad/Documents/GitHub/ThesisProject/NumPy/testNumPy.txt"
-    textfile = open(textfilepath, "wb") 
-    
-    for i in range(nrOfTimes):        
-
-        cmds.timer(s=True)
-        
-        transferData()  
-        
-        t = cmds.timer(e = True)
-        time = str(t) + "\n"
-        timeEncode = time.encode()
-        textfile.write(timeEncode)
-        pm.currentTime(0)      
-             
-        
-    textfile.close() 
-
-   
-doTest()
\ No newline at end of file
+import sys
+
+from TransferCore import scriptDriver
+
+# The settings of the NumPy transfer, TransferCore.scriptDriver reads them from
+# this module on every run
+
+# How target joints are matched to source joints, 'auto', 'name', 'hierarchy' or 'file' with mapFile
+mappingMethod = 'auto'
+mapFile = None
+
+# Bytes of frame data held at once, None transfers the whole clip in one window
+memoryBudget = None
+
+# 'keys' samples and keys at the source key times, or every sampleStep frames for
+# baked clips, 'frames' at every frame up to the clip length
+sampling = 'keys'
+sampleStep = 1.0
+
+# Degrees a joint may move over the clip and still be keyed once and skipped, None keys every joint
+staticTolerance = 1e-3
+
+# 'float32' or 'float64' retargets in reused buffers at that precision, None allocates per window
+precision = None
+
+# Without a precision, 'matrix' retargets 4x4 matrices and 'quaternion' quaternions
+engine = 'matrix'
+
+# Largest error in degrees, or scene units for the root translation, the written curves may
+# have after dropping keys, None keys every sampled time. keyInterpolation is 'linear' or 'bezier'
+keyTolerance = None
+keyInterpolation = 'linear'
+
+# Folder the sampled source curves and the keys they were transferred to are
+# kept in between runs, None samples and retargets every run
+clipCacheDir = None
+
+# Timed runs, the results are written to resultPath as JSON and next to it as CSV.
+# Runs slower than the results stored at baselinePath, a JSON result or an old
+# timer text file, are reported
+nrOfTimes = 2
+resultPath = "C:/Users/Pad/Documents/GitHub/ThesisProject/NumPy/testNumPy.json"
+baselinePath = None
+
+# Time, Maya API calls and allocations of every phase, saved as a Chrome trace when set
+tracePath = None
+
+settings = sys.modules[__name__]
+
+
+def selectedRoots():
+    return scriptDriver.selectedRoots()
+
+
+def transferData(sRoot, tRoots):
+    # Window count and the static joints that were keyed once
+    return scriptDriver.transferData(settings, sRoot, tRoots)
+
+
+def transferIncremental(sRoot, tRoots):
+    # Reruns only rekey the joints and frames whose source keys changed since
+    # the last run on the same roots
+    return scriptDriver.transferIncremental(settings, sRoot, tRoots)
+
+
+def doTest(sRoot=None, tRoots=None):
+    return scriptDriver.runTimed(settings, "NumPy", sRoot, tRoots)
+
+
+if __name__ == "__main__":
+    doTest()
@@ -0,0 +1,237 @@
+import math
+
+from TransferCore import benchmark
+from TransferCore import instrument
+from TransferCore import keyWriter
+from TransferCore import lazyModule
+from TransferCore import skeleton
+
+# Maya is imported on first use, importing this script does no work
+om = lazyModule.lazyImport('maya.api.OpenMaya')
+oma = lazyModule.lazyImport('maya.api.OpenMayaAnim')
+cmds = lazyModule.lazyImport('maya.cmds')
+
+
+def allocate():
+    # Arrays sized for the skeletons in the scene, filled by transfer
+    global sourceRootStr, targetRootStr, sourceSkeleton, targetSkeleton, total, animationLength
+    global sourceAList, targetAList, sourceParents, targetParents
+    global sBindposeRot, tBindposeRot, sParentMat, tParentMat, worldRot, sRotateCurves
+    global sLeftMat, sRightMat, tLeftMat, tRightMat, tKeyEuler, sRootRot, sRootTrans
+    
+    # Root joints for source and target, from the selection
+    sourceRootStr = cmds.ls(sl=True, type = 'joint')[0] 
+    targetRootStr = cmds.ls(sl=True, type = 'joint')[1]
+    
+    # Both hierarchies in one query each, loadList fills the arrays from them
+    with instrument.phase('loadSkeleton'):
+        sourceSkeleton = skeleton.fromMaya(sourceRootStr)
+        targetSkeleton = skeleton.fromMaya(targetRootStr)
+    total = len(sourceSkeleton)
+    
+    sourceAList = om.MDagPathArray().setLength(total)
+    targetAList = om.MDagPathArray().setLength(total)
+    
+    # Parent index of every joint in the lists, -1 for the root
+    sourceParents = [-1] * int(total)
+    targetParents = [-1] * int(total)
+    
+    sBindposeRot = om.MMatrixArray().setLength(total)
+    tBindposeRot = om.MMatrixArray().setLength(total)
+    
+    sParentMat = om.MMatrixArray().setLength(total)
+    tParentMat = om.MMatrixArray().setLength(total)	
+    
+    worldRot = om.MMatrixArray().setLength(total)		
+    
+    # Rotation curves of every source joint, evaluated without changing the time
+    sRotateCurves = [None] * int(total)
+    
+    # Frame-invariant products on each side of the animated rotation
+    sLeftMat = om.MMatrixArray().setLength(total)
+    sRightMat = om.MMatrixArray().setLength(total)
+    tLeftMat = om.MMatrixArray().setLength(total)
+    tRightMat = om.MMatrixArray().setLength(total)
+    
+    animationLength = cmds.keyframe(sourceRootStr, q=True, kc=True) / 10
+    
+    # Target Euler rotations and source root attributes for every frame, keyed in one go
+    tKeyEuler = [None] * int(animationLength)
+    sRootRot = [None] * int(animationLength)
+    sRootTrans = [None] * int(animationLength)
+
+
+def loadList(joints, dagPaths, parents):
+    # Dag paths and parent indices in the skeleton's depth-first order, through one selection list
+    selection = om.MSelectionList()
+    for name in joints.names:
+        selection.add(name)
+    
+    for i in range(len(joints)):
+        dagPaths[i] = selection.getDagPath(i)
+        parents[i] = int(joints.parents[i])
+ 
+ 
+def loadParentMatrices(node, parentMat, parents):
+    # One forward pass, every parent comes before its children in the list
+    worldMat = om.MMatrixArray()
+    worldMat.setLength(len(node))
+    
+    for i in range(len(node)):
+        transNode = om.MFnTransform(node[i])
+        
+        parentMatrix = om.MMatrix()
+        if parents[i] >= 0:
+            parentMatrix = worldMat[parents[i]]
+        
+        # Get rotation, orientation
+        rotation = transNode.rotation(om.MSpace.kTransform, asQuaternion = True)  
+        orientation = transNode.rotateOrientation(om.MSpace.kTransform)
+        
+        worldMat[i] = (rotation.asMatrix() * orientation.asMatrix()) * parentMatrix
+        
+        # The root is not part of the matrix arrays
+        if i > 0:
+            parentMat[i-1] = parentMatrix
+
+
+def loadTarget(node, keys):
+    for i in range(node.__len__()):
+        if i > 0:
+            transNode = om.MFnTransform(node[i])
+            
+            if keys == 0:
+                rotation = transNode.rotation(om.MSpace.kTransform, asQuaternion = True)
+                tBindposeRot[i-1] = rotation.asMatrix() 
+                
+                # Rotations are orthonormal, so the transpose is the inverse
+                keyOrient = transNode.rotateOrientation(om.MSpace.kTransform).asMatrix()
+                tLeftMat[i-1] = tBindposeRot[i-1] * keyOrient * tParentMat[i-1]
+                tRightMat[i-1] = tParentMat[i-1].transpose() * keyOrient.transpose()
+                        
+            c = tLeftMat[i-1] * worldRot[i-1] * tRightMat[i-1]
+            
+            order = om.MTransformationMatrix(c)
+            euler = om.MEulerRotation()
+            new = euler.decompose(c, order.rotationOrder()) 
+                     
+            tKeyEuler[keys][i-1] = [math.degrees(new.x), math.degrees(new.y), math.degrees(new.z)]
+
+                     
+def findCurve(transNode, attribute):
+    curves = oma.MAnimUtil.findAnimation(transNode.findPlug(attribute, True))
+    if len(curves) > 0:
+        return oma.MFnAnimCurve(curves[0])
+    
+    return None
+
+
+def evaluateRotation(transNode, curves, keys):
+    # Curves hold radians, channels without a curve keep their value
+    time = om.MTime(keys, om.MTime.uiUnit())
+    static = transNode.rotation(om.MSpace.kTransform)
+    values = [static.x, static.y, static.z]
+    
+    for axis in range(3):
+        if curves[axis] is not None:
+            values[axis] = curves[axis].evaluate(time)
+    
+    return om.MEulerRotation(values[0], values[1], values[2], static.order)
+
+                     
+def loadSource(node, keys):
+    for i in range(node.__len__()):        
+        if i > 0:
+            transNode = om.MFnTransform(node[i])
+            
+            if keys == 0:
+                rotation = transNode.rotation(om.MSpace.kTransform, asQuaternion = True)
+                sBindposeRot[i-1] = rotation.asMatrix()
+                
+                keyOrient = transNode.rotateOrientation(om.MSpace.kTransform).asMatrix()
+                sLeftMat[i-1] = keyOrient.transpose() * sParentMat[i-1].transpose() * sBindposeRot[i-1].transpose()
+                sRightMat[i-1] = sParentMat[i-1] * keyOrient
+                
+                sRotateCurves[i-1] = [findCurve(transNode, attribute) for attribute in ('rotateX', 'rotateY', 'rotateZ')]
+                
+            keyRot = evaluateRotation(transNode, sRotateCurves[i-1], keys)
+                         
+            worldRot[i-1] = sLeftMat[i-1] * keyRot.asMatrix() * sRightMat[i-1]
+
+
+def transfer():
+    
+    allocate()
+        
+    selList = om.MGlobal.getActiveSelectionList()
+    
+    sourceRoot = selList.getDagPath(0)
+    targetRoot = selList.getDagPath(1)
+    
+    with instrument.phase('loadList'):
+        loadList(sourceSkeleton, sourceAList, sourceParents)
+        loadList(targetSkeleton, targetAList, targetParents)
+    
+    om.MGlobal.viewFrame(0)
+    with instrument.phase('loadParentMatrices'):
+        loadParentMatrices(sourceAList, sParentMat, sourceParents)
+        loadParentMatrices(targetAList, tParentMat, targetParents)
+   
+    for i in range(int(animationLength)):
+        tKeyEuler[i] = [None] * (len(targetAList) - 1)
+                    
+        with instrument.phase('loadSource'):
+            loadSource(sourceAList, i)
+        with instrument.phase('loadTarget'):
+            loadTarget(targetAList, i)
+        
+        # Attributes for the target root, in UI units like the curves
+        with instrument.phase('sampleRoot'):
+            sRootRot[i] = cmds.getAttr(sourceRootStr + '.rotate', time=i)[0]
+            sRootTrans[i] = cmds.getAttr(sourceRootStr + '.translate', time=i)[0]
+    
+    # Write the whole clip one channel at a time, without changing the time
+    times = list(range(int(animationLength)))
+    curveStore = keyWriter.MayaCurveStore()
+    targetNames = [targetAList[i].partialPathName() for i in range(1, len(targetAList))]
+    
+    with instrument.phase('writeKeys'):
+        keyWriter.clearTargets(curveStore, [targetNames], [targetRootStr])
+        keyWriter.writeRotations(curveStore, targetNames, times, tKeyEuler)
+        keyWriter.writeChannels(curveStore, targetRootStr, keyWriter.rotateAttributes, times, sRootRot)
+        keyWriter.writeChannels(curveStore, targetRootStr, keyWriter.translateAttributes, times, sRootTrans)
+    
+    orientation = om.MFnTransform(sourceRoot).rotateOrientation(om.MSpace.kTransform)
+    om.MFnTransform(targetRoot).setRotateOrientation(orientation, om.MSpace.kTransform, False)
+    
+    om.MGlobal.viewFrame(0)
+    cmds.select(sourceRootStr)
+    cmds.select(targetRootStr, add=True) 
+   
+
+# Timed runs, the results are written to resultPath as JSON and next to it as CSV.
+# Runs slower than the results stored at baselinePath are reported
+nrOfTimes = 2
+resultPath = "C:/Users/Pad/Documents/GitHub/ThesisProject/OpenMaya/test_2_0.json"
+baselinePath = None
+
+# Time, Maya API calls and allocations of every phase, saved as a Chrome trace when set
+tracePath = None
+
+
+def doTest():
+    if tracePath:
+        instrument.enable(allocations=True)
+    
+    # Warm-up runs first, then median, p95 and spread with the machine and library versions
+    results = benchmark.runScene("OpenMaya 2.0", transfer, lambda: om.MGlobal.viewFrame(0), repeats=nrOfTimes, warmups=1)
+    benchmark.saveResults(results, resultPath, baselinePath)
+    
+    if tracePath:
+        instrument.report()
+        instrument.writeChromeTrace(tracePath)
+        instrument.disable()
+
+
+if __name__ == "__main__":
+    doTest()
@@ -1,47 +1,73 @@
-import pymel.core as pm
-import pymel.core.datatypes as dt
-import maya.cmds as cmds
+from TransferCore import benchmark
+from TransferCore import instrument
+from TransferCore import keyWriter
+from TransferCore import lazyModule
+from TransferCore import skeleton
 
-# Root joints for source and target
-sRoot = pm.ls(sl = True, type = 'joint')[0]
-tRoot = pm.ls(sl=True, type = 'joint')[1]
-total = len(pm.ls(type = 'joint')) / 2
+# PyMEL is imported on first use, importing this script does no work
+pm = lazyModule.lazyImport('pymel.core')
+dt = lazyModule.lazyImport('pymel.core.datatypes')
 
-animationLength = pm.keyframe(sRoot, q=True, kc=True) / 10
 
-# Global list for joints
-sourceList = [pm.nodetypes.Joint] * int(total)
-targetList = [pm.nodetypes.Joint] * int(total)
+def selectedRoots():
+    # Root joints for source and target
+    roots = pm.ls(sl=True, type='joint')
+    
+    return roots[0], roots[1]
 
-# Rotation/orientation lists
-sBindposeRot = [dt.Matrix] * int(total)
-tBindposeRot = [dt.Matrix] * int(total)
 
-# Worldrotation matrices
-worldRot = [dt.Matrix] * int(total)
+def allocate(sRoot, source):
+    # Lists sized for the source skeleton, filled by transferData
+    global total, animationLength, sourceList, targetList, sourceParents, targetParents
+    global sBindposeRot, tBindposeRot, worldRot, sParentMat, tParentMat
+    global sLeftMat, sRightMat, tLeftMat, tRightMat, tKeyEuler, sRootRot, sRootTrans
+    
+    total = len(source)
+    
+    animationLength = pm.keyframe(sRoot, q=True, kc=True) / 10
+    
+    # Global list for joints
+    sourceList = [pm.nodetypes.Joint] * int(total)
+    targetList = [pm.nodetypes.Joint] * int(total)
+    
+    # Parent index of every joint in the lists, -1 for the root
+    sourceParents = [-1] * int(total)
+    targetParents = [-1] * int(total)
+    
+    # Rotation/orientation lists
+    sBindposeRot = [dt.Matrix] * int(total)
+    tBindposeRot = [dt.Matrix] * int(total)
+    
+    # Worldrotation matrices
+    worldRot = [dt.Matrix] * int(total)
+    
+    # Parent matrices
+    sParentMat = [dt.Matrix] * int(total) 
+    tParentMat = [dt.Matrix] * int(total) 
+    
+    # Frame-invariant products on each side of the animated rotation
+    sLeftMat = [dt.Matrix] * int(total)
+    sRightMat = [dt.Matrix] * int(total)
+    tLeftMat = [dt.Matrix] * int(total)
+    tRightMat = [dt.Matrix] * int(total)
+    
+    # Target Euler rotations and source root attributes for every frame, keyed in one go
+    tKeyEuler = [None] * int(animationLength)
+    sRootRot = [None] * int(animationLength)
+    sRootTrans = [None] * int(animationLength)
 
-# Parent matrices
-sParentMat = [dt.Matrix] * int(total) 
-tParentMat = [dt.Matrix] * int(total) 
 
-index = 0
-def loadList(node, string):
-    global index
-        
+def loadList(joints, string):
+    # Joint nodes and parent indices in the skeleton's depth-first order
+    nodes = [pm.PyNode(name) for name in joints.names]
+    
     if string == "source":
-        sourceList[index] = node
-        index += 1      
+        sourceList[:] = nodes
+        sourceParents[:] = joints.parents.tolist()
     
     if string == "target":
-        targetList[index] = node
-        index += 1                  
-           
-    if node.numChildren() > 0:
-        for child in node.getChildren():
-            loadList(child, string)
-            
-    if index == total:
-        index = 0
+        targetList[:] = nodes
+        targetParents[:] = joints.parents.tolist()
       
 
 def loadSource(node, keys):
@@ -49,18 +75,16 @@ def loadSource(node, keys):
         if i > 0:
             if keys == 0:
                 sBindposeRot[i-1] = joint.getRotation().asMatrix() 
-                parent = 1
-                parentMatrix = getParentsMatrix(joint, parent)
-                sParentMat[i-1] = parentMatrix
+                
+                # Rotations are orthonormal, so the transpose is the inverse
+                keyOrient = joint.getOrientation().asMatrix()
+                sLeftMat[i-1] = keyOrient.transpose() * sParentMat[i-1].transpose() * sBindposeRot[i-1].transpose()
+                sRightMat[i-1] = sParentMat[i-1] * keyOrient
             
             keyRot = joint.getRotation().asMatrix()
-            keyOrient = joint.getOrientation().asMatrix()     
-            
-            # Isolated rotation           
-            isolatedRotation = sBindposeRot[i-1].inverse() * keyRot
             
-            # World rotation
-            worldRot[i-1] = keyOrient.inverse() * sParentMat[i-1].inverse() * isolatedRotation * sParentMat[i-1] * keyOrient
+            # World rotation of the isolated rotation
+            worldRot[i-1] = sLeftMat[i-1] * keyRot * sRightMat[i-1]
 
                       
 def loadTarget(node, keys):
@@ -68,72 +92,110 @@ def loadTarget(node, keys):
         if i > 0:  
             if keys == 0:
                 tBindposeRot[i-1] = joint.getRotation().asMatrix() 
-                parent = 1
-                parentMatrix = getParentsMatrix(joint, parent)
-                tParentMat[i-1] = parentMatrix
-            
-            keyOrient = joint.getOrientation().asMatrix()
+                
+                keyOrient = joint.getOrientation().asMatrix()
+                tLeftMat[i-1] = tBindposeRot[i-1] * keyOrient * tParentMat[i-1]
+                tRightMat[i-1] = tParentMat[i-1].transpose() * keyOrient.transpose()
             
             # Calculate the rotation from the source relative to the target
-            translatedRot = (keyOrient * tParentMat[i-1] * worldRot[i-1] * tParentMat[i-1].inverse() * keyOrient.inverse())
-            finalRot = tBindposeRot[i-1] * translatedRot
+            finalRot = tLeftMat[i-1] * worldRot[i-1] * tRightMat[i-1]
             
-            # Set the rotation and keyframe
-            joint.setRotation(dt.degrees(dt.EulerRotation(finalRot)))
-            pm.setKeyframe(joint)
+            tKeyEuler[keys][i-1] = list(dt.degrees(dt.EulerRotation(finalRot)))
 
            
-def getParentsMatrix(child, parentMat):
-    jntParent = child.getParent()
-    # Check if joint type,  calculates the matrix, then check if their is another parent
-    if type(jntParent) == pm.nodetypes.Joint:
-        parentMat = getParentsMatrix(jntParent, parentMat)
-        parentMat = (jntParent.getRotation().asMatrix() * jntParent.getOrientation().asMatrix()) * parentMat
-  
-    return parentMat 
+def loadParentMatrices(node, parentMat, parents):
+    # One forward pass, every parent comes before its children in the list
+    worldMat = [dt.Matrix] * len(node)
+    
+    for i, joint in enumerate(node):
+        parentMatrix = dt.Matrix()
+        if parents[i] >= 0:
+            parentMatrix = worldMat[parents[i]]
+        
+        worldMat[i] = (joint.getRotation().asMatrix() * joint.getOrientation().asMatrix()) * parentMatrix
+        
+        # The root is not part of the matrix lists
+        if i > 0:
+            parentMat[i-1] = parentMatrix
 
          
-def transferData(): 
-           
-    loadList(sRoot, "source")
-    loadList(tRoot, "target")
+def transferData(sRoot, tRoot): 
+    
+    # Both hierarchies in one query each, the lists are filled from them
+    with instrument.phase('loadSkeleton'):
+        source = skeleton.fromMaya(str(sRoot))
+        target = skeleton.fromMaya(str(tRoot))
+    
+    allocate(sRoot, source)
+    
+    with instrument.phase('loadList'):
+        loadList(source, "source")
+        loadList(target, "target")
+    
+    pm.currentTime(0)
+    with instrument.phase('loadParentMatrices'):
+        loadParentMatrices(sourceList, sParentMat, sourceParents)
+        loadParentMatrices(targetList, tParentMat, targetParents)
     
     for keys in range(int(animationLength)):
         
-        pm.currentTime(keys)        
+        with instrument.phase('currentTime'):
+            pm.currentTime(keys)        
                 
-        loadSource(sourceList, keys)
-        loadTarget(targetList, keys)
+        tKeyEuler[keys] = [None] * (int(total) - 1)
         
-        # Set the attributes for the target root
-        tRoot.setOrientation(sRoot.getOrientation())
-        tRoot.setRotation(sRoot.getRotation() )
-        tRoot.setTranslation(sRoot.getTranslation())
+        with instrument.phase('loadSource'):
+            loadSource(sourceList, keys)
+        with instrument.phase('loadTarget'):
+            loadTarget(targetList, keys)
         
-        pm.setKeyframe(tRoot)   
+        # Attributes for the target root
+        sRootRot[keys] = sRoot.rotate.get()
+        sRootTrans[keys] = sRoot.translate.get()
+    
+    # Write the whole clip one channel at a time, without changing the time
+    times = list(range(int(animationLength)))
+    curveStore = keyWriter.MayaCurveStore()
+    
+    targetNames = [str(joint) for joint in targetList[1:]]
+    
+    with instrument.phase('writeKeys'):
+        keyWriter.clearTargets(curveStore, [targetNames], [str(tRoot)])
+        keyWriter.writeRotations(curveStore, targetNames, times, tKeyEuler)
+        keyWriter.writeChannels(curveStore, str(tRoot), keyWriter.rotateAttributes, times, sRootRot)
+        keyWriter.writeChannels(curveStore, str(tRoot), keyWriter.translateAttributes, times, sRootTrans)
+    
+    tRoot.setOrientation(sRoot.getOrientation())
    
     pm.currentTime(0)
     
     
-def doTest():    
-    nrOfTimes = 2
+# Timed runs, the results are written to resultPath as JSON and next to it as CSV.
+# Runs slower than the results stored at baselinePath are reported
+nrOfTimes = 2
+resultPath = "C:/Users/Pad/Documents/GitHub/ThesisProject/PyMEL/test.json"
+baselinePath = None
+
+# Time, Maya API calls and allocations of every phase, saved as a Chrome trace when set
+tracePath = None
+
+
+def doTest(sRoot=None, tRoot=None):
+    if sRoot is None:
+        sRoot, tRoot = selectedRoots()
     
-    textfilepath = "C:/Users/Pad/Documents/GitHub/ThesisProject/PyMEL/test.txt"
-    textfile = open(textfilepath, "wb") 
+    if tracePath:
+        instrument.enable(allocations=True)
     
-    for i in range(nrOfTimes):
-        
-        cmds.timer(s=True)
-        
-        transferData()   
-        
-        t = cmds.timer(e = True)
-        time = str(t) + "\n"
-        timeEncode = time.encode()
-        textfile.write(timeEncode)
-        pm.currentTime(0)            
-     
-        
-    textfile.close() 
-      
-doTest()
\ No newline at end of file
+    # Warm-up runs first, then median, p95 and spread with the machine and library versions
+    results = benchmark.runScene("PyMEL", lambda: transferData(sRoot, tRoot), lambda: pm.currentTime(0), repeats=nrOfTimes, warmups=1)
+    benchmark.saveResults(results, resultPath, baselinePath)
+    
+    if tracePath:
+        instrument.report()
+        instrument.writeChromeTrace(tracePath)
+        instrument.disable()
+
+
+if __name__ == "__main__":
+    doTest()
@@ -1,155 +1,71 @@
-import maya.cmds as cmds
-import pymel.core as pm
-import pymel.core.datatypes as dt
-import scipy as sp
-from scipy import linalg as math
-
-# Root joints for source and target
-sRoot = pm.ls(sl=True, type='joint')[0]
-tRoot = pm.ls(sl=True, type='joint')[1]
-
-# Animation length 
-animationLength = (pm.keyframe(sRoot, q=True, kc=True)) / 10
-
-# Source and target rotation/orientation
-size = int(len(pm.ls(type = 'joint')) / 2)
-
-# Bindpose
-sBindpose = sp.zeros((size, 4, 4), dtype=sp.float32)
-tBindpose = sp.zeros((size, 4, 4), dtype=sp.float32)
-
-# Different space matrices
-worldRot = sp.zeros((size, 4, 4), dtype=sp.float32)
-
-# Parent matrices
-sParentMat = sp.zeros((size, 4, 4), dtype=sp.float32)
-tParentMat = sp.zeros((size, 4, 4), dtype=sp.float32)
-
-# Source and target lists
-sourceList = [None] * size
-targetList = [None] * size
-
-
-def loadSourceList(node, index):
-    sourceList[index] = node
-    index += 1
-    
-    if node.numChildren() > 0:
-        for child in node.getChildren():
-            index = loadSourceList(child, index)
-    
-    return index
-
-
-def loadTargetList(node, index):
-    targetList[index] = node
-    index += 1
-    
-    if node.numChildren() > 0:
-        for child in node.getChildren():
-            index = loadTargetList(child, index)
-    
-    return index
-
-
-def loadSource(node, keys):
-    for i, joint in enumerate(node):
-        if i > 0:
-            if keys == 0:                
-                sBindpose[i-1] = sp.matrix(joint.getRotation().asMatrix())                
-                sParentMat[i-1] = getParentsMatrix(joint, sp.identity(4))                
-            
-            keyRot = sp.matrix(joint.getRotation().asMatrix())
-            keyOrient = sp.matrix(joint.getOrientation().asMatrix())
-            
-            # Isolate rotation
-            isolatedRotation = sp.matmul(math.inv(sBindpose[i-1]), keyRot)
-            
-            # World rotation
-            f1 = sp.matmul(math.inv(keyOrient), math.inv(sParentMat[i-1]))
-            f2 = sp.matmul(isolatedRotation, sParentMat[i-1])            
-            
-            worldRot[i-1] = sp.matmul(sp.matmul(f1, f2), keyOrient)
-            
-
-def loadTarget(node, keys):
-    for i, joint in enumerate(node):
-        if i > 0:   
-            if keys == 0:                
-                tBindpose[i-1] = sp.matrix(joint.getRotation().asMatrix())                
-                tParentMat[i-1] = getParentsMatrix(joint, sp.identity(4))
-                          
-                          
-            keyOrient = sp.matrix(joint.getOrientation().asMatrix())
-                        
-            # Calculate the rotation from the source relative to the target
-            jointSpace = sp.matmul(sp.matmul(sp.matmul(keyOrient, tParentMat[i-1]), sp.matmul(worldRot[i-1], math.inv(tParentMat[i-1]))), math.inv(keyOrient))
-            
-            # Set the rotation and keyframe
-            joint.setRotation(dt.degrees(dt.EulerRotation(dt.Matrix(sp.matmul(tBindpose[i-1], jointSpace).tolist()))))
-            pm.setKeyframe(joint)
-    
-             
-def getParentsMatrix(child, parentMatrix):
-    if type(child.getParent()) == pm.nodetypes.Joint:
-        parentMatrix = getParentsMatrix(child.getParent(), parentMatrix)
-                
-        jointParentRotation = sp.matrix(child.getParent().getRotation().asMatrix())               
-        jointParentOrient = sp.matrix(child.getParent().getOrientation().asMatrix()) 
-                
-        parentMatrix = sp.matmul((jointParentRotation * jointParentOrient), parentMatrix)
-        
-    return parentMatrix 
-
-
-def transferData(sIndex, tIndex):
-     
-    sIndex = loadSourceList(sRoot, sIndex)
-    tIndex = loadTargetList(tRoot, tIndex)
-       
-    for keys in range(int(animationLength)):
-        cmds.currentTime(keys)
-        
-        loadSource(sourceList, keys)
-        loadTarget(targetList, keys)
-        
-        tRoot.setOrientation(sp.array(sRoot.getOrientation()))
-        tRoot.setRotation(sp.array(sRoot.getRotation()))
-        tRoot.setTranslation(sp.array(sRoot.getTranslation()))
-       
-        pm.setKeyframe(tRoot)
-         
-    pm.currentTime(0)
-
-
-def testing():    
-    nrOfTimes = 2
-    
-    textfilepath = "C:/Users/Pad/Documents/GitHub/ThesisProject/SciPy/Test.txt"
-    textfile = open(textfilepath, "wb") 
-    
-    for i in range(nrOfTimes):        
-        
-        sourceIndex = 0
-        targetIndex = 0
-        
-        cmds.timer(s=True)
-        
-        transferData(sourceIndex, targetIndex)  
-        
-        t = cmds.timer(e = True)
-        time = str(t) + "\n"
-        timeEncode = time.encode()
-        textfile.write(timeEncode)
-        pm.currentTime(0)          
-           
-    textfile.close() 
-   
-testing()
- 
-    
-                                    
-
-       
-            
-    
\ No newline at end of file
+import sys
+
+from TransferCore import scriptDriver
+
+# The settings of the SciPy transfer, TransferCore.scriptDriver reads them from
+# this module on every run
+
+# How target joints are matched to source joints, 'auto', 'name', 'hierarchy' or 'file' with mapFile
+mappingMethod = 'auto'
+mapFile = None
+
+# Bytes of frame data held at once, None transfers the whole clip in one window
+memoryBudget = None
+
+# 'keys' samples and keys at the source key times, or every sampleStep frames for
+# baked clips, 'frames' at every frame up to the clip length
+sampling = 'keys'
+sampleStep = 1.0
+
+# Degrees a joint may move over the clip and still be keyed once and skipped, None keys every joint
+staticTolerance = 1e-3
+
+# 'float32' or 'float64' retargets in reused buffers at that precision, None allocates per window
+precision = None
+
+# Without a precision, 'scipy' builds the key matrices with scipy's Rotation
+engine = 'scipy'
+
+# Largest error in degrees, or scene units for the root translation, the written curves may
+# have after dropping keys, None keys every sampled time. keyInterpolation is 'linear' or 'bezier'
+keyTolerance = None
+keyInterpolation = 'linear'
+
+# Folder the sampled source curves and the keys they were transferred to are
+# kept in between runs, None samples and retargets every run
+clipCacheDir = None
+
+# Timed runs, the results are written to resultPath as JSON and next to it as CSV.
+# Runs slower than the results stored at baselinePath, a JSON result or an old
+# timer text file, are reported
+nrOfTimes = 2
+resultPath = "C:/Users/Pad/Documents/GitHub/ThesisProject/SciPy/Test.json"
+baselinePath = None
+
+# Time, Maya API calls and allocations of every phase, saved as a Chrome trace when set
+tracePath = None
+
+settings = sys.modules[__name__]
+
+
+def selectedRoots():
+    return scriptDriver.selectedRoots()
+
+
+def transferData(sRoot, tRoots):
+    # Window count and the static joints that were keyed once
+    return scriptDriver.transferData(settings, sRoot, tRoots)
+
+
+def transferIncremental(sRoot, tRoots):
+    # Reruns only rekey the joints and frames whose source keys changed since
+    # the last run on the same roots
+    return scriptDriver.transferIncremental(settings, sRoot, tRoots)
+
+
+def testing(sRoot=None, tRoots=None):
+    return scriptDriver.runTimed(settings, "SciPy", sRoot, tRoots)
+
+
+if __name__ == "__main__":
+    testing()
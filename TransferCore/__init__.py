@@ -0,0 +1 @@
+# Maya-free animation transfer core shared by the transfer scripts.
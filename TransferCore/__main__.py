@@ -0,0 +1,5 @@
+import sys
+
+from TransferCore.cli import main
+
+sys.exit(main())
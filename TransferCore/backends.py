@@ -0,0 +1,303 @@
+import importlib
+import importlib.util
+import os
+import sys
+
+import numpy as np
+
+from TransferCore import benchmark
+from TransferCore import skeleton
+
+# One entry point for every transfer implementation. Each script, and the C++
+# plugin, is registered as a backend that knows whether it can run here and how
+# to transfer a source root onto target roots. transfer picks one by name, or
+# with 'auto' the one the calibration profile predicts is fastest for the
+# problem size. A profile is the JSON of a calibrate run on this machine, every
+# backend timed on a few scenes, and each backend's times are fitted as setup
+# plus cost times joints times frames, so backends that start slow but scale
+# well win on large rigs. Without calibration data defaultOrder decides.
+
+repositoryRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Benchmark JSON that 'auto' reads, written by calibrate
+profilePath = os.path.join(os.path.expanduser('~'), 'transferBackends.json')
+
+# The built C++ plugin transfers the selection when it is loaded. It is found
+# through this environment variable, then the profile's pluginPath, then the
+# C++ API solution's build output, Release before Debug
+pluginVariable = 'MAYAAPI_PLUGIN'
+pluginName = 'MayaAPI.mll'
+buildOutputs = tuple(os.path.join(repositoryRoot, 'C++ API', 'x64', configuration, pluginName) for configuration in ('Release', 'Debug'))
+
+# Fastest first when nothing is calibrated
+defaultOrder = ('cpp', 'numpy', 'scipy', 'openmaya', 'pymel')
+
+
+def moduleAvailable(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        return False
+
+
+def loadScript(folder, module):
+    # The scripts live in their own folders next to TransferCore
+    path = os.path.join(repositoryRoot, folder)
+    if path not in sys.path:
+        sys.path.append(path)
+
+    return importlib.import_module(module)
+
+
+class Backend(object):
+    # Anything that transfers the animation of a source root onto target roots
+
+    name = None
+    requires = ('maya',)
+
+    def missing(self):
+        # Why the backend cannot run here, None when it can
+        absent = [module for module in self.requires if not moduleAvailable(module)]
+        if absent:
+            return "needs %s" % ', '.join(absent)
+
+        return None
+
+    def available(self):
+        return self.missing() is None
+
+    def run(self, sRoot, tRoots):
+        raise NotImplementedError
+
+
+class ScriptBackend(Backend):
+    # A transfer script, called with the roots as PyMEL nodes, once per target
+    # for scripts that take one, or through the selection for those that read it
+
+    def __init__(self, name, folder, module, function, requires=('maya', 'pymel'), perTarget=False, selection=False):
+        self.name = name
+        self.folder = folder
+        self.module = module
+        self.function = function
+        self.requires = requires
+        self.perTarget = perTarget
+        self.selection = selection
+
+    def run(self, sRoot, tRoots):
+        function = getattr(loadScript(self.folder, self.module), self.function)
+        if self.selection:
+            import maya.cmds as cmds
+
+            for tRoot in tRoots:
+                cmds.select(str(sRoot), str(tRoot), replace=True)
+                function()
+            return None
+
+        import pymel.core as pm
+
+        sRoot = pm.PyNode(sRoot)
+        tRoots = [pm.PyNode(tRoot) for tRoot in tRoots]
+        if self.perTarget:
+            return [function(sRoot, tRoot) for tRoot in tRoots]
+
+        return function(sRoot, tRoots)
+
+
+def pluginCandidates(profile=None):
+    # Where the plugin may be, in the order they are tried
+    candidates = []
+    if os.environ.get(pluginVariable):
+        candidates.append(os.environ[pluginVariable])
+
+    profile = profile if profile is not None else loadProfile()
+    if profile.pluginPath:
+        candidates.append(profile.pluginPath)
+
+    return candidates + list(buildOutputs)
+
+
+def findPlugin(profile=None):
+    # The first candidate that exists, None if the plugin is not built
+    for path in pluginCandidates(profile):
+        if os.path.isfile(path):
+            return path
+
+    return None
+
+
+class PluginBackend(Backend):
+    # The C++ plugin runs its transfer on the selected roots when it is loaded.
+    # path overrides the search
+
+    def __init__(self, name, path=None):
+        self.name = name
+        self.path = path
+
+    def pluginPath(self):
+        if self.path:
+            return self.path if os.path.isfile(self.path) else None
+
+        return findPlugin()
+
+    def missing(self):
+        if self.pluginPath() is None:
+            looked = [self.path] if self.path else pluginCandidates()
+            return "%s not found, looked at %s; set %s or build 'C++ API/MayaAPI.sln'" % (
+                pluginName, ', '.join(looked) or 'no paths', pluginVariable)
+
+        return Backend.missing(self)
+
+    def run(self, sRoot, tRoots):
+        import maya.cmds as cmds
+
+        path = self.pluginPath()
+        if path is None:
+            raise RuntimeError(self.missing())
+
+        for tRoot in tRoots:
+            cmds.select(str(sRoot), str(tRoot), replace=True)
+            cmds.loadPlugin(path)
+            cmds.unloadPlugin(os.path.basename(path))
+
+
+registry = {}
+
+
+def register(backend):
+    # Adds or replaces a backend by its name
+    registry[backend.name] = backend
+
+    return backend
+
+
+def unregister(name):
+    registry.pop(name, None)
+
+
+def availableBackends():
+    return [name for name in sorted(registry) if registry[name].available()]
+
+
+register(ScriptBackend('numpy', 'NumPy', 'NumPy_AnimTransfer', 'transferData'))
+register(ScriptBackend('scipy', 'SciPy', 'AnimationTransfer_SciPy', 'transferData', requires=('maya', 'pymel', 'scipy')))
+register(ScriptBackend('pymel', 'PyMEL', 'AnimationTransfer_PyMEL', 'transferData', perTarget=True))
+register(ScriptBackend('openmaya', 'OpenMaya', 'AnimationTransfer_OpenMaya', 'transfer', requires=('maya',), selection=True))
+register(PluginBackend('cpp'))
+
+
+class Profile(object):
+    # Seconds per backend as a function of the joints transferred, every
+    # target's, and the frame count, from benchmark results
+
+    def __init__(self, results=None):
+        self.points = {}
+        self.machine = None
+        self.pluginPath = None
+        if results is not None:
+            self.machine = results.get('machine')
+            self.pluginPath = results.get('pluginPath')
+            for result in results['results']:
+                if result['joints'] and result['frames']:
+                    self.add(result['backend'], result['joints'], result['frames'], result['stats']['median'])
+
+    def add(self, backend, joints, frames, seconds):
+        self.points.setdefault(backend, []).append((float(joints) * frames, seconds))
+
+    def fit(self, backend):
+        # (setup, cost per joint frame), one size only gives the cost
+        work, seconds = np.array(self.points[backend]).T
+        if len(np.unique(work)) < 2:
+            return 0.0, float(np.mean(seconds / work))
+
+        setup, cost = np.linalg.lstsq(np.stack((np.ones_like(work), work), axis=1), seconds, rcond=None)[0]
+        if setup < 0.0:
+            setup, cost = 0.0, float(np.dot(work, seconds) / np.dot(work, work))
+
+        return float(setup), max(float(cost), 0.0)
+
+    def predict(self, backend, joints, frames):
+        # Seconds, None for a backend that was not calibrated
+        if backend not in self.points:
+            return None
+
+        setup, cost = self.fit(backend)
+        return setup + cost * joints * frames
+
+
+def loadProfile(path=None):
+    # Empty profile when there is no file yet
+    path = path or profilePath
+    if not os.path.exists(path):
+        return Profile()
+
+    return Profile(benchmark.loadJson(path))
+
+
+def problemSize(sRoot, tRoots):
+    # Joints transferred, the source's for every target, and frames from the
+    # first to the last key of the source, in Maya
+    import maya.cmds as cmds
+
+    source = skeleton.fromMaya(str(sRoot))
+    keyTimes = cmds.keyframe(list(source.names), query=True, timeChange=True) or [0.0]
+
+    return len(source) * len(tRoots), int(max(keyTimes) - min(keyTimes)) + 1
+
+
+def choose(joints, frames, profile=None, candidates=None):
+    # Name of the fastest available backend for the size
+    candidates = availableBackends() if candidates is None else candidates
+    if not candidates:
+        raise RuntimeError("no transfer backend can run here")
+
+    profile = profile if profile is not None else loadProfile()
+    predicted = [(profile.predict(name, joints, frames), name) for name in candidates]
+    predicted = [(seconds, name) for seconds, name in predicted if seconds is not None]
+    if predicted:
+        return min(predicted)[1]
+
+    ranked = [name for name in defaultOrder if name in candidates]
+    return (ranked or sorted(candidates))[0]
+
+
+def transfer(source, target, backend='auto', profile=None):
+    # source is a root joint, target a root or a list of them. Returns the
+    # name of the backend that ran and what it returned
+    tRoots = list(target) if isinstance(target, (list, tuple)) else [target]
+
+    if backend == 'auto':
+        backend = choose(*problemSize(source, tRoots), profile=profile)
+    elif backend not in registry:
+        raise ValueError("unknown backend %r, registered are %s" % (backend, ', '.join(sorted(registry))))
+    elif not registry[backend].available():
+        raise RuntimeError("backend %r cannot run here, %s" % (backend, registry[backend].missing()))
+
+    return backend, registry[backend].run(source, tRoots)
+
+
+def transferSelected(backend='auto', profile=None):
+    # The first selected root joint onto every other selected one
+    import maya.cmds as cmds
+
+    roots = cmds.ls(sl=True, type='joint')
+    return transfer(roots[0], roots[1:], backend, profile)
+
+
+def calibrate(scenes, names=None, path=None, repeats=3, warmups=1):
+    # Times the backends on (source root, target roots) pairs of the open
+    # scene, small to large rigs, and writes the profile 'auto' reads
+    import maya.cmds as cmds
+
+    names = names or availableBackends()
+    # The plugin that was timed, found again by later runs on this machine
+    results = {'machine': benchmark.machineInfo(), 'results': [], 'pluginPath': findPlugin()}
+    for sRoot, tRoots in scenes:
+        joints, frames = problemSize(sRoot, tRoots)
+        for name in names:
+            run = benchmark.runScene(name, lambda: registry[name].run(sRoot, tRoots), lambda: cmds.currentTime(0),
+                                     joints, frames, repeats, warmups)
+            results['results'] += run['results']
+
+    benchmark.saveResults(results, path or profilePath)
+
+    return Profile(results)
@@ -0,0 +1,70 @@
+import copy
+
+import numpy as np
+
+from TransferCore import parallel
+
+# One source retargeted onto many targets in a single pass. The source is
+# sampled once, every target joint picks the source joint it follows, and the
+# target sides of all skeletons are stacked so the whole batch is one pair of
+# matrix products per frame. Targets may have different joint counts.
+
+
+def defaultSourceIndex(sourceBind, targetBind):
+    # Joints paired in traversal order, like loadList does
+    sourceCount = len(sourceBind.left)
+    targetCount = len(targetBind.left)
+    if targetCount > sourceCount:
+        raise ValueError("target has %d joints but the source only %d, give a source index" % (targetCount, sourceCount))
+
+    return np.arange(targetCount)
+
+
+class BatchCache(object):
+
+    def __init__(self, sourceBind, targetBinds, sourceIndices=None):
+        if sourceIndices is None:
+            sourceIndices = [defaultSourceIndex(sourceBind, targetBind) for targetBind in targetBinds]
+
+        self.sourceIndex = np.concatenate([np.asarray(index, dtype=np.intp) for index in sourceIndices])
+        self.bounds = np.cumsum([0] + [len(index) for index in sourceIndices])
+
+        # Target sides of every skeleton stacked joint by joint
+        targetLeft = np.concatenate([targetBind.left for targetBind in targetBinds])
+        targetRight = np.concatenate([targetBind.right for targetBind in targetBinds])
+
+        self.left = np.matmul(targetLeft, sourceBind.left[self.sourceIndex])
+        self.right = np.matmul(sourceBind.right[self.sourceIndex], targetRight)
+
+    def gather(self, keyRot):
+        # Source rotations lined up with the stacked target joints
+        return np.take(keyRot, self.sourceIndex, axis=-3)
+
+    def subset(self, joints):
+        # The stacked target joints where joints is True, with every target's share recounted
+        joints = np.asarray(joints, dtype=bool)
+        subset = copy.copy(self)
+        subset.sourceIndex = self.sourceIndex[joints]
+        subset.left = self.left[joints]
+        subset.right = self.right[joints]
+        subset.bounds = np.cumsum([0] + [int(joints[start:stop].sum()) for start, stop in zip(self.bounds[:-1], self.bounds[1:])])
+
+        return subset
+
+    def split(self, targetRot):
+        return [targetRot[..., start:stop, :, :] for start, stop in zip(self.bounds[:-1], self.bounds[1:])]
+
+    def retarget(self, keyRot):
+        # Source rotations in, one array of target rotations per target out
+        return self.split(np.matmul(np.matmul(self.left, self.gather(keyRot)), self.right))
+
+
+def retargetMany(sourceBind, keyRot, targetBinds, sourceIndices=None, **parallelOptions):
+    cache = BatchCache(sourceBind, targetBinds, sourceIndices)
+
+    return cache.split(parallel.retargetFrames(cache, cache.gather(keyRot), **parallelOptions))
+
+
+def retargetPairs(pairs, **parallelOptions):
+    # pairs of (sourceBind, keyRot, targetBinds), one result list per pair
+    return [retargetMany(sourceBind, keyRot, targetBinds, **parallelOptions) for sourceBind, keyRot, targetBinds in pairs]
@@ -0,0 +1,316 @@
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+# Repeatable speed measurements for every transfer backend. A backend is a
+# function taking a joint count and a frame count and returning the function
+# to time, so the same runner drives the Maya scripts (which ignore the sizes
+# and transfer the selected scene) and the Maya-free engines below (which
+# build random skeletons of the asked size). Every run records the machine
+# and library versions, and a stored result can be used as a baseline to
+# flag runs that got slower.
+
+
+def timeRuns(function, repeats=10, warmups=2, reset=None, clock=time.perf_counter):
+    # Seconds per run, warm-up runs are not kept. reset runs between runs, untimed
+    times = []
+    for run in range(warmups + repeats):
+        start = clock()
+        function()
+        elapsed = clock() - start
+
+        if run >= warmups:
+            times.append(elapsed)
+        if reset is not None:
+            reset()
+
+    return times
+
+
+def percentile(times, fraction):
+    # Linear interpolation between the closest ranks
+    ordered = sorted(times)
+    position = (len(ordered) - 1) * fraction
+    lower = int(math.floor(position))
+    upper = min(lower + 1, len(ordered) - 1)
+
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(times):
+    mean = sum(times) / len(times)
+    variance = sum((t - mean) ** 2 for t in times) / (len(times) - 1) if len(times) > 1 else 0.0
+
+    return {
+        'runs': len(times),
+        'mean': mean,
+        'median': percentile(times, 0.5),
+        'p95': percentile(times, 0.95),
+        'stddev': math.sqrt(variance),
+        'min': min(times),
+        'max': max(times),
+    }
+
+
+def libraryVersion(module):
+    try:
+        return __import__(module).__version__
+    except Exception:
+        return None
+
+
+def mayaVersion():
+    try:
+        import maya.cmds as cmds
+        return cmds.about(version=True)
+    except Exception:
+        return None
+
+
+def machineInfo():
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpuCount': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': libraryVersion('numpy'),
+        'scipy': libraryVersion('scipy'),
+        'maya': mayaVersion(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def runBenchmarks(backends, jointCounts=(None,), frameCounts=(None,), repeats=10, warmups=2, reset=None, allocations=False):
+    # backends maps a name to a function of (joints, frames) returning the
+    # function to time. With allocations the peak bytes a run allocates per
+    # frame are measured in two more, untimed, runs, the first fills the buffers
+    from TransferCore import kernel
+
+    results = []
+    for name, backend in backends.items():
+        for joints in jointCounts:
+            for frames in frameCounts:
+                function = backend(joints, frames)
+                times = timeRuns(function, repeats, warmups, reset)
+                results.append({'backend': name, 'joints': joints, 'frames': frames, 'times': times, 'stats': summarize(times)})
+                if allocations:
+                    results[-1]['allocatedPerFrame'] = kernel.allocatedPerFrame(function, frames or 1)
+
+    return {'machine': machineInfo(), 'results': results}
+
+
+def runScene(name, function, reset=None, joints=None, frames=None, repeats=10, warmups=2):
+    # The scene in Maya is fixed, the sizes are only recorded
+    return runBenchmarks({name: lambda j, f: function}, (joints,), (frames,), repeats, warmups, reset)
+
+
+def writeJson(results, path):
+    with open(path, 'w') as jsonFile:
+        json.dump(results, jsonFile, indent=2)
+
+
+def loadJson(path):
+    with open(path) as jsonFile:
+        return json.load(jsonFile)
+
+
+statColumns = ('runs', 'mean', 'median', 'p95', 'stddev', 'min', 'max')
+
+
+def writeCsv(results, path):
+    # One row per backend and size, machine info repeated so rows stand alone
+    machine = results['machine']
+    with open(path, 'w', newline='') as csvFile:
+        writer = csv.writer(csvFile)
+        writer.writerow(('backend', 'joints', 'frames') + statColumns + ('python', 'numpy', 'scipy', 'maya', 'platform'))
+        for result in results['results']:
+            writer.writerow([result['backend'], result['joints'], result['frames']] +
+                            [result['stats'][column] for column in statColumns] +
+                            [machine['python'], machine['numpy'], machine['scipy'], machine['maya'], machine['platform']])
+
+
+def readTimerFile(path):
+    # Seconds from the old one-number-per-line text files, blank lines skipped
+    with open(path) as textFile:
+        return [float(line.strip().split()[0]) for line in textFile if line.strip()]
+
+
+def loadBaseline(path, results):
+    # An earlier JSON output, or one of the old text files with the times of a
+    # single scene, taken as the baseline of every result
+    if os.path.splitext(path)[1].lower() != '.txt':
+        return loadJson(path)
+
+    times = readTimerFile(path)
+    return {'results': [{'backend': result['backend'], 'joints': result['joints'], 'frames': result['frames'],
+                         'times': times, 'stats': summarize(times)} for result in results['results']]}
+
+
+def compareBaseline(results, baseline, tolerance=0.1):
+    # Results whose median is more than tolerance slower than the baseline's
+    baseMedians = dict(((result['backend'], result['joints'], result['frames']), result['stats']['median'])
+                       for result in baseline['results'])
+
+    regressions = []
+    for result in results['results']:
+        key = (result['backend'], result['joints'], result['frames'])
+        if key not in baseMedians:
+            continue
+
+        ratio = result['stats']['median'] / baseMedians[key]
+        if ratio > 1.0 + tolerance:
+            regressions.append({'backend': key[0], 'joints': key[1], 'frames': key[2],
+                                'baseline': baseMedians[key], 'median': result['stats']['median'], 'ratio': ratio})
+
+    return regressions
+
+
+def report(results, regressions=(), stream=None):
+    stream = stream or sys.stdout
+    for result in results['results']:
+        stats = result['stats']
+        stream.write('%-20s joints %-6s frames %-7s median %.6f  p95 %.6f  stddev %.6f'
+                     % (result['backend'], result['joints'], result['frames'], stats['median'], stats['p95'], stats['stddev']))
+        if 'allocatedPerFrame' in result:
+            stream.write('  allocated %.0f B/frame' % result['allocatedPerFrame'])
+        stream.write('\n')
+    for regression in regressions:
+        stream.write('REGRESSION %s joints %s frames %s: %.6f -> %.6f (x%.2f)\n'
+                     % (regression['backend'], regression['joints'], regression['frames'],
+                        regression['baseline'], regression['median'], regression['ratio']))
+
+
+def saveResults(results, path, baselinePath=None, tolerance=0.1):
+    # JSON at path and CSV next to it, compared against the baseline if there is one
+    writeJson(results, path)
+    writeCsv(results, os.path.splitext(path)[0] + '.csv')
+
+    regressions = []
+    if baselinePath and os.path.exists(baselinePath):
+        regressions = compareBaseline(results, loadBaseline(baselinePath, results), tolerance)
+    report(results, regressions)
+
+    return regressions
+
+
+def randomRotations(rng, shape):
+    from TransferCore import euler
+
+    return euler.eulerToMatrix(rng.uniform(-180.0, 180.0, shape + (3,)), rng.integers(0, 6, shape[-1]), 4).astype(np.float32)
+
+
+def randomBinds(joints, seed=0):
+    # Orient, bindpose and parent matrices of both skeletons
+    rng = np.random.default_rng(seed)
+
+    return rng, [randomRotations(rng, (joints,)) for i in range(6)]
+
+
+def matrixEngine(joints, frames):
+    from TransferCore import euler
+    from TransferCore.bindCache import BindCache
+
+    rng, binds = randomBinds(joints)
+    cache = BindCache(*binds)
+    keyRot = randomRotations(rng, (frames, joints))
+
+    return lambda: euler.matrixToEuler(cache.retarget(keyRot))
+
+
+def quaternionEngine(joints, frames):
+    # The batch cache's left * keyRot * right folded into one 4x4 matrix per joint,
+    # angles read straight off the quaternions
+    from TransferCore import batchTransfer
+    from TransferCore import quaternion
+    from TransferCore.bindCache import SourceBind, TargetBind
+
+    rng, binds = randomBinds(joints)
+    cache = quaternion.QuaternionBatchCache(batchTransfer.BatchCache(SourceBind(*binds[:3]), [TargetBind(*binds[3:])]))
+    keyRot = quaternion.matrixToQuaternion(randomRotations(rng, (frames, joints)))
+
+    return lambda: quaternion.quaternionToEuler(cache.retarget(keyRot))
+
+
+def threadEngine(joints, frames):
+    from TransferCore import euler
+    from TransferCore import parallel
+    from TransferCore.bindCache import BindCache
+
+    rng, binds = randomBinds(joints)
+    cache = BindCache(*binds)
+    keyRot = randomRotations(rng, (frames, joints))
+
+    return lambda: euler.matrixToEuler(parallel.retargetFrames(cache, keyRot, mode='thread'))
+
+
+def kernelEngine(joints, frames, precision='float32', decompose=True):
+    # Batch cache retarget in preallocated buffers, from sampled Euler angles.
+    # Without decompose only the kernel is timed, its allocations alone
+    from TransferCore import batchTransfer
+    from TransferCore import euler
+    from TransferCore import kernel
+    from TransferCore.bindCache import SourceBind, TargetBind
+
+    rng, binds = randomBinds(joints)
+    cache = batchTransfer.BatchCache(SourceBind(*binds[:3]), [TargetBind(*binds[3:])])
+    retargetKernel = kernel.RetargetKernel(cache, rng.integers(0, 6, joints), precision)
+    rotations = rng.uniform(-180.0, 180.0, (frames, joints + 1, 3))
+
+    if not decompose:
+        return lambda: retargetKernel.retarget(rotations)
+
+    return lambda: euler.matrixToEuler(retargetKernel.retarget(rotations)[0])
+
+
+def pipelineEngine(joints, frames, engine='matrix'):
+    # Whole transfer on a fake scene, curve sampling and keying included
+    from TransferCore import synthetic
+
+    scene = synthetic.makeScene(joints, frames)
+
+    return lambda: synthetic.transferScene(scene, engine=engine)
+
+
+engines = {
+    'matrix': matrixEngine,
+    'quaternion': quaternionEngine,
+    'matrix-threads': threadEngine,
+    'kernel': kernelEngine,
+    'kernel-float64': lambda joints, frames: kernelEngine(joints, frames, 'float64'),
+    'kernel-only': lambda joints, frames: kernelEngine(joints, frames, 'float32', False),
+    'kernel-only-float64': lambda joints, frames: kernelEngine(joints, frames, 'float64', False),
+    'pipeline': pipelineEngine,
+    'pipeline-quaternion': lambda joints, frames: pipelineEngine(joints, frames, 'quaternion'),
+}
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Time the Maya-free transfer engines.')
+    parser.add_argument('--engines', nargs='+', default=sorted(engines), choices=sorted(engines))
+    parser.add_argument('--joints', nargs='+', type=int, default=[50, 200])
+    parser.add_argument('--frames', nargs='+', type=int, default=[100, 1000])
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--warmups', type=int, default=2)
+    parser.add_argument('--output', default='benchmark.json', help='JSON path, the CSV is written next to it')
+    parser.add_argument('--baseline', help='earlier JSON output, or an old timer text file, to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed slowdown of the median, 0.1 is 10%%')
+    parser.add_argument('--allocations', action='store_true', help='also measure the bytes allocated per frame')
+    options = parser.parse_args(arguments)
+
+    results = runBenchmarks(dict((name, engines[name]) for name in options.engines),
+                            options.joints, options.frames, options.repeats, options.warmups, allocations=options.allocations)
+    regressions = saveResults(results, options.output, options.baseline, options.tolerance)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import numpy as np
+
+from TransferCore.retarget import invertRotations
+
+# Everything in a transfer that is fixed after frame 0: the bindpose, orient and
+# parent matrices of both skeletons, their inverses and the sandwich products
+# around the animated rotation. With
+#
+#   worldRot  = sOrient^-1 * sParentMat^-1 * sBindposeRot^-1 * keyRot * sParentMat * sOrient
+#   targetRot = tBindposeRot * tOrient * tParentMat * worldRot * tParentMat^-1 * tOrient^-1
+#
+# every factor left and right of keyRot is folded into one matrix per joint,
+# so a frame costs two matrix products per joint.
+
+
+class SourceBind(object):
+    # Source half, worldRot = left * keyRot * right
+
+    def __init__(self, sOrient, sBindposeRot, sParentMat, orthonormal=True):
+        self.sOrient = np.asarray(sOrient)
+        self.sBindposeRot = np.asarray(sBindposeRot)
+        self.sParentMat = np.asarray(sParentMat)
+
+        # Inverses
+        self.sOrientInv = invertRotations(self.sOrient, orthonormal)
+        self.sBindposeInv = invertRotations(self.sBindposeRot, orthonormal)
+        self.sParentInv = invertRotations(self.sParentMat, orthonormal)
+
+        self.left = np.matmul(np.matmul(self.sOrientInv, self.sParentInv), self.sBindposeInv)
+        self.right = np.matmul(self.sParentMat, self.sOrient)
+
+    def worldRotations(self, keyRot):
+        return np.matmul(np.matmul(self.left, keyRot), self.right)
+
+
+class TargetBind(object):
+    # Target half, targetRot = left * worldRot * right
+
+    def __init__(self, tOrient, tBindposeRot, tParentMat, orthonormal=True):
+        self.tOrient = np.asarray(tOrient)
+        self.tBindposeRot = np.asarray(tBindposeRot)
+        self.tParentMat = np.asarray(tParentMat)
+
+        # Inverses
+        self.tOrientInv = invertRotations(self.tOrient, orthonormal)
+        self.tParentInv = invertRotations(self.tParentMat, orthonormal)
+
+        self.left = np.matmul(np.matmul(self.tBindposeRot, self.tOrient), self.tParentMat)
+        self.right = np.matmul(self.tParentInv, self.tOrientInv)
+
+    def targetRotations(self, worldRot):
+        return np.matmul(np.matmul(self.left, worldRot), self.right)
+
+
+class BindCache(object):
+    # One source and one target joint by joint, both sandwiches combined
+
+    def __init__(self, sOrient, sBindposeRot, sParentMat, tOrient, tBindposeRot, tParentMat, orthonormal=True):
+        self.source = SourceBind(sOrient, sBindposeRot, sParentMat, orthonormal)
+        self.target = TargetBind(tOrient, tBindposeRot, tParentMat, orthonormal)
+
+        self.left = np.matmul(self.target.left, self.source.left)
+        self.right = np.matmul(self.source.right, self.target.right)
+
+    def worldRotations(self, keyRot):
+        return self.source.worldRotations(keyRot)
+
+    def targetRotations(self, worldRot):
+        return self.target.targetRotations(worldRot)
+
+    def retarget(self, keyRot):
+        # Source rotations of every frame and joint in, target rotations out
+        return np.matmul(np.matmul(self.left, keyRot), self.right)
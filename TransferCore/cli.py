@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from TransferCore import interchange
+from TransferCore import samplingPlan
+from TransferCore import synthetic
+
+# Transfers exported clips without Maya, python -m TransferCore transfer a.json
+# b.json --output results. Files run in parallel on a process pool, one file
+# per worker, and every clip becomes a result file the importer keys in Maya.
+
+
+def resultPath(clipPath, outputDirectory):
+    name = os.path.splitext(os.path.basename(clipPath))[0] + '.result.json'
+
+    return os.path.join(outputDirectory or os.path.dirname(os.path.abspath(clipPath)), name)
+
+
+def transferFiles(clipPaths, outputDirectory=None, workers=None, mappingMethod='auto', mapFile=None, memoryBudget=None):
+    workers = min(workers or os.cpu_count() or 1, len(clipPaths)) or 1
+    if outputDirectory and not os.path.isdir(outputDirectory):
+        os.makedirs(outputDirectory)
+
+    jobs = [(clipPath, resultPath(clipPath, outputDirectory)) for clipPath in clipPaths]
+
+    # The pool spreads the files, so every file keeps to one core
+    if workers < 2:
+        return [interchange.transferClip(clipPath, result, mappingMethod, mapFile, memoryBudget, workers=1) for clipPath, result in jobs]
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(interchange.transferClip, clipPath, result, mappingMethod, mapFile, memoryBudget, workers=1)
+                   for clipPath, result in jobs]
+        return [future.result() for future in futures]
+
+
+def writeSynthetic(path, joints, frames, targets, seed, keyStep=1):
+    # A made-up clip, for trying the tool and load testing
+    scene = synthetic.makeScene(joints, frames, targets, seed, keyStep)
+    times = samplingPlan.planTimes(scene.curves, scene.source.names).times
+    rotations = synthetic.curveSampler.sampleChannels(scene.curves, scene.source.names, synthetic.curveSampler.rotateAttributes, times)
+    rootTranslations = synthetic.curveSampler.sampleChannels(scene.curves, scene.source.names[:1], synthetic.curveSampler.translateAttributes, times)[:, 0]
+
+    interchange.writeClip(path, scene.source, scene.targets, times, rotations, rootTranslations)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog='python -m TransferCore', description='Animation transfer without Maya.')
+    commands = parser.add_subparsers(dest='command')
+
+    transfer = commands.add_parser('transfer', help='transfer clip files exported from Maya')
+    transfer.add_argument('clips', nargs='+', help='clip .json files')
+    transfer.add_argument('--output', help='folder for the result files, next to the clips by default')
+    transfer.add_argument('--workers', type=int, help='files transferred at once, all cores by default')
+    transfer.add_argument('--mapping', default='auto', choices=('auto', 'name', 'hierarchy', 'file'))
+    transfer.add_argument('--map-file', help='JSON of source to target joint names, for --mapping file')
+    transfer.add_argument('--memory-budget', type=int, help='bytes of frame data per file, the whole clip at once by default')
+
+    generate = commands.add_parser('synthetic', help='write a made-up clip file')
+    generate.add_argument('clip')
+    generate.add_argument('--joints', type=int, default=50)
+    generate.add_argument('--frames', type=int, default=1000)
+    generate.add_argument('--targets', type=int, default=1)
+    generate.add_argument('--seed', type=int, default=0)
+    generate.add_argument('--key-step', type=int, default=1, help='frames between source keys, the clip is sampled at its keys')
+
+    options = parser.parse_args(arguments)
+
+    if options.command == 'transfer':
+        for result in transferFiles(options.clips, options.output, options.workers, options.mapping, options.map_file, options.memory_budget):
+            print(result)
+    elif options.command == 'synthetic':
+        writeSynthetic(options.clip, options.joints, options.frames, options.targets, options.seed, options.key_step)
+    else:
+        parser.print_help()
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,290 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+
+from TransferCore import curveSampler
+from TransferCore import keyWriter
+
+# Sampled and retargeted clips kept on disk between runs and processes. Every
+# entry is a directory named by its key with a header.json, the joint list,
+# frame range, a content hash and the dtype and shape of each array, next to
+# one .npy file per array. Arrays are opened memory-mapped, so a later run or
+# a farm job reads only the pages it touches and nothing is copied. Entries
+# are written to a temporary directory and renamed into place, and the least
+# recently used ones are removed once the cache is over its size cap. Sample
+# entries are keyed on the source keys, result entries on the sample hash plus
+# the binds, joint mapping, skeletons and transfer options, and hold every key
+# the transfer wrote, so a repeat transfer replays them without the math.
+
+headerName = 'header.json'
+
+# Bytes kept on disk by default
+defaultSize = 4 * 1024 * 1024 * 1024
+
+
+def arrayHash(*arrays):
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype.str, array.shape)).encode())
+        digest.update(array.tobytes())
+
+    return digest.hexdigest()
+
+
+def sourceHash(source, nodes, attributes, times):
+    # Hash of every key or static value the samples come from, without evaluating a curve
+    digest = hashlib.sha1(arrayHash(np.asarray(times, dtype=np.float64)).encode())
+    for node in nodes:
+        for attribute in attributes:
+            keys = source.keys(node, attribute)
+            if keys is None:
+                keys = ((), (source.value(node, attribute),))
+            digest.update(('%s.%s' % (node, attribute)).encode())
+            digest.update(arrayHash(np.asarray(keys[0], dtype=np.float64), np.asarray(keys[1], dtype=np.float64)).encode())
+
+    return digest.hexdigest()
+
+
+class ClipEntry(object):
+    # One cached clip, header values and memory-mapped arrays
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, headerName)) as headerFile:
+            self.header = json.load(headerFile)
+
+        self.arrays = dict((name, np.load(os.path.join(path, name + '.npy'), mmap_mode='r'))
+                           for name in self.header['arrays'])
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+
+class ClipCache(object):
+
+    def __init__(self, directory, maxBytes=defaultSize):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def __contains__(self, key):
+        return os.path.exists(os.path.join(self.path(key), headerName))
+
+    def get(self, key):
+        # The entry, or None. Reading it makes it the most recently used
+        if key not in self:
+            return None
+
+        os.utime(os.path.join(self.path(key), headerName), None)
+        return ClipEntry(self.path(key))
+
+    def put(self, key, arrays, joints=(), times=(), contentHash=None, **extra):
+        times = np.asarray(times)
+        header = dict(extra)
+        header.update({
+            'key': key,
+            'joints': list(joints),
+            'frameRange': [float(times[0]), float(times[-1])] if len(times) else None,
+            'contentHash': contentHash,
+            'created': time.time(),
+            'arrays': dict((name, {'dtype': np.asarray(array).dtype.str, 'shape': list(np.shape(array))})
+                           for name, array in arrays.items()),
+        })
+
+        # Readers never see a half-written entry
+        temporary = self.path('.%s.%s' % (key, uuid.uuid4().hex))
+        os.makedirs(temporary)
+        for name, array in arrays.items():
+            np.save(os.path.join(temporary, name + '.npy'), np.asarray(array))
+        with open(os.path.join(temporary, headerName), 'w') as headerFile:
+            json.dump(header, headerFile, indent=2)
+
+        if os.path.exists(self.path(key)):
+            shutil.rmtree(self.path(key), ignore_errors=True)
+        try:
+            os.rename(temporary, self.path(key))
+        except OSError:
+            # Another process stored the same key first
+            shutil.rmtree(temporary, ignore_errors=True)
+
+        self.evict(keep=key)
+        return self.get(key)
+
+    def remove(self, key):
+        shutil.rmtree(self.path(key), ignore_errors=True)
+
+    def entries(self):
+        # (last used, bytes, key) of every entry, least recently used first
+        entries = []
+        for key in os.listdir(self.directory):
+            header = os.path.join(self.path(key), headerName)
+            if key.startswith('.') or not os.path.exists(header):
+                continue
+
+            size = sum(os.path.getsize(os.path.join(self.path(key), name)) for name in os.listdir(self.path(key)))
+            entries.append((os.path.getmtime(header), size, key))
+
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for used, size, key in self.entries())
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for used, size, key in entries)
+        for used, size, key in entries:
+            if total <= self.maxBytes:
+                break
+            if key != keep:
+                self.remove(key)
+                total -= size
+
+
+class SampledCurve(object):
+    # One channel of a cached sample array, other times go to the live curve
+
+    def __init__(self, times, values, fallback):
+        self.times = times
+        self.values = values
+        self.fallback = fallback
+
+    def evaluate(self, times):
+        times = np.asarray(times, dtype=np.float64)
+        index = np.clip(np.searchsorted(self.times, times), 0, len(self.times) - 1)
+        if len(self.times) and np.array_equal(self.times[index], times):
+            return np.asarray(self.values[index], dtype=np.float64)
+
+        return self.fallback().evaluate(times)
+
+    def keys(self):
+        return self.fallback().keys()
+
+
+class SampledCurveSource(curveSampler.CurveSource):
+    # A curve source answering from cached (frames, nodes, attributes) samples
+
+    def __init__(self, source, nodes, attributes, times, samples):
+        self.source = source
+        self.times = np.asarray(times, dtype=np.float64)
+        self.samples = samples
+        self.index = dict(((node, attribute), (j, c)) for j, node in enumerate(nodes) for c, attribute in enumerate(attributes))
+
+    def curve(self, node, attribute):
+        if (node, attribute) not in self.index:
+            return self.source.curve(node, attribute)
+
+        j, c = self.index[(node, attribute)]
+        return SampledCurve(self.times, self.samples[:, j, c], lambda: self.source.curve(node, attribute) or
+                            curveSampler.FakeCurve([0.0], [self.source.value(node, attribute)]))
+
+    def value(self, node, attribute):
+        return self.source.value(node, attribute)
+
+    def keys(self, node, attribute):
+        return self.source.keys(node, attribute)
+
+
+def cached(cache, key, compute, joints=(), times=(), contentHash=None, **extra):
+    # The entry under key, compute returns its arrays on a miss
+    entry = cache.get(key)
+    if entry is None:
+        entry = cache.put(key, compute(), joints, times, contentHash, **extra)
+
+    return entry
+
+
+sampleAttributes = curveSampler.rotateAttributes + curveSampler.translateAttributes
+
+
+def cachedSource(cache, source, nodes, times):
+    # Source whose rotate and translate channels come from the cache, sampled
+    # and stored first if the curves changed since
+    contentHash = sourceHash(source, nodes, sampleAttributes, times)
+    key = 'samples-' + contentHash
+
+    entry = cached(cache, key, lambda: {'samples': curveSampler.sampleChannels(source, nodes, sampleAttributes, times),
+                                        'times': np.asarray(times, dtype=np.float64)},
+                   nodes, times, contentHash, attributes=list(sampleAttributes))
+
+    return SampledCurveSource(source, nodes, sampleAttributes, entry['times'], entry['samples'])
+
+
+def resultKey(kind, contentHash, arrays=(), names=(), skeletonKeys=(), **options):
+    # Key of a transfer's result, from the hash of its samples and everything
+    # it was retargeted with. arrays are the binds and mapping, names the keyed nodes
+    digest = hashlib.sha1(('%s\0%s\0%s' % (kind, contentHash, arrayHash(*arrays))).encode())
+    digest.update(json.dumps([names, list(skeletonKeys), sorted(options.items())], default=str).encode())
+
+    return 'result-' + digest.hexdigest()
+
+
+class RecordingStore(keyWriter.CurveStore):
+    # Passes every call on to store and merges a copy of the keys for the
+    # result cache, one curve per channel however many calls keyed it
+
+    def __init__(self, store):
+        self.store = store
+        self.curves = keyWriter.FakeCurveStore()
+        self.clears = []
+
+    def setKeys(self, node, attribute, times, values, interpolation=None, slopes=None):
+        self.curves.setKeys(node, attribute, times, values, interpolation, slopes)
+        self.store.setKeys(node, attribute, times, values, interpolation, slopes)
+
+    def removeKeys(self, node, attribute, times):
+        self.curves.removeKeys(node, attribute, times)
+        self.store.removeKeys(node, attribute, times)
+
+    def clearKeys(self, nodes, attributes):
+        self.clears.append([list(nodes), list(attributes)])
+        self.curves.clearKeys(nodes, attributes)
+        self.store.clearKeys(nodes, attributes)
+
+    def arrays(self):
+        # Every channel's keys end to end, with where each channel starts
+        curves = self.curves.curves
+        slopes = [self.curves.slopes.get(channel, np.full(len(curves[channel][0]), np.nan)) for channel in curves]
+
+        return {
+            'offsets': np.cumsum([0] + [len(times) for times, values in curves.values()]),
+            'times': np.concatenate([times for times, values in curves.values()]) if curves else np.zeros(0),
+            'values': np.concatenate([values for times, values in curves.values()]) if curves else np.zeros(0),
+            'slopes': np.concatenate(slopes) if curves else np.zeros(0),
+        }
+
+    def header(self):
+        return [[node, attribute, self.curves.interpolation.get((node, attribute)), (node, attribute) in self.curves.slopes]
+                for node, attribute in self.curves.curves]
+
+
+def storeResult(cache, key, recording, contentHash=None, result=None, arrays=None):
+    # arrays are kept next to the keys, for a caller that needs more than the curves back
+    stored = recording.arrays()
+    stored.update(arrays or {})
+
+    return cache.put(key, stored, contentHash=contentHash, channels=recording.header(), clears=recording.clears, result=result)
+
+
+def replayResult(entry, store):
+    # Writes a stored result into store, the channels it cleared first, then
+    # one call per channel with all of its keys
+    for nodes, attributes in entry.header.get('clears', []):
+        store.clearKeys(nodes, attributes)
+
+    offsets = entry['offsets']
+    for c, (node, attribute, interpolation, hasSlopes) in enumerate(entry.header['channels']):
+        keys = slice(int(offsets[c]), int(offsets[c + 1]))
+        store.setKeys(node, attribute, entry['times'][keys], entry['values'][keys], interpolation,
+                      entry['slopes'][keys] if hasSlopes else None)
+
+    return entry.header['result']
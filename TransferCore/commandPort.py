@@ -0,0 +1,280 @@
+import asyncio
+import json
+
+# Client for Maya's command port, for driving transfers in Maya sessions from
+# another process. Commands are single lines of MEL, Maya runs the commands of
+# a connection in order and ends every reply with a null byte, so a batch of
+# commands is written at once and the replies are read back in order, one round
+# trip per batch. Connections are kept open in a pool per session and a
+# dispatcher spreads jobs over several sessions. FakeCommandPort answers like
+# Maya does, for trying a dispatcher without Maya.
+
+defaultHost = '127.0.0.1'
+defaultPort = 1234
+
+terminator = b'\x00'
+
+# Longest reply read, timings of a large transfer are more than the default 64KB
+replyLimit = 16 * 1024 * 1024
+
+
+def melString(text):
+    return '"%s"' % text.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def python(expression):
+    # MEL running a Python expression, the reply is its value
+    return 'python(%s)' % melString(expression)
+
+
+def encodeCommand(command):
+    if '\n' in command or '\r' in command:
+        raise ValueError("command port commands are one line: %r" % command)
+
+    return command.encode('utf-8') + b'\n'
+
+
+def decodeReply(data):
+    # Results end with a newline before the terminator
+    data = data[:-len(terminator)]
+    if data.endswith(b'\n'):
+        data = data[:-1]
+
+    return data.decode('utf-8', 'replace')
+
+
+class Connection(object):
+
+    def __init__(self, host=defaultHost, port=defaultPort):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, limit=replyLimit)
+        return self
+
+    async def execute(self, commands):
+        # Every command goes out before the first reply is read
+        self.writer.write(b''.join(encodeCommand(command) for command in commands))
+        await self.writer.drain()
+
+        replies = []
+        for command in commands:
+            try:
+                replies.append(decodeReply(await self.reader.readuntil(terminator)))
+            except asyncio.IncompleteReadError:
+                raise ConnectionError("%s:%d closed before answering %r" % (self.host, self.port, command))
+
+        return replies
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.writer = None
+
+
+class ConnectionPool(object):
+    # Up to size open connections to one session, reused between batches
+
+    def __init__(self, host=defaultHost, port=defaultPort, size=2):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.idle = []
+        self.opened = 0
+        self.available = asyncio.Semaphore(size)
+
+    async def acquire(self):
+        await self.available.acquire()
+        if self.idle:
+            return self.idle.pop()
+
+        try:
+            connection = await Connection(self.host, self.port).open()
+        except BaseException:
+            self.available.release()
+            raise
+
+        self.opened += 1
+        return connection
+
+    def release(self, connection, broken=False):
+        # Broken connections are dropped, the next acquire opens a new one
+        if broken:
+            connection.writer.close()
+        else:
+            self.idle.append(connection)
+        self.available.release()
+
+    async def execute(self, commands):
+        connection = await self.acquire()
+        try:
+            replies = await connection.execute(list(commands))
+        except BaseException:
+            self.release(connection, broken=True)
+            raise
+
+        self.release(connection)
+        return replies
+
+    async def close(self):
+        while self.idle:
+            await self.idle.pop().close()
+
+
+# Commands for a transfer job, lists of them are pipelined in one round trip
+
+def newScene():
+    return 'file -f -new'
+
+
+def openScene(path):
+    return 'file -f -o %s' % melString(path)
+
+
+def loadPlugin(path):
+    return 'loadPlugin %s' % melString(path)
+
+
+def unloadPlugin(name):
+    return 'unloadPlugin %s' % melString(name)
+
+
+def select(nodes):
+    return 'select -r %s' % ' '.join(melString(node) for node in nodes)
+
+
+# Function each transfer script runs a timed transfer of the selection with
+entryPoints = {
+    'NumPy_AnimTransfer': 'doTest',
+    'AnimationTransfer_SciPy': 'testing',
+    'AnimationTransfer_PyMEL': 'doTest',
+    'AnimationTransfer_OpenMaya': 'doTest',
+}
+
+
+def entryPoint(module):
+    name = module.rsplit('.', 1)[-1]
+    if name not in entryPoints:
+        raise ValueError("no entry point known for %r, give the function to run" % module)
+
+    return entryPoints[name]
+
+
+def runTransfer(module, function=None):
+    # Calls a function of a transfer script, the scripts read their roots from
+    # the selection. Without a function the script's entry point is called
+    function = function or entryPoint(module)
+
+    return python("__import__(%r, fromlist=['%s']).%s()" % (module, function, function))
+
+
+def enableTimings():
+    return python("__import__('TransferCore.instrument', fromlist=['enable']).enable()")
+
+
+def fetchTimings():
+    # Phase totals recorded since enableTimings, as JSON
+    return python("__import__('json').dumps(__import__('TransferCore.instrument', fromlist=['summary']).summary())")
+
+
+def transferJob(scene, roots, module, function=None, plugin=None):
+    commands = []
+    if plugin:
+        commands.append(loadPlugin(plugin))
+    commands += [openScene(scene), select(roots), enableTimings(), runTransfer(module, function), fetchTimings()]
+
+    return commands
+
+
+def timings(replies):
+    # Phase totals from the replies of a transferJob
+    return json.loads(replies[-1] or '{}')
+
+
+async def dispatch(jobs, endpoints, connections=1):
+    # Runs lists of commands on the sessions at endpoints, (host, port) pairs.
+    # Every session runs connections jobs at once, each connection takes the
+    # next job when it finishes one, replies are in job order
+    queue = asyncio.Queue()
+    for index, commands in enumerate(jobs):
+        queue.put_nowait((index, commands))
+
+    results = [None] * len(jobs)
+    pools = [ConnectionPool(host, port, connections) for host, port in endpoints]
+
+    async def worker(pool):
+        while not queue.empty():
+            index, commands = queue.get_nowait()
+            results[index] = await pool.execute(commands)
+
+    try:
+        await asyncio.gather(*[worker(pool) for pool in pools for connection in range(connections)])
+    finally:
+        for pool in pools:
+            await pool.close()
+
+    return results
+
+
+def execute(commands, host=defaultHost, port=defaultPort):
+    # One batch from a plain script, replies in command order
+    async def run():
+        connection = await Connection(host, port).open()
+        try:
+            return await connection.execute(list(commands))
+        finally:
+            await connection.close()
+
+    return asyncio.run(run())
+
+
+class FakeCommandPort(object):
+    # A local server framing replies like Maya. handler gets each command and
+    # returns its reply, every command is recorded with its connection number
+
+    def __init__(self, handler=None, host=defaultHost, port=0, delay=0.0):
+        self.handler = handler or (lambda command: '')
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.commands = []
+        self.connections = 0
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.serve, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve(self, reader, writer):
+        self.connections += 1
+        connection = self.connections
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                command = line.rstrip(b'\r\n').decode('utf-8')
+                self.commands.append((connection, command))
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+
+                writer.write(str(self.handler(command)).encode('utf-8') + b'\n' + terminator)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exception):
+        await self.close()
@@ -0,0 +1,107 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Retargeted channels cut down to the fewest keys that stay within an error
+# bound of the sampled values. Every channel starts with its first and last
+# sample as keys, and each pass adds, in every segment between two keys, the
+# sample the segment's curve misses by the most, until no sample is further
+# off than the tolerance. All channels are flattened into one array and a pass
+# runs over every segment of every channel at once. Curves are linear between
+# keys or Bezier, with the slope of the samples at each key as its tangent.
+
+interpolations = ('linear', 'bezier')
+
+# Largest error in the channels' units, degrees for rotations
+defaultTolerance = 0.01
+
+
+def slopes(times, values):
+    # Slope of every channel at every sample, values per frame
+    if len(times) < 2:
+        return np.zeros_like(values)
+
+    return np.gradient(values, times, axis=0)
+
+
+def evaluate(times, keyTimes, keyValues, keySlopes=None):
+    # One reduced channel at times, linear without slopes
+    times = np.asarray(times, dtype=np.float64)
+    end = np.clip(np.searchsorted(keyTimes, times, 'right'), 1, len(keyTimes) - 1)
+
+    return interpolate(times, keyTimes[end - 1], keyTimes[end], keyValues[end - 1], keyValues[end],
+                       None if keySlopes is None else keySlopes[end - 1], None if keySlopes is None else keySlopes[end])
+
+
+def interpolate(t, t0, t1, v0, v1, m0=None, m1=None):
+    span = t1 - t0
+    u = np.divide(t - t0, span, out=np.zeros_like(t), where=span > 0)
+    if m0 is None:
+        return v0 + (v1 - v0) * u
+
+    # Cubic Hermite, a Bezier with its handles a third of the span along the slopes
+    u2 = u * u
+    u3 = u2 * u
+
+    return (2 * u3 - 3 * u2 + 1) * v0 + (u3 - 2 * u2 + u) * span * m0 + (-2 * u3 + 3 * u2) * v1 + (u3 - u2) * span * m1
+
+
+def fitKeys(times, values, tolerance=defaultTolerance, interpolation='linear'):
+    # values is (frames, channels). Returns a (frames, channels) mask of the
+    # samples kept as keys, and the slopes at every sample for bezier
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    frames, channels = values.shape
+    if interpolation not in interpolations:
+        raise ValueError("interpolation must be one of %s, not %r" % (interpolations, interpolation))
+
+    keySlopes = slopes(times, values) if interpolation == 'bezier' else None
+    if frames <= 2:
+        return np.ones(values.shape, dtype=bool), keySlopes
+
+    # Channel after channel in one flat array, every channel keeps its ends so
+    # no segment runs from one channel into the next
+    flatValues = values.T.ravel()
+    flatTimes = np.tile(times, channels)
+    flatSlopes = None if keySlopes is None else keySlopes.T.ravel()
+    index = np.arange(flatValues.size)
+
+    keep = np.zeros(flatValues.size, dtype=bool)
+    keep[::frames] = True
+    keep[frames - 1::frames] = True
+
+    while True:
+        previous = np.maximum.accumulate(np.where(keep, index, 0))
+        following = np.minimum.accumulate(np.where(keep, index, index.size)[::-1])[::-1]
+
+        fitted = interpolate(flatTimes, flatTimes[previous], flatTimes[following], flatValues[previous], flatValues[following],
+                             None if flatSlopes is None else flatSlopes[previous], None if flatSlopes is None else flatSlopes[following])
+        error = np.abs(fitted - flatValues)
+        error[keep] = 0.0
+
+        # Worst sample of every segment, a segment starts at each key
+        starts = np.flatnonzero(keep)
+        worst = np.maximum.reduceat(error, starts)
+        add = (error > tolerance) & (error == worst[np.cumsum(keep) - 1])
+        if not add.any():
+            break
+        keep |= add
+
+    return keep.reshape(channels, frames).T, keySlopes
+
+
+def fitChannels(times, values, tolerance=defaultTolerance, interpolation='linear', workers=1, chunkSize=256):
+    # fitKeys with the channels split into chunks over threads, numpy lets go of the GIL
+    values = np.asarray(values, dtype=np.float64)
+    channels = values.shape[1]
+    if workers < 2 or channels <= chunkSize:
+        return fitKeys(times, values, tolerance, interpolation)
+
+    chunks = [(start, min(start + chunkSize, channels)) for start in range(0, channels, chunkSize)]
+    with ThreadPoolExecutor(workers) as pool:
+        fits = list(pool.map(lambda chunk: fitKeys(times, values[:, chunk[0]:chunk[1]], tolerance, interpolation), chunks))
+
+    keep = np.concatenate([fit[0] for fit in fits], axis=1)
+    keySlopes = None if interpolation != 'bezier' else np.concatenate([fit[1] for fit in fits], axis=1)
+
+    return keep, keySlopes
@@ -0,0 +1,149 @@
+import numpy as np
+
+from TransferCore import instrument
+
+# Source channels are read straight from the anim curves and evaluated at all
+# frame times, instead of moving the current time and letting the whole scene
+# evaluate once per frame. Channels without a curve keep their static value.
+# Values are Maya UI units, degrees for rotations.
+
+rotateAttributes = ('rotateX', 'rotateY', 'rotateZ')
+orientAttributes = ('jointOrientX', 'jointOrientY', 'jointOrientZ')
+translateAttributes = ('translateX', 'translateY', 'translateZ')
+
+
+class CurveSource(object):
+    # Anything that hands out the curve driving node.attribute
+
+    def curve(self, node, attribute):
+        # An object with evaluate(times), or None for a static channel
+        raise NotImplementedError
+
+    def value(self, node, attribute):
+        raise NotImplementedError
+
+    def keys(self, node, attribute):
+        # Key times and values of the curve, None for a static channel
+        curve = self.curve(node, attribute)
+        if curve is None:
+            return None
+
+        return curve.keys()
+
+
+class FakeCurve(object):
+
+    def __init__(self, times, values):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+
+    def evaluate(self, times):
+        # Linear between keys, flat outside the keyed range
+        return np.interp(times, self.times, self.values)
+
+    def keys(self):
+        return self.times, self.values
+
+
+class FakeCurveSet(CurveSource):
+    # Plain-Python curves standing in for a Maya scene
+
+    def __init__(self):
+        self.curves = {}
+        self.values = {}
+
+    def addCurve(self, node, attribute, times, values):
+        self.curves[(node, attribute)] = FakeCurve(times, values)
+
+    def setCurve(self, node, attribute, curve):
+        # Any object with evaluate(times) and keys()
+        self.curves[(node, attribute)] = curve
+
+    def setValue(self, node, attribute, value):
+        self.values[(node, attribute)] = value
+
+    def curve(self, node, attribute):
+        return self.curves.get((node, attribute))
+
+    def value(self, node, attribute):
+        return self.values.get((node, attribute), 0.0)
+
+
+class MayaCurve(object):
+
+    def __init__(self, animCurve):
+        import maya.api.OpenMaya as om
+        import maya.api.OpenMayaAnim as oma
+
+        self.animCurve = animCurve
+
+        # Anim curves hold internal units
+        self.scale = 1.0
+        if animCurve.animCurveType == oma.MFnAnimCurve.kAnimCurveTA:
+            self.scale = np.degrees(1.0)
+        elif animCurve.animCurveType == oma.MFnAnimCurve.kAnimCurveTL:
+            self.scale = 1.0 / om.MDistance(1.0, om.MDistance.uiUnit()).asCentimeters()
+
+    def evaluate(self, times):
+        import maya.api.OpenMaya as om
+
+        unit = om.MTime.uiUnit()
+        instrument.count('mayaCalls', len(times))
+        values = np.array([self.animCurve.evaluate(om.MTime(float(t), unit)) for t in times])
+
+        return values * self.scale
+
+    def keys(self):
+        import maya.api.OpenMaya as om
+
+        unit = om.MTime.uiUnit()
+        count = self.animCurve.numKeys
+        instrument.count('mayaCalls', 2 * count)
+        times = np.array([self.animCurve.input(i).asUnits(unit) for i in range(count)])
+        values = np.array([self.animCurve.value(i) for i in range(count)])
+
+        return times, values * self.scale
+
+
+class MayaCurveSource(CurveSource):
+    # Finds the MFnAnimCurve connected to each plug, like the lookup in mayaRun.cpp
+
+    def plug(self, node, attribute):
+        import maya.api.OpenMaya as om
+
+        instrument.count('mayaCalls')
+        selection = om.MSelectionList()
+        selection.add(node + '.' + attribute)
+        return selection.getPlug(0)
+
+    def curve(self, node, attribute):
+        import maya.api.OpenMayaAnim as oma
+
+        instrument.count('mayaCalls')
+        curves = oma.MAnimUtil.findAnimation(self.plug(node, attribute))
+        if not curves:
+            return None
+
+        return MayaCurve(oma.MFnAnimCurve(curves[0]))
+
+    def value(self, node, attribute):
+        import maya.cmds as cmds
+
+        instrument.count('mayaCalls')
+        return cmds.getAttr(node + '.' + attribute)
+
+
+def sampleChannels(source, nodes, attributes, times):
+    # Dense (frames, nodes, attributes) array of every channel at every time
+    times = np.asarray(times, dtype=np.float64)
+    samples = np.zeros((len(times), len(nodes), len(attributes)))
+
+    for j, node in enumerate(nodes):
+        for c, attribute in enumerate(attributes):
+            curve = source.curve(node, attribute)
+            if curve is None:
+                samples[:, j, c] = source.value(node, attribute)
+            else:
+                samples[:, j, c] = curve.evaluate(times)
+
+    return samples
@@ -0,0 +1,161 @@
+import numpy as np
+
+# Euler angles in degrees and Maya's rotateOrder enum, 0 xyz, 1 yzx, 2 zxy,
+# 3 xzy, 4 yxz and 5 zyx. Matrices are row-vector like Maya's, so order xyz
+# is Rx * Ry * Rz.
+
+rotateOrderAxes = ((0, 1, 2), (1, 2, 0), (2, 0, 1), (0, 2, 1), (1, 0, 2), (2, 1, 0))
+
+
+def axisMatrices(angles):
+    # One rotation matrix per axis, shaped (3, ..., 3, 3)
+    radians = np.radians(angles)
+    c = np.cos(radians)
+    s = np.sin(radians)
+
+    matrices = np.zeros((3,) + radians.shape[:-1] + (3, 3))
+    for axis in range(3):
+        i = (axis + 1) % 3
+        j = (axis + 2) % 3
+        matrices[axis, ..., axis, axis] = 1.0
+        matrices[axis, ..., i, i] = c[..., axis]
+        matrices[axis, ..., i, j] = s[..., axis]
+        matrices[axis, ..., j, i] = -s[..., axis]
+        matrices[axis, ..., j, j] = c[..., axis]
+
+    return matrices
+
+
+def eulerToMatrix(angles, rotateOrder=0, size=3):
+    # angles is (..., joints, 3), rotateOrder one value or one per joint
+    angles = np.asarray(angles, dtype=np.float64)
+    rotateOrder = np.broadcast_to(np.asarray(rotateOrder, dtype=np.intc), angles.shape[-2:-1])
+    axes = axisMatrices(angles)
+
+    matrices = np.zeros(angles.shape[:-1] + (size, size))
+    if size == 4:
+        matrices[..., 3, 3] = 1.0
+
+    for order in np.unique(rotateOrder):
+        joints = rotateOrder == order
+        first, second, third = rotateOrderAxes[order]
+        product = np.matmul(np.matmul(axes[first][..., joints, :, :], axes[second][..., joints, :, :]), axes[third][..., joints, :, :])
+        matrices[..., joints, :3, :3] = product
+
+    return matrices
+
+
+def scipyEulerToMatrix(angles, rotateOrder=0, size=3):
+    # eulerToMatrix through scipy.spatial.transform.Rotation, imported on first use.
+    # scipy takes the angles in the order they are applied and gives column-vector
+    # matrices, so the columns are reordered and the result transposed
+    from scipy.spatial.transform import Rotation
+
+    angles = np.asarray(angles, dtype=np.float64)
+    rotateOrder = np.broadcast_to(np.asarray(rotateOrder, dtype=np.intc), angles.shape[-2:-1])
+
+    matrices = np.zeros(angles.shape[:-1] + (size, size))
+    if size == 4:
+        matrices[..., 3, 3] = 1.0
+
+    for order in np.unique(rotateOrder):
+        joints = rotateOrder == order
+        axes = list(rotateOrderAxes[order])
+        ordered = angles[..., joints, :][..., axes]
+        rotation = Rotation.from_euler(''.join('xyz'[axis] for axis in axes), ordered.reshape(-1, 3), degrees=True)
+        matrices[..., joints, :3, :3] = rotation.as_matrix().transpose(0, 2, 1).reshape(ordered.shape[:-1] + (3, 3))
+
+    return matrices
+
+
+def alternateAngles(angles, rotateOrder):
+    # The other angle triple giving the same matrix, first and last axis turned
+    # half a turn and the middle one mirrored
+    alternate = np.array(angles)
+    for order in np.unique(rotateOrder):
+        joints = rotateOrder == order
+        first, second, third = rotateOrderAxes[order]
+        alternate[..., joints, first] += 180.0
+        alternate[..., joints, second] = 180.0 - alternate[..., joints, second]
+        alternate[..., joints, third] += 180.0
+
+    return alternate
+
+
+def closestAngles(angles, alternate, previous):
+    # Whichever solution lands nearest the previous frame, whole turns removed
+    angles = angles + 360.0 * np.round((previous - angles) / 360.0)
+    alternate = alternate + 360.0 * np.round((previous - alternate) / 360.0)
+
+    useAlternate = np.abs(alternate - previous).sum(axis=-1) < np.abs(angles - previous).sum(axis=-1)
+
+    return np.where(useAlternate[..., None], alternate, angles)
+
+
+def orderAngles(element, order):
+    # Angles in radians of one rotate order, element(row, column) gives that
+    # element of the row-vector matrices. The middle axis stays within -90 to 90
+    i, j, k = rotateOrderAxes[order]
+    sign = 1.0 if order < 3 else -1.0
+
+    # Row-vector matrix, element (k, i) of the column-vector one is r[i, k]
+    sinMiddle = np.clip(-sign * element(i, k), -1.0, 1.0)
+    locked = np.abs(sinMiddle) > 1.0 - 1e-7
+
+    first = np.arctan2(sign * element(j, k), element(k, k))
+    third = np.arctan2(sign * element(i, j), element(i, i))
+
+    # Gimbal lock, the first and last axis line up and the last takes no rotation
+    if locked.any():
+        first = np.where(locked, np.arctan2(-sign * element(k, j), element(j, j)), first)
+        third = np.where(locked, 0.0, third)
+
+    return first, np.arcsin(sinMiddle), third
+
+
+def decompose(matrices, rotateOrder):
+    # Angles in degrees, the middle axis kept within -90 to 90
+    m = np.asarray(matrices, dtype=np.float64)[..., :3, :3]
+    angles = np.zeros(m.shape[:-2] + (3,))
+
+    for order in np.unique(rotateOrder):
+        joints = rotateOrder == order
+        r = m[..., joints, :, :]
+        for axis, radians in zip(rotateOrderAxes[order], orderAngles(lambda row, column: r[..., row, column], order)):
+            angles[..., joints, axis] = np.degrees(radians)
+
+    return angles
+
+
+def unwrapAngles(angles, rotateOrder, previous=None):
+    # Every frame of (frames, joints, 3) angles, or one (joints, 3) frame, moved
+    # to whichever solution lands nearest the frame before, the first against
+    # previous if given
+    alternate = alternateAngles(angles, rotateOrder)
+    if angles.ndim == 2:
+        if previous is None:
+            return angles
+        return closestAngles(angles, alternate, previous)
+
+    start = 0
+    if previous is None:
+        previous = angles[0]
+        start = 1
+    for frame in range(start, len(angles)):
+        angles[frame] = closestAngles(angles[frame], alternate[frame], previous)
+        previous = angles[frame]
+
+    return angles
+
+
+def matrixToEuler(matrices, rotateOrder=0, previous=None, unwrap=True):
+    # matrices is (joints, 3, 3) or (frames, joints, 3, 3), 4x4 works too. Frames
+    # are unwrapped against the one before, the first against previous if given
+    matrices = np.asarray(matrices)
+    rotateOrder = np.broadcast_to(np.asarray(rotateOrder, dtype=np.intc), matrices.shape[-3:-2])
+
+    angles = decompose(matrices, rotateOrder)
+    if not unwrap:
+        return angles
+
+    return unwrapAngles(angles, rotateOrder, previous)
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Joint hierarchies flattened into a parent-index array in depth-first order,
+# the same order loadList visits the joints in. Roots have parent -1 and every
+# parent comes before its children, so the parent matrices are built in one
+# forward pass where each joint reuses its parent's accumulated matrix.
+
+
+def flattenHierarchy(root, getChildren):
+    # Iterative depth-first walk, deep chains do not hit the recursion limit
+    nodes = []
+    parents = []
+    stack = [(root, -1)]
+
+    while stack:
+        node, parent = stack.pop()
+        index = len(nodes)
+        nodes.append(node)
+        parents.append(parent)
+
+        for child in reversed(list(getChildren(node))):
+            stack.append((child, index))
+
+    return nodes, np.array(parents, dtype=np.intc)
+
+
+def jointDepths(parents):
+    parents = np.asarray(parents)
+    depths = np.zeros(len(parents), dtype=np.intc)
+
+    for i, parent in enumerate(parents):
+        if parent >= 0:
+            depths[i] = depths[parent] + 1
+
+    return depths
+
+
+def depthLevels(parents):
+    # Joint indices grouped by depth, root level first
+    depths = jointDepths(parents)
+    order = np.argsort(depths, kind='stable')
+    bounds = np.searchsorted(depths[order], np.arange(depths.max() + 2))
+
+    return [order[bounds[d]:bounds[d + 1]] for d in range(len(bounds) - 1)]
+
+
+def worldMatrices(localMat, parents, levels=None):
+    # world = local * parentWorld, one batched product per depth level
+    localMat = np.asarray(localMat)
+    parents = np.asarray(parents)
+    worldMat = np.empty_like(localMat)
+
+    if levels is None:
+        levels = depthLevels(parents)
+
+    for depth, joints in enumerate(levels):
+        if depth == 0:
+            worldMat[..., joints, :, :] = localMat[..., joints, :, :]
+        else:
+            worldMat[..., joints, :, :] = np.matmul(localMat[..., joints, :, :], worldMat[..., parents[joints], :, :])
+
+    return worldMat
+
+
+def parentMatrices(localMat, parents, levels=None):
+    # Accumulated matrix of every joint's parent, identity for the roots
+    localMat = np.asarray(localMat)
+    parents = np.asarray(parents)
+    worldMat = worldMatrices(localMat, parents, levels)
+
+    parentMat = np.empty_like(localMat)
+    parentMat[..., :, :, :] = np.identity(localMat.shape[-1], dtype=localMat.dtype)
+
+    hasParent = parents >= 0
+    parentMat[..., hasParent, :, :] = worldMat[..., parents[hasParent], :, :]
+
+    return parentMat
@@ -0,0 +1,369 @@
+import hashlib
+
+import numpy as np
+
+from TransferCore import clipCache
+from TransferCore import curveSampler
+from TransferCore import euler
+from TransferCore import instrument
+from TransferCore import keyWriter
+
+# Reruns of a transfer that only redo what the source edits touched. The
+# state of a source and its targets keeps a hash and the keys of every source
+# channel, the binds and joint mapping, the source world rotations and the
+# target angles. A rerun diffs the keys of the changed channels to find the
+# frame range each edit can reach and recomputes and rekeys only those joints
+# and frames. Edits at the bind frame, or to an orient, change the bind and
+# parent matrices, so the joint and all its descendants are redone. When the
+# sampled times change, a key inserted or moved, the state is moved onto the
+# new times, the target keys at times that are gone are removed and only the
+# frames between the unchanged times around each added or removed one are redone.
+# Frames after a redone range are unwrapped again against it and rekeyed if
+# they turn to the other angle solution. With a
+# result cache a full transfer stores its keys, world rotations and angles
+# under the channel hashes, binds and mapping, and one that finds them replays
+# the keys and takes the state from the cache without retargeting.
+
+# Frame the scripts read the bindposes at
+bindTime = 0
+
+# Keys on each side of an edit whose segments can change, spline tangents
+# depend on the neighbouring keys
+keyMargin = 2
+
+
+class TransferState(object):
+    # What the last transfer of one source onto its targets read and wrote
+
+    def __init__(self):
+        self.channels = {}
+        self.binds = None
+        self.times = None
+        self.world = None
+        self.angles = None
+
+        # Free for the caller, the scripts keep their walked joint lists here
+        self.hierarchy = None
+
+
+def channelKeys(source, node, attribute):
+    # Keys of a curve, or no times and the value of a static channel. Copied,
+    # a curve editing its arrays in place must not change the stored state
+    keys = source.keys(node, attribute)
+    if keys is None:
+        return np.zeros(0), np.array([source.value(node, attribute)], dtype=np.float64)
+
+    return np.array(keys[0], dtype=np.float64, copy=True), np.array(keys[1], dtype=np.float64, copy=True)
+
+
+def keysHash(keys):
+    digest = hashlib.sha1()
+    for array in keys:
+        digest.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+
+    return digest.hexdigest()
+
+
+def dirtyRange(oldKeys, newKeys, margin=keyMargin):
+    # Time range in which the curve may evaluate differently, None if the keys match
+    oldTimes, oldValues = oldKeys
+    newTimes, newValues = newKeys
+    if not len(oldTimes) or not len(newTimes):
+        return -np.inf, np.inf
+
+    old = dict(zip(oldTimes.tolist(), oldValues.tolist()))
+    new = dict(zip(newTimes.tolist(), newValues.tolist()))
+    changed = [time for time in set(old) | set(new) if old.get(time) != new.get(time)]
+    if not changed:
+        return None
+
+    keyTimes = np.union1d(oldTimes, newTimes)
+    first = np.searchsorted(keyTimes, min(changed)) - margin
+    last = np.searchsorted(keyTimes, max(changed)) + margin
+
+    start = keyTimes[first] if first >= 0 else -np.inf
+    stop = keyTimes[last] if last < len(keyTimes) else np.inf
+
+    return start, stop
+
+
+def withDescendants(parents, joints):
+    # Parents come before their children, so one forward pass spreads the mask down
+    joints = np.array(joints, dtype=bool)
+    for i, parent in enumerate(parents):
+        if parent >= 0 and joints[parent]:
+            joints[i] = True
+
+    return joints
+
+
+def readChannels(source, sourceNames):
+    channels = {}
+    for name in sourceNames:
+        for attribute in curveSampler.rotateAttributes + curveSampler.orientAttributes:
+            channels[(name, attribute)] = channelKeys(source, name, attribute)
+    for attribute in curveSampler.translateAttributes:
+        channels[(sourceNames[0], attribute)] = channelKeys(source, sourceNames[0], attribute)
+
+    return dict((key, (keysHash(keys), keys)) for key, keys in channels.items())
+
+
+def channelsHash(channels, times):
+    digest = hashlib.sha1(np.ascontiguousarray(times, dtype=np.float64).tobytes())
+    for key in sorted(channels):
+        digest.update(('%s.%s %s' % (key[0], key[1], channels[key][0])).encode())
+
+    return digest.hexdigest()
+
+
+def resultKey(state, times, skeletonKeys=()):
+    sourceBind, targetBinds, sourceIndices, targetNames, rotateOrders, targetRoots = state.binds
+    arrays = [sourceBind.left, sourceBind.right]
+    for targetBind, sourceIndex, targetOrder in zip(targetBinds, sourceIndices, rotateOrders):
+        arrays += [targetBind.left, targetBind.right, np.asarray(sourceIndex), np.asarray(targetOrder)]
+
+    return clipCache.resultKey('incremental', channelsHash(state.channels, times), arrays,
+                               [[list(names) for names in targetNames], list(targetRoots)], skeletonKeys)
+
+
+def retime(state, times):
+    # Moves the world rotations and angles onto times. Returns the old times
+    # that are gone and the (start, stop) frames of times between the unchanged
+    # times on either side of every added or removed time
+    oldTimes = state.times
+    kept = np.isin(times, oldTimes)
+    gone = oldTimes[~np.isin(oldTimes, times)]
+    oldIndex = np.searchsorted(oldTimes, times[kept])
+
+    world = np.zeros((len(times),) + state.world.shape[1:], dtype=state.world.dtype)
+    world[kept] = state.world[oldIndex]
+    state.world = world
+    for t, angles in enumerate(state.angles):
+        state.angles[t] = np.zeros((len(times),) + angles.shape[1:], dtype=angles.dtype)
+        state.angles[t][kept] = angles[oldIndex]
+    state.times = times
+
+    unchanged = times[kept]
+    changed = np.concatenate((times[~kept], gone))
+    below = np.searchsorted(unchanged, changed)
+    padded = np.concatenate(([-np.inf], unchanged, [np.inf]))
+    starts = np.searchsorted(times, padded[below], 'right')
+    stops = np.searchsorted(times, padded[below + 1], 'left')
+
+    return gone, [(start, stop) for start, stop in zip(starts, stops) if start < stop]
+
+
+def frameRuns(frames):
+    # (start, stop) of every run of True in a frame mask
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], frames.astype(np.int8), [0]))))
+
+    return zip(edges[::2], edges[1::2])
+
+
+def rewrap(angles, joints, rotateOrder, start, previous):
+    # Stored angles of joints from frame start on, unwrapped again against the
+    # redone frame before them until a frame comes out unchanged. Returns the
+    # frame the changes stop at
+    stop = start
+    while stop < len(angles):
+        current = angles[stop, joints]
+        wrapped = euler.closestAngles(current, euler.alternateAngles(current, rotateOrder), previous)
+        if np.allclose(wrapped, current, rtol=0.0, atol=1e-9):
+            break
+
+        angles[stop, joints] = previous = wrapped
+        stop += 1
+
+    return stop
+
+
+def removeTimes(store, state, times):
+    sourceBind, targetBinds, sourceIndices, targetNames, rotateOrders, targetRoots = state.binds
+    for names in targetNames:
+        for name in names:
+            keyWriter.removeChannels(store, name, keyWriter.rotateAttributes, times)
+    for root in targetRoots:
+        keyWriter.removeChannels(store, root, keyWriter.rotateAttributes + keyWriter.translateAttributes, times)
+
+
+def writeRoot(store, targetRoots, times, rootRotations, rootTranslations):
+    for root in targetRoots:
+        keyWriter.writeChannels(store, root, keyWriter.rotateAttributes, times, rootRotations)
+        keyWriter.writeChannels(store, root, keyWriter.translateAttributes, times, rootTranslations)
+
+
+def fullTransfer(state, source, store, sourceNames, rotateOrder, times, resultCache=None, skeletonKeys=()):
+    sourceBind, targetBinds, sourceIndices, targetNames, rotateOrders, targetRoots = state.binds
+
+    key = None
+    if resultCache is not None:
+        with instrument.phase('resultCache'):
+            key = resultKey(state, times, skeletonKeys)
+            entry = resultCache.get(key)
+
+        if entry is not None:
+            with instrument.phase('writeKeys'):
+                result = clipCache.replayResult(entry, store)
+            # Later reruns update these in place, the cached files stay as they are
+            state.world = np.array(entry['world'])
+            state.angles = [np.array(entry['angles%d' % t]) for t in range(len(targetBinds))]
+            return dict(result, cached=True)
+        store = clipCache.RecordingStore(store)
+
+    # Reruns merge their keys into what this writes
+    with instrument.phase('writeKeys'):
+        keyWriter.clearTargets(store, targetNames, targetRoots)
+
+    with instrument.phase('sample'):
+        rotations = curveSampler.sampleChannels(source, sourceNames, curveSampler.rotateAttributes, times)
+        rootTranslations = curveSampler.sampleChannels(source, sourceNames[:1], curveSampler.translateAttributes, times)[:, 0]
+
+    with instrument.phase('eulerToMatrix'):
+        keyRot = euler.eulerToMatrix(rotations[:, 1:], rotateOrder, 4).astype(np.float32)
+
+    with instrument.phase('retarget'):
+        state.world = sourceBind.worldRotations(keyRot)
+
+    state.angles = []
+    for targetBind, sourceIndex, names, targetOrder in zip(targetBinds, sourceIndices, targetNames, rotateOrders):
+        with instrument.phase('retarget'):
+            targetRot = targetBind.targetRotations(state.world[:, sourceIndex])
+        with instrument.phase('matrixToEuler'):
+            angles = euler.matrixToEuler(targetRot, targetOrder)
+        with instrument.phase('writeKeys'):
+            keyWriter.writeRotations(store, names, times, angles)
+        state.angles.append(angles)
+
+    with instrument.phase('writeKeys'):
+        writeRoot(store, targetRoots, times, rotations[:, 0], rootTranslations)
+
+    result = {'full': True, 'joints': len(sourceNames), 'frames': len(times)}
+    if key is not None:
+        arrays = dict(('angles%d' % t, angles) for t, angles in enumerate(state.angles))
+        arrays['world'] = state.world
+        with instrument.phase('resultCache'):
+            clipCache.storeResult(resultCache, key, store, result=result, arrays=arrays)
+
+    return result
+
+
+def transferIncremental(state, source, store, sourceNames, sourceParents, rotateOrder, loadBinds, times,
+                        resultCache=None, skeletonKeys=()):
+    # sourceNames and sourceParents include the root, rotateOrder leaves it out.
+    # loadBinds returns (sourceBind, targetBinds, sourceIndices, targetNames,
+    # rotateOrders, targetRoots) like the scripts build them, and only runs on
+    # the first transfer and when a bind changed. Full transfers go through
+    # resultCache, a ClipCache, if there is one. Returns what was redone
+    times = np.asarray(times, dtype=np.float64)
+
+    with instrument.phase('scanCurves'):
+        channels = readChannels(source, sourceNames)
+
+    full = state.binds is None or state.times is None
+
+    start = np.full(len(sourceNames), np.inf)
+    stop = np.full(len(sourceNames), -np.inf)
+    bindDirty = np.zeros(len(sourceNames), dtype=bool)
+    nameIndex = dict((name, j) for j, name in enumerate(sourceNames))
+
+    if not full:
+        for key, (digest, keys) in channels.items():
+            old = state.channels.get(key)
+            if old is not None and old[0] == digest:
+                continue
+
+            span = (-np.inf, np.inf) if old is None else dirtyRange(old[1], keys)
+            if span is None:
+                continue
+
+            j = nameIndex[key[0]]
+            start[j] = min(start[j], span[0])
+            stop[j] = max(stop[j], span[1])
+            if key[1] in curveSampler.orientAttributes or (key[1] in curveSampler.rotateAttributes and span[0] <= bindTime <= span[1]):
+                bindDirty[j] = True
+
+        # The root bind is part of every parent matrix
+        full = bool(bindDirty[0])
+
+    state.channels = channels
+
+    if full:
+        state.binds = loadBinds()
+        state.times = times
+        return fullTransfer(state, source, store, sourceNames, rotateOrder, times, resultCache, skeletonKeys)
+
+    timeSpans = []
+    if not np.array_equal(state.times, times):
+        gone, timeSpans = retime(state, times)
+        with instrument.phase('writeKeys'):
+            removeTimes(store, state, gone)
+
+    if bindDirty.any():
+        redo = withDescendants(sourceParents, bindDirty)
+        start[redo] = -np.inf
+        stop[redo] = np.inf
+
+        binds = loadBinds()
+        if [list(names) for names in binds[3]] != [list(names) for names in state.binds[3]]:
+            state.binds = binds
+            return fullTransfer(state, source, store, sourceNames, rotateOrder, times)
+        state.binds = binds
+
+    sourceBind, targetBinds, sourceIndices, targetNames, rotateOrders, targetRoots = state.binds
+    first = np.searchsorted(times, start, 'left')
+    last = np.searchsorted(times, stop, 'right')
+
+    # Frames to redo per source joint, the spans around changed times for every joint
+    dirty = np.zeros((len(sourceNames), len(times)), dtype=bool)
+    for j in np.flatnonzero(first < last):
+        dirty[j, first[j]:last[j]] = True
+    for begin, end in timeSpans:
+        dirty[:, begin:end] = True
+
+    frames = 0
+    joints = 0
+    for j in np.flatnonzero(dirty[1:].any(axis=1)) + 1:
+        # Arrays leave the root out
+        a = j - 1
+        for begin, end in frameRuns(dirty[j]):
+            frameRange = slice(begin, end)
+            with instrument.phase('sample'):
+                rotations = curveSampler.sampleChannels(source, [sourceNames[j]], curveSampler.rotateAttributes, times[frameRange])
+
+            with instrument.phase('eulerToMatrix'):
+                keyRot = euler.eulerToMatrix(rotations, rotateOrder[a:a + 1], 4).astype(np.float32)[:, 0]
+
+            with instrument.phase('retarget'):
+                state.world[frameRange, a] = np.matmul(np.matmul(sourceBind.left[a], keyRot), sourceBind.right[a])
+
+            for t, (targetBind, sourceIndex, names, targetOrder) in enumerate(zip(targetBinds, sourceIndices, targetNames, rotateOrders)):
+                followers = np.flatnonzero(np.asarray(sourceIndex) == a)
+                if not len(followers):
+                    continue
+
+                with instrument.phase('retarget'):
+                    targetRot = np.matmul(np.matmul(targetBind.left[followers], state.world[frameRange, a][:, None]), targetBind.right[followers])
+                with instrument.phase('matrixToEuler'):
+                    previous = state.angles[t][begin - 1, followers] if begin > 0 else None
+                    angles = euler.matrixToEuler(targetRot, np.asarray(targetOrder)[followers], previous)
+                state.angles[t][frameRange, followers] = angles
+
+                # Later frames were unwrapped against the old angles
+                with instrument.phase('matrixToEuler'):
+                    following = rewrap(state.angles[t], followers, np.asarray(targetOrder)[followers], end, angles[-1])
+                with instrument.phase('writeKeys'):
+                    keyWriter.writeRotations(store, [names[i] for i in followers], times[begin:following], state.angles[t][begin:following, followers])
+
+            frames += end - begin
+        joints += 1
+
+    # Root channels are copied, not retargeted
+    for begin, end in frameRuns(dirty[0]):
+        frameRange = slice(begin, end)
+        with instrument.phase('sample'):
+            rootRotations = curveSampler.sampleChannels(source, sourceNames[:1], curveSampler.rotateAttributes, times[frameRange])[:, 0]
+            rootTranslations = curveSampler.sampleChannels(source, sourceNames[:1], curveSampler.translateAttributes, times[frameRange])[:, 0]
+        with instrument.phase('writeKeys'):
+            writeRoot(store, targetRoots, times[frameRange], rootRotations, rootTranslations)
+
+    return {'full': False, 'joints': joints, 'frames': int(frames)}
@@ -0,0 +1,178 @@
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# Timers and counters for the phases of a transfer, hierarchy walk, parent
+# matrices, sampling, retarget math, Euler conversion and key writes. Off by
+# default, then phase() hands back one shared no-op object and count() returns
+# at once, so the calls can stay in the hot path. When on, every phase is kept
+# as an event with its duration, counters (Maya API calls from the adapters)
+# and, if asked for, the bytes allocated while it ran, and the events can be
+# saved as a Chrome trace that chrome://tracing, Perfetto and speedscope open.
+
+enabled = False
+traceAllocations = False
+
+events = []
+origin = time.perf_counter()
+local = threading.local()
+lock = threading.Lock()
+
+
+class NullPhase(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+nullPhase = NullPhase()
+
+
+def phaseStack():
+    stack = getattr(local, 'stack', None)
+    if stack is None:
+        stack = local.stack = []
+
+    return stack
+
+
+class Phase(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.counters = {}
+
+    def __enter__(self):
+        stack = phaseStack()
+        self.outermost = not stack
+        stack.append(self)
+
+        if traceAllocations:
+            if self.outermost and hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self.memory = tracemalloc.get_traced_memory()[0]
+
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        end = time.perf_counter()
+        phaseStack().pop()
+
+        args = dict(self.counters)
+        if traceAllocations:
+            current, peak = tracemalloc.get_traced_memory()
+            args['allocated'] = current - self.memory
+            args['peak'] = peak - self.memory
+
+        with lock:
+            events.append({'name': self.name, 'start': self.start - origin, 'duration': end - self.start,
+                           'thread': threading.current_thread().ident, 'args': args})
+        return False
+
+
+def phase(name):
+    # with instrument.phase('sample'): ...
+    if not enabled:
+        return nullPhase
+
+    return Phase(name)
+
+
+def timed(name):
+    # Decorator form of phase
+    def decorate(function):
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Phase(name):
+                return function(*args, **kwargs)
+
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+
+    return decorate
+
+
+def count(name, amount=1):
+    # Adds to the innermost running phase of this thread
+    if not enabled:
+        return
+
+    stack = phaseStack()
+    if stack:
+        counters = stack[-1].counters
+        counters[name] = counters.get(name, 0) + amount
+
+
+def enable(allocations=False):
+    global enabled, traceAllocations
+
+    traceAllocations = allocations
+    if allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    enabled = True
+
+
+def disable():
+    global enabled, traceAllocations
+
+    enabled = False
+    if traceAllocations and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    traceAllocations = False
+
+
+def reset():
+    global origin
+
+    with lock:
+        del events[:]
+    origin = time.perf_counter()
+
+
+def summary():
+    # Totals per phase name, calls, seconds and every counter summed
+    totals = {}
+    for event in events:
+        total = totals.setdefault(event['name'], {'calls': 0, 'seconds': 0.0})
+        total['calls'] += 1
+        total['seconds'] += event['duration']
+        for key, value in event['args'].items():
+            if key == 'peak':
+                total[key] = max(total.get(key, 0), value)
+            else:
+                total[key] = total.get(key, 0) + value
+
+    return totals
+
+
+def report(stream=None):
+    stream = stream or sys.stdout
+    totals = summary()
+    for name in sorted(totals, key=lambda name: -totals[name]['seconds']):
+        total = totals[name]
+        extra = ''.join('  %s %s' % (key, total[key]) for key in sorted(total) if key not in ('calls', 'seconds'))
+        stream.write('%-24s %6d calls %10.6f s%s\n' % (name, total['calls'], total['seconds'], extra))
+
+
+def chromeTrace():
+    # Complete events, times in microseconds
+    pid = os.getpid()
+
+    return {'displayTimeUnit': 'ms',
+            'traceEvents': [{'name': event['name'], 'ph': 'X', 'pid': pid, 'tid': event['thread'],
+                             'ts': event['start'] * 1e6, 'dur': event['duration'] * 1e6, 'args': event['args']}
+                            for event in events]}
+
+
+def writeChromeTrace(path):
+    with open(path, 'w') as traceFile:
+        json.dump(chromeTrace(), traceFile)
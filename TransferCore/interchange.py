@@ -0,0 +1,153 @@
+import json
+import os
+
+import numpy as np
+
+from TransferCore import curveSampler
+from TransferCore import keyWriter
+from TransferCore import samplingPlan
+from TransferCore import skeleton
+from TransferCore import synthetic
+
+# Files for transferring away from Maya. A clip is a JSON file with the source
+# and target hierarchies, names, parents, rotate orders and the rotate, orient
+# and translate values at the bind frame, next to .npy files with the sampled
+# frame times, source rotations and root translation. A result is a JSON list
+# of node.attribute channels next to one (channels, frames) .npy of values,
+# so the importer keys every channel in one pass. exportScene and importResult
+# are the Maya ends, everything else only needs NumPy.
+
+formatVersion = 1
+
+
+def arrayPath(path, name):
+    # clip.json keeps its arrays in clip.<name>.npy
+    return os.path.splitext(path)[0] + '.' + name + '.npy'
+
+
+def writeArrays(path, header, arrays):
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+
+    header['version'] = formatVersion
+    header['arrays'] = {}
+    for name, array in arrays.items():
+        np.save(arrayPath(path, name), np.asarray(array))
+        header['arrays'][name] = os.path.basename(arrayPath(path, name))
+
+    with open(path, 'w') as jsonFile:
+        json.dump(header, jsonFile)
+
+
+def readArrays(path):
+    with open(path) as jsonFile:
+        header = json.load(jsonFile)
+    if header.get('version') != formatVersion:
+        raise ValueError("%s is format version %s, expected %d" % (path, header.get('version'), formatVersion))
+
+    folder = os.path.dirname(os.path.abspath(path))
+    arrays = dict((name, np.load(os.path.join(folder, fileName), mmap_mode='r')) for name, fileName in header['arrays'].items())
+
+    return header, arrays
+
+
+def writeClip(path, source, targets, times, rotations, rootTranslations):
+    # rotations is (frames, source joints, 3) in degrees, rootTranslations (frames, 3)
+    header = {'source': source.toDict(), 'targets': [target.toDict() for target in targets]}
+    writeArrays(path, header, {'times': np.asarray(times, dtype=np.float64),
+                               'rotations': np.asarray(rotations, dtype=np.float64),
+                               'rootTranslations': np.asarray(rootTranslations, dtype=np.float64)})
+
+
+class ClipScene(object):
+    # A clip file set up like synthetic.FakeScene
+
+    def __init__(self, source, targets, times, rotations, rootTranslations):
+        self.source = source
+        self.targets = list(targets)
+        self.times = np.asarray(times, dtype=np.float64)
+
+        self.curves = curveSampler.FakeCurveSet()
+        self.store = keyWriter.FakeCurveStore()
+
+        for joints in [source] + self.targets:
+            synthetic.setStatic(self.curves, joints)
+
+        for j, name in enumerate(source.names):
+            for c, attribute in enumerate(curveSampler.rotateAttributes):
+                self.curves.addCurve(name, attribute, self.times, rotations[:, j, c])
+        for c, attribute in enumerate(curveSampler.translateAttributes):
+            self.curves.addCurve(source.names[0], attribute, self.times, rootTranslations[:, c])
+
+
+def readClip(path):
+    header, arrays = readArrays(path)
+
+    return ClipScene(skeleton.Skeleton.fromDict(header['source']), [skeleton.Skeleton.fromDict(target) for target in header['targets']],
+                     arrays['times'], arrays['rotations'], arrays['rootTranslations'])
+
+
+def writeResult(path, store):
+    # Every channel of a curve store, all keyed at the same times
+    channels = sorted(store.curves)
+    if not channels:
+        raise ValueError("nothing was keyed")
+
+    times = store.curves[channels[0]][0]
+    for channel in channels:
+        if not np.array_equal(store.curves[channel][0], times):
+            raise ValueError("%s.%s is keyed at other times than %s.%s" % (channel + channels[0]))
+
+    header = {'channels': ['%s.%s' % channel for channel in channels]}
+    writeArrays(path, header, {'times': times, 'values': np.stack([store.curves[channel][1] for channel in channels])})
+
+
+def readResult(path):
+    # (node, attribute) channels, key times and (channels, frames) values
+    header, arrays = readArrays(path)
+    channels = [tuple(channel.rsplit('.', 1)) for channel in header['channels']]
+
+    return channels, arrays['times'], arrays['values']
+
+
+def transferClip(clipPath, resultPath, mappingMethod='auto', mapFile=None, memoryBudget=None, **parallelOptions):
+    scene = readClip(clipPath)
+    synthetic.transferScene(scene, mappingMethod, mapFile, memoryBudget, **parallelOptions)
+    writeResult(resultPath, scene.store)
+
+    return resultPath
+
+
+def exportScene(sRoot, tRoots, path, times=None):
+    # Writes a clip of the source animation and the target hierarchies, in
+    # Maya. Sampled at the planned key times unless times are given
+    import maya.cmds as cmds
+
+    cmds.currentTime(0)
+    source = skeleton.fromMaya(sRoot)
+    targets = [skeleton.fromMaya(tRoot) for tRoot in tRoots]
+
+    curveSource = curveSampler.MayaCurveSource()
+    if times is None:
+        times = samplingPlan.planTimes(curveSource, source.names).times
+
+    rotations = curveSampler.sampleChannels(curveSource, source.names, curveSampler.rotateAttributes, times)
+    rootTranslations = curveSampler.sampleChannels(curveSource, source.names[:1], curveSampler.translateAttributes, times)[:, 0]
+
+    writeClip(path, source, targets, times, rotations, rootTranslations)
+
+
+def importResult(path, store=None):
+    # Replaces the curves of every channel of a result file, one call per channel
+    store = store or keyWriter.MayaCurveStore()
+    channels, times, values = readResult(path)
+    attributes = {}
+    for node, attribute in channels:
+        attributes.setdefault(node, []).append(attribute)
+    for node in attributes:
+        store.clearKeys([node], attributes[node])
+    for (node, attribute), channelValues in zip(channels, values):
+        store.setKeys(node, attribute, times, channelValues)
+
+    return store
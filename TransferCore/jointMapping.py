@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+# Source to target joint correspondences, as (sourceIndex, targetIndex) arrays
+# into the depth-first joint lists. Joints are matched by name, by their place
+# in the hierarchy or through an explicit map file, and joints without a match
+# are left out so they are never computed or keyed. Mappings are cached under
+# a hash of both hierarchies, so repeat transfers skip the matching.
+
+# Applied to both sides before names are compared
+defaultPatterns = ((r'^.*[|:]', ''), (r'^(source|target|src|tgt)_', ''))
+
+
+def normalizeName(name, patterns=defaultPatterns):
+    for pattern, replacement in patterns:
+        name = re.sub(pattern, replacement, name, flags=re.IGNORECASE)
+
+    return name.lower()
+
+
+def matchPairs(sourceKeys, targetKeys):
+    # Pairs joints whose keys are equal, the first source joint wins on duplicates
+    sourceLookup = {}
+    for i, key in enumerate(sourceKeys):
+        sourceLookup.setdefault(key, i)
+
+    pairs = [(sourceLookup[key], j) for j, key in enumerate(targetKeys) if key in sourceLookup]
+    if not pairs:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+
+    sourceIndex, targetIndex = zip(*pairs)
+    return np.array(sourceIndex, dtype=np.intp), np.array(targetIndex, dtype=np.intp)
+
+
+def matchByName(sourceNames, targetNames, patterns=defaultPatterns):
+    return matchPairs([normalizeName(name, patterns) for name in sourceNames],
+                      [normalizeName(name, patterns) for name in targetNames])
+
+
+def hierarchySignatures(parents):
+    # Path of child numbers from the root, (0, 2, 1) is the second child of the third child
+    signatures = []
+    childCount = {}
+
+    for parent in parents:
+        if parent < 0:
+            signatures.append((childCount.get(-1, 0),))
+        else:
+            signatures.append(signatures[parent] + (childCount.get(parent, 0),))
+        childCount[parent] = childCount.get(parent, 0) + 1
+
+    return signatures
+
+
+def matchByHierarchy(sourceParents, targetParents):
+    return matchPairs(hierarchySignatures(sourceParents), hierarchySignatures(targetParents))
+
+
+def loadMapFile(path):
+    # JSON object of source joint name to target joint name
+    with open(path) as mapFile:
+        return json.load(mapFile)
+
+
+def matchByMap(sourceNames, targetNames, mapping, patterns=defaultPatterns):
+    mapping = dict((normalizeName(source, patterns), normalizeName(target, patterns)) for source, target in mapping.items())
+    sourceKeys = [mapping.get(normalizeName(name, patterns)) for name in sourceNames]
+    targetKeys = [normalizeName(name, patterns) for name in targetNames]
+
+    sourceIndex, targetIndex = matchPairs([key for key in sourceKeys if key is not None], targetKeys)
+    mapped = np.flatnonzero([key is not None for key in sourceKeys])
+
+    return mapped[sourceIndex], targetIndex
+
+
+def hierarchyHash(sourceNames, sourceParents, targetNames, targetParents, method, options=None):
+    content = json.dumps([list(sourceNames), np.asarray(sourceParents).tolist(),
+                          list(targetNames), np.asarray(targetParents).tolist(), method, options], sort_keys=True)
+
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+class MappingCache(object):
+    # Mappings by hierarchy hash, in memory and optionally as JSON files
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.mappings = {}
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        if key in self.mappings:
+            return self.mappings[key]
+
+        if self.directory and os.path.exists(self.path(key)):
+            with open(self.path(key)) as cacheFile:
+                sourceIndex, targetIndex = json.load(cacheFile)
+            self.mappings[key] = (np.array(sourceIndex, dtype=np.intp), np.array(targetIndex, dtype=np.intp))
+            return self.mappings[key]
+
+        return None
+
+    def put(self, key, mapping):
+        self.mappings[key] = mapping
+
+        if self.directory:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            with open(self.path(key), 'w') as cacheFile:
+                json.dump([mapping[0].tolist(), mapping[1].tolist()], cacheFile)
+
+
+mappingCache = MappingCache()
+
+
+def buildMapping(sourceNames, sourceParents, targetNames, targetParents, method='auto', mapFile=None,
+                 patterns=defaultPatterns, cache=mappingCache):
+    # method is 'name', 'hierarchy', 'file' or 'auto', the better of name and hierarchy
+    # Keyed on the map file's contents, not its path, so an edited file maps again
+    jointMap = loadMapFile(mapFile) if method == 'file' else None
+    options = [jointMap, [list(pattern) for pattern in patterns]]
+    key = hierarchyHash(sourceNames, sourceParents, targetNames, targetParents, method, options)
+
+    if cache is not None:
+        mapping = cache.get(key)
+        if mapping is not None:
+            return mapping
+
+    if method == 'name':
+        mapping = matchByName(sourceNames, targetNames, patterns)
+    elif method == 'hierarchy':
+        mapping = matchByHierarchy(sourceParents, targetParents)
+    elif method == 'file':
+        mapping = matchByMap(sourceNames, targetNames, jointMap, patterns)
+    elif method == 'auto':
+        byName = matchByName(sourceNames, targetNames, patterns)
+        byHierarchy = matchByHierarchy(sourceParents, targetParents)
+        mapping = byName if len(byName[1]) >= len(byHierarchy[1]) else byHierarchy
+    else:
+        raise ValueError("unknown mapping method '%s'" % method)
+
+    if cache is not None:
+        cache.put(key, mapping)
+
+    return mapping
+
+
+def withoutRoot(sourceIndex, targetIndex):
+    # Drops the root pair and shifts the indices onto arrays that leave the root out
+    keep = (sourceIndex > 0) & (targetIndex > 0)
+
+    return sourceIndex[keep] - 1, targetIndex[keep] - 1
@@ -0,0 +1,156 @@
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from TransferCore import parallel
+from TransferCore.euler import rotateOrderAxes
+
+# The Euler to matrix conversion and the sandwich product of a batch cache in
+# buffers that are allocated once and reused for every window of frames. Every
+# step writes into its buffer with out=, so a window allocates nothing however
+# many frames it has. All buffers and bind matrices are in one precision,
+# float32 like the scripts' arrays or float64, and nothing is promoted on the
+# way. Only the 3x3 rotation block is multiplied, the binds hold no translation.
+# Source joints are sorted by rotate order so each order is one contiguous slice.
+
+precisions = {'float32': np.float32, 'float64': np.float64}
+defaultPrecision = 'float32'
+
+
+def precisionType(precision):
+    dtype = np.dtype(precisions.get(precision, precision))
+    if dtype not in (np.float32, np.float64):
+        raise ValueError("precision must be float32 or float64, not %s" % dtype)
+
+    return dtype
+
+
+class RetargetKernel(object):
+    # cache is a BatchCache, rotateOrder the source joints' without the root
+
+    def __init__(self, cache, rotateOrder, precision=defaultPrecision):
+        self.dtype = precisionType(precision)
+        rotateOrder = np.asarray(rotateOrder, dtype=np.intc)
+
+        self.order = np.argsort(rotateOrder, kind='stable')
+        orders, starts, counts = np.unique(rotateOrder[self.order], return_index=True, return_counts=True)
+        self.slices = [(order, slice(start, start + count)) for order, start, count in zip(orders, starts, counts)]
+
+        # Sorted joints in the sampled rotations, which have the root first
+        self.sourceIndex = self.order + 1
+
+        # Where every source joint ended up after sorting, for the gather
+        position = np.empty_like(self.order)
+        position[self.order] = np.arange(len(self.order))
+        self.gatherIndex = position[cache.sourceIndex]
+        self.bounds = cache.bounds
+
+        self.left = np.ascontiguousarray(cache.left[..., :3, :3], dtype=self.dtype)
+        self.right = np.ascontiguousarray(cache.right[..., :3, :3], dtype=self.dtype)
+
+        self.capacity = 0
+
+    def bytesPerFrame(self):
+        sourceJoints = len(self.order)
+        targetJoints = len(self.gatherIndex)
+
+        return sourceJoints * (3 * 8 + 3 * 3 * self.dtype.itemsize + 5 * 9 * self.dtype.itemsize) + targetJoints * 3 * 9 * self.dtype.itemsize
+
+    def reserve(self, frames):
+        # Buffers for windows of up to frames frames, grown but never shrunk
+        if frames <= self.capacity:
+            return
+
+        sourceJoints = len(self.order)
+        targetJoints = len(self.gatherIndex)
+        self.samples = np.empty((frames, sourceJoints, 3))
+        self.radians = np.empty((frames, sourceJoints, 3), dtype=self.dtype)
+        self.sin = np.empty_like(self.radians)
+        self.cos = np.empty_like(self.radians)
+
+        # Axis matrices, only the sine and cosine entries change between windows
+        self.axes = np.zeros((3, frames, sourceJoints, 3, 3), dtype=self.dtype)
+        for axis in range(3):
+            self.axes[axis, ..., axis, axis] = 1.0
+
+        self.product = np.empty((frames, sourceJoints, 3, 3), dtype=self.dtype)
+        self.keyRot = np.empty_like(self.product)
+        self.gathered = np.empty((frames, targetJoints, 3, 3), dtype=self.dtype)
+        self.sandwich = np.empty_like(self.gathered)
+        self.out = np.empty_like(self.gathered)
+        self.capacity = frames
+
+    def compute(self, rotations, start, stop):
+        # Frames start to stop of a window of rotations, (frames, source joints, 3)
+        # in degrees with the root first
+        f = slice(start, stop)
+        np.take(rotations[f], self.sourceIndex, axis=1, out=self.samples[f], mode='clip')
+        # Cast into the precision's buffer first, the math then runs without a cast
+        np.copyto(self.radians[f], self.samples[f], casting='same_kind')
+        np.multiply(self.radians[f], self.dtype.type(np.pi / 180.0), out=self.radians[f])
+        np.sin(self.radians[f], out=self.sin[f])
+        np.cos(self.radians[f], out=self.cos[f])
+
+        for axis in range(3):
+            i = (axis + 1) % 3
+            j = (axis + 2) % 3
+            matrices = self.axes[axis, f]
+            matrices[..., i, i] = self.cos[f, :, axis]
+            matrices[..., i, j] = self.sin[f, :, axis]
+            np.negative(self.sin[f, :, axis], out=matrices[..., j, i])
+            matrices[..., j, j] = self.cos[f, :, axis]
+
+        for order, joints in self.slices:
+            first, second, third = rotateOrderAxes[order]
+            np.matmul(self.axes[first, f, joints], self.axes[second, f, joints], out=self.product[f, joints])
+            np.matmul(self.product[f, joints], self.axes[third, f, joints], out=self.keyRot[f, joints])
+
+        np.take(self.keyRot[f], self.gatherIndex, axis=1, out=self.gathered[f], mode='clip')
+        np.matmul(self.left, self.gathered[f], out=self.sandwich[f])
+        np.matmul(self.sandwich[f], self.right, out=self.out[f])
+
+    def retarget(self, rotations, workers=1, mode='thread', chunkSize=None, minFrames=parallel.minimumFrames):
+        # One array of target rotations per target, views of the workspace that
+        # the next call overwrites. The buffers live in this process, so long
+        # windows are split over threads whatever the mode
+        frameCount = len(rotations)
+        self.reserve(frameCount)
+
+        workers = workers or 1
+        if workers < 2 or frameCount < minFrames:
+            self.compute(rotations, 0, frameCount)
+        else:
+            chunks = parallel.frameChunks(frameCount, chunkSize or -(-frameCount // (workers * 4)))
+            with ThreadPoolExecutor(workers) as pool:
+                for future in [pool.submit(self.compute, rotations, start, stop) for start, stop in chunks]:
+                    future.result()
+
+        out = self.out[:frameCount]
+        return [out[:, start:stop] for start, stop in zip(self.bounds[:-1], self.bounds[1:])]
+
+
+def allocatedBytes(function, *args):
+    # Peak bytes a call allocated on top of what was already allocated
+    wasTracing = tracemalloc.is_tracing()
+    if not wasTracing:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, 'reset_peak'):
+        # Python 3.9 and later, before that an earlier peak can show through
+        tracemalloc.reset_peak()
+
+    before = tracemalloc.get_traced_memory()[0]
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+
+    if not wasTracing:
+        tracemalloc.stop()
+
+    return max(0, peak - before)
+
+
+def allocatedPerFrame(function, frames, *args):
+    # Run once to fill any buffers first, the second run is measured
+    function(*args)
+
+    return allocatedBytes(function, *args) / float(max(frames, 1))
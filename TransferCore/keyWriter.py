@@ -0,0 +1,212 @@
+import numpy as np
+
+from TransferCore import instrument
+
+# Keys for a whole clip are pushed one channel at a time, every time and value
+# in a single call, instead of setting the rotation and calling setKeyframe per
+# joint and frame. Values are Maya UI units, degrees for rotations. Reduced
+# channels come with an interpolation, 'linear' or 'bezier' with the slope of
+# every key in units per frame. Writes merge into the curve, new keys replace
+# old keys at the same times and leave the others, so a full transfer clears
+# its target curves first and partial writes keep the rest of the clip.
+
+rotateAttributes = ('rotateX', 'rotateY', 'rotateZ')
+translateAttributes = ('translateX', 'translateY', 'translateZ')
+
+
+class CurveStore(object):
+    # Anything that can receive all keys of one channel in one call
+
+    def setKeys(self, node, attribute, times, values, interpolation=None, slopes=None):
+        raise NotImplementedError
+
+    def removeKeys(self, node, attribute, times):
+        raise NotImplementedError
+
+    def clearKeys(self, nodes, attributes):
+        raise NotImplementedError
+
+
+class FakeCurveStore(CurveStore):
+    # In-memory curves, used when there is no Maya to write to
+
+    def __init__(self):
+        self.curves = {}
+        self.slopes = {}
+        self.interpolation = {}
+        self.calls = 0
+
+    def setKeys(self, node, attribute, times, values, interpolation=None, slopes=None):
+        self.calls += 1
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+
+        # Keys without a slope get nan, a channel only has slopes once one was set
+        if slopes is not None or (node, attribute) in self.slopes:
+            slopes = np.full(len(times), np.nan) if slopes is None else np.asarray(slopes, dtype=np.float64)
+        if interpolation is not None:
+            self.interpolation[(node, attribute)] = interpolation
+
+        # New keys replace old keys at the same times
+        if (node, attribute) in self.curves:
+            oldTimes, oldValues = self.curves[(node, attribute)]
+            keep = ~np.isin(oldTimes, times)
+            if slopes is not None:
+                oldSlopes = self.slopes.get((node, attribute), np.full(len(oldTimes), np.nan))
+                slopes = np.concatenate((oldSlopes[keep], slopes))
+            times = np.concatenate((oldTimes[keep], times))
+            values = np.concatenate((oldValues[keep], values))
+
+        order = np.argsort(times, kind='stable')
+        self.curves[(node, attribute)] = (times[order], values[order])
+        if slopes is not None:
+            self.slopes[(node, attribute)] = slopes[order]
+
+    def removeKeys(self, node, attribute, times):
+        if (node, attribute) not in self.curves:
+            return
+
+        oldTimes, oldValues = self.curves[(node, attribute)]
+        keep = ~np.isin(oldTimes, times)
+        self.curves[(node, attribute)] = (oldTimes[keep], oldValues[keep])
+        if (node, attribute) in self.slopes:
+            self.slopes[(node, attribute)] = self.slopes[(node, attribute)][keep]
+
+    def clearKeys(self, nodes, attributes):
+        for node in nodes:
+            for attribute in attributes:
+                self.curves.pop((node, attribute), None)
+                self.slopes.pop((node, attribute), None)
+                self.interpolation.pop((node, attribute), None)
+
+    def keys(self, node, attribute):
+        return self.curves[(node, attribute)]
+
+
+class MayaCurveStore(CurveStore):
+    # Writes straight into anim curves through MFnAnimCurve.addKeys, the
+    # current time never changes so nothing is re-evaluated between keys
+
+    def __init__(self):
+        self.calls = 0
+
+    def animCurve(self, plug):
+        import maya.api.OpenMayaAnim as oma
+
+        instrument.count('mayaCalls')
+        curves = oma.MAnimUtil.findAnimation(plug)
+        if curves:
+            return oma.MFnAnimCurve(curves[0])
+
+        curve = oma.MFnAnimCurve()
+        curve.create(plug, curve.timedAnimCurveTypeForPlug(plug))
+        return curve
+
+    def setKeys(self, node, attribute, times, values, interpolation=None, slopes=None):
+        import maya.api.OpenMaya as om
+        import maya.api.OpenMayaAnim as oma
+
+        self.calls += 1
+        instrument.count('mayaCalls')
+
+        selection = om.MSelectionList()
+        selection.add(node + '.' + attribute)
+        curve = self.animCurve(selection.getPlug(0))
+
+        # Anim curves hold internal units
+        values = np.asarray(values, dtype=np.float64)
+        if curve.animCurveType == oma.MFnAnimCurve.kAnimCurveTA:
+            values = np.radians(values)
+        elif curve.animCurveType == oma.MFnAnimCurve.kAnimCurveTL:
+            values = values * om.MDistance(1.0, om.MDistance.uiUnit()).asCentimeters()
+
+        unit = om.MTime.uiUnit()
+        timeArray = om.MTimeArray([om.MTime(float(t), unit) for t in times])
+
+        tangentType = oma.MFnAnimCurve.kTangentGlobal
+        if slopes is not None:
+            tangentType = oma.MFnAnimCurve.kTangentFixed
+        elif interpolation == 'linear':
+            tangentType = oma.MFnAnimCurve.kTangentLinear
+
+        instrument.count('mayaCalls')
+        curve.addKeys(timeArray, om.MDoubleArray(values.tolist()), tangentType, tangentType, keepExistingKeys=True)
+        if slopes is None:
+            return
+
+        # Fixed tangents along the slopes, one frame across in UI units
+        instrument.count('mayaCalls', 3 * len(timeArray))
+        for time, slope in zip(timeArray, np.asarray(slopes, dtype=np.float64).tolist()):
+            index = curve.find(time)
+            curve.setTangent(index, 1.0, slope, True)
+            curve.setTangent(index, 1.0, slope, False)
+
+    def removeKeys(self, node, attribute, times):
+        import maya.api.OpenMaya as om
+        import maya.api.OpenMayaAnim as oma
+
+        selection = om.MSelectionList()
+        selection.add(node + '.' + attribute)
+        curves = oma.MAnimUtil.findAnimation(selection.getPlug(0))
+        instrument.count('mayaCalls', 2)
+        if not curves:
+            return
+
+        curve = oma.MFnAnimCurve(curves[0])
+        unit = om.MTime.uiUnit()
+        for time in times:
+            index = curve.find(om.MTime(float(time), unit))
+            if index is not None:
+                instrument.count('mayaCalls')
+                curve.remove(index)
+
+    def clearKeys(self, nodes, attributes):
+        import maya.cmds as cmds
+
+        # Every key of the channels in one call, an empty node list would cut the selection's
+        nodes = list(nodes)
+        if not nodes:
+            return
+
+        instrument.count('mayaCalls')
+        cmds.cutKey(nodes, attribute=list(attributes), clear=True)
+
+
+def writeChannels(store, node, attributes, times, values):
+    # values is (frames, channels), one channel per attribute
+    values = np.asarray(values)
+    instrument.count('keys', values.size)
+    for c, attribute in enumerate(attributes):
+        store.setKeys(node, attribute, times, values[:, c])
+
+
+def writeReduced(store, node, attributes, times, values, keep, slopes=None, interpolation='linear'):
+    # Only the keys kept by curveReduction, keep is a (frames, channels) mask
+    # and slopes the tangents at every frame for bezier
+    times = np.asarray(times)
+    values = np.asarray(values)
+    kept = int(keep.sum())
+    instrument.count('keys', kept)
+    instrument.count('droppedKeys', values.size - kept)
+    for c, attribute in enumerate(attributes):
+        channel = keep[:, c]
+        store.setKeys(node, attribute, times[channel], values[channel, c], interpolation,
+                      None if slopes is None else slopes[channel, c])
+
+
+def removeChannels(store, node, attributes, times):
+    for attribute in attributes:
+        store.removeKeys(node, attribute, times)
+
+
+def writeRotations(store, nodes, times, rotations):
+    # rotations is (frames, joints, 3) Euler angles in degrees
+    rotations = np.asarray(rotations)
+    for j, node in enumerate(nodes):
+        writeChannels(store, node, rotateAttributes, times, rotations[:, j])
+
+
+def clearTargets(store, targetNames, targetRoots):
+    # Every channel a full transfer writes, the targets' joints and their roots
+    store.clearKeys([name for names in targetNames for name in names], rotateAttributes)
+    store.clearKeys(targetRoots, rotateAttributes + translateAttributes)
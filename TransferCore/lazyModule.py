@@ -0,0 +1,37 @@
+import importlib
+import sys
+import types
+
+# Modules imported on first use. Scripts bind pymel.core, maya.api or scipy to
+# a stand-in at import and the real import only runs when an attribute is
+# first read, so a tools menu can import every backend at Maya startup and
+# only the one that is used pays its import time.
+
+
+class LazyModule(types.ModuleType):
+
+    def __init__(self, name):
+        super(LazyModule, self).__init__(name)
+
+    def __getattr__(self, attribute):
+        # Only called for attributes the stand-in does not have yet, the
+        # first one imports the module and copies its attributes over
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        return "<lazy module '%s'%s>" % (self.__name__, '' if isLoaded(self.__name__) else ', not loaded')
+
+
+def lazyImport(name):
+    # The module itself when something imported it already
+    if name in sys.modules:
+        return sys.modules[name]
+
+    return LazyModule(name)
+
+
+def isLoaded(name):
+    return name in sys.modules
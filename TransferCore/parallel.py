@@ -0,0 +1,105 @@
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+# Once the source is sampled the frames do not depend on each other, so the
+# frame range is split into chunks that run on a pool. A cache is anything with
+# per-joint left and right matrices lined up with the joints of keyRot. Process workers attach
+# to the source and result arrays through shared memory, only names, shapes
+# and frame ranges are pickled. Threads share the arrays directly and rely on
+# matmul releasing the GIL. Short clips stay serial.
+
+minimumFrames = 1024
+
+
+def frameChunks(frameCount, chunkSize):
+    return [(start, min(start + chunkSize, frameCount)) for start in range(0, frameCount, chunkSize)]
+
+
+def retargetChunk(left, right, keyRot, out, start, stop):
+    np.matmul(np.matmul(left, keyRot[start:stop]), right, out=out[start:stop])
+
+
+def retargetSharedChunk(keyName, outName, keyShape, outShape, keyType, outType, left, right, start, stop):
+    from multiprocessing import shared_memory
+
+    keyMemory = shared_memory.SharedMemory(name=keyName)
+    outMemory = shared_memory.SharedMemory(name=outName)
+    try:
+        keyRot = np.ndarray(keyShape, dtype=keyType, buffer=keyMemory.buf)
+        out = np.ndarray(outShape, dtype=outType, buffer=outMemory.buf)
+        retargetChunk(left, right, keyRot, out, start, stop)
+
+        # Views must be gone before the memory is closed
+        del keyRot, out
+    finally:
+        keyMemory.close()
+        outMemory.close()
+
+    return start, stop
+
+
+def retargetThreads(cache, keyRot, out, chunks, workers):
+    with ThreadPoolExecutor(workers) as pool:
+        futures = [pool.submit(retargetChunk, cache.left, cache.right, keyRot, out, start, stop) for start, stop in chunks]
+        for future in futures:
+            future.result()
+
+    return out
+
+
+def retargetProcesses(cache, keyRot, out, chunks, workers):
+    from multiprocessing import shared_memory
+
+    keyMemory = shared_memory.SharedMemory(create=True, size=max(keyRot.nbytes, 1))
+    outMemory = shared_memory.SharedMemory(create=True, size=max(out.nbytes, 1))
+    try:
+        sharedKeys = np.ndarray(keyRot.shape, dtype=keyRot.dtype, buffer=keyMemory.buf)
+        sharedOut = np.ndarray(out.shape, dtype=out.dtype, buffer=outMemory.buf)
+        sharedKeys[...] = keyRot
+
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(retargetSharedChunk, keyMemory.name, outMemory.name, keyRot.shape, out.shape,
+                                   keyRot.dtype.str, out.dtype.str, cache.left, cache.right, start, stop)
+                       for start, stop in chunks]
+            for future in futures:
+                future.result()
+
+        # Gather into one ordered array owned by the caller
+        out[...] = sharedOut
+        del sharedKeys, sharedOut
+    finally:
+        keyMemory.close()
+        keyMemory.unlink()
+        outMemory.close()
+        outMemory.unlink()
+
+    return out
+
+
+def retargetFrames(cache, keyRot, workers=None, mode='process', chunkSize=None, minFrames=minimumFrames):
+    # left * keyRot * right for every frame, frames spread over a pool
+    keyRot = np.asarray(keyRot)
+    frameCount = keyRot.shape[0]
+    workers = workers or os.cpu_count() or 1
+
+    if workers < 2 or frameCount < minFrames:
+        return np.matmul(np.matmul(cache.left, keyRot), cache.right)
+
+    # Python before 3.8 has no shared memory, threads still share the arrays
+    if mode == 'process' and importlib.util.find_spec('multiprocessing.shared_memory') is None:
+        mode = 'thread'
+
+    if chunkSize is None:
+        chunkSize = -(-frameCount // (workers * 4))
+
+    outType = np.result_type(cache.left, keyRot, cache.right)
+    out = np.empty(np.broadcast_shapes(cache.left.shape[:-2], keyRot.shape[:-2]) + cache.left.shape[-2:], dtype=outType)
+    chunks = frameChunks(frameCount, chunkSize)
+
+    if mode == 'thread':
+        return retargetThreads(cache, keyRot, out, chunks, workers)
+
+    return retargetProcesses(cache, keyRot, out, chunks, workers)
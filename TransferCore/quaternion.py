@@ -0,0 +1,231 @@
+import numpy as np
+
+from TransferCore import euler
+from TransferCore.euler import rotateOrderAxes
+
+# Unit quaternions as (..., 4) arrays in Maya's x, y, z, w layout. multiply
+# follows Maya's MQuaternion, multiply(a, b) is the rotation of matrix a * b,
+# so a transfer chain reads the same as its matrix version. A quaternion is
+# four numbers instead of sixteen and a product is 16 multiplies instead of 64.
+# A product is linear in each side, so left * keyRot * right with fixed left
+# and right is one 4x4 matrix on keyRot, and the batch cache retargets with
+# that one matrix per joint. Angles are read straight off the quaternions.
+
+# Unit quaternions along x, y, z and w
+basis = np.eye(4)
+
+
+def multiply(a, b):
+    # Rotation a followed by rotation b, the Hamilton product b * a
+    a = np.asarray(a)
+    b = np.asarray(b)
+    ax, ay, az, aw = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+    bx, by, bz, bw = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+
+    # Written into place, no stacked copy of the four components
+    q = np.empty(np.broadcast_shapes(a.shape, b.shape), dtype=np.result_type(a, b))
+    q[..., 0] = bw * ax + bx * aw + by * az - bz * ay
+    q[..., 1] = bw * ay - bx * az + by * aw + bz * ax
+    q[..., 2] = bw * az + bx * ay - by * ax + bz * aw
+    q[..., 3] = bw * aw - bx * ax - by * ay - bz * az
+
+    return q
+
+
+def productMatrix(left, right):
+    # (..., 4, 4) matrices M with multiply(multiply(left, q), right) == M q for every q
+    columns = multiply(multiply(np.asarray(left)[..., None, :], basis), np.asarray(right)[..., None, :])
+
+    return np.swapaxes(columns, -1, -2)
+
+
+def conjugate(q):
+    # Inverse of a unit quaternion
+    q = np.array(q)
+    q[..., :3] *= -1.0
+
+    return q
+
+
+def quaternionToMatrix(q, size=3):
+    x, y, z, w = np.moveaxis(np.asarray(q), -1, 0)
+
+    matrices = np.zeros(x.shape + (size, size), dtype=np.result_type(x, np.float32))
+    if size == 4:
+        matrices[..., 3, 3] = 1.0
+
+    # Row-vector matrix, the transpose of the textbook one
+    matrices[..., 0, 0] = 1.0 - 2.0 * (y * y + z * z)
+    matrices[..., 0, 1] = 2.0 * (x * y + z * w)
+    matrices[..., 0, 2] = 2.0 * (x * z - y * w)
+    matrices[..., 1, 0] = 2.0 * (x * y - z * w)
+    matrices[..., 1, 1] = 1.0 - 2.0 * (x * x + z * z)
+    matrices[..., 1, 2] = 2.0 * (y * z + x * w)
+    matrices[..., 2, 0] = 2.0 * (x * z + y * w)
+    matrices[..., 2, 1] = 2.0 * (y * z - x * w)
+    matrices[..., 2, 2] = 1.0 - 2.0 * (x * x + y * y)
+
+    return matrices
+
+
+def matrixToQuaternion(matrices):
+    # Rotation part of (..., 3, 3) or (..., 4, 4) matrices, built from the
+    # largest of w, x, y and z so the square root never gets close to zero
+    m = np.asarray(matrices)[..., :3, :3]
+    m00, m01, m02 = m[..., 0, 0], m[..., 0, 1], m[..., 0, 2]
+    m10, m11, m12 = m[..., 1, 0], m[..., 1, 1], m[..., 1, 2]
+    m20, m21, m22 = m[..., 2, 0], m[..., 2, 1], m[..., 2, 2]
+
+    candidates = np.stack((m00 - m11 - m22, m11 - m00 - m22, m22 - m00 - m11, m00 + m11 + m22), axis=-1)
+    largest = np.argmax(candidates, axis=-1)
+    s = 2.0 * np.sqrt(np.maximum(1.0 + np.take_along_axis(candidates, largest[..., None], axis=-1)[..., 0], 1e-12))
+
+    q = np.zeros(m.shape[:-2] + (4,), dtype=np.result_type(m, np.float32))
+    cases = (
+        (s / 4.0, (m01 + m10) / s, (m20 + m02) / s, (m12 - m21) / s),
+        ((m01 + m10) / s, s / 4.0, (m21 + m12) / s, (m20 - m02) / s),
+        ((m20 + m02) / s, (m21 + m12) / s, s / 4.0, (m01 - m10) / s),
+        ((m12 - m21) / s, (m20 - m02) / s, (m01 - m10) / s, s / 4.0),
+    )
+    for case, components in enumerate(cases):
+        rows = largest == case
+        q[rows] = np.stack(components, axis=-1)[rows]
+
+    return q
+
+
+def eulerToQuaternion(angles, rotateOrder=0):
+    # angles is (..., joints, 3) in degrees, rotateOrder one value or one per joint.
+    # The three axis rotations multiplied out, with the sign of the cross terms
+    # flipped for the orders that run against x, y, z
+    angles = np.asarray(angles, dtype=np.float64)
+    rotateOrder = np.broadcast_to(np.asarray(rotateOrder, dtype=np.intc), angles.shape[-2:-1])
+    halves = np.radians(angles) / 2.0
+    c = np.cos(halves)
+    s = np.sin(halves)
+
+    q = np.zeros(angles.shape[:-1] + (4,))
+    for order in np.unique(rotateOrder):
+        joints = rotateOrder == order
+        i, j, k = rotateOrderAxes[order]
+        sign = 1.0 if order < 3 else -1.0
+        ci, cj, ck = c[..., joints, i], c[..., joints, j], c[..., joints, k]
+        si, sj, sk = s[..., joints, i], s[..., joints, j], s[..., joints, k]
+
+        q[..., joints, i] = si * cj * ck - sign * ci * sj * sk
+        q[..., joints, j] = ci * sj * ck + sign * si * cj * sk
+        q[..., joints, k] = ci * cj * sk - sign * si * sj * ck
+        q[..., joints, 3] = ci * cj * ck + sign * si * sj * sk
+
+    return q
+
+
+def matrixElement(q, row, column):
+    # One element of quaternionToMatrix, from the x, y, z, w components
+    if row == column:
+        return 1.0 - 2.0 * (q[(row + 1) % 3] ** 2 + q[(row + 2) % 3] ** 2)
+
+    sign = 1.0 if (column - row) % 3 == 1 else -1.0
+    return 2.0 * (q[row] * q[column] + sign * q[3 - row - column] * q[3])
+
+
+def quaternionToEuler(q, rotateOrder=0, previous=None, unwrap=True):
+    # Like euler.matrixToEuler on (frames, joints, 4) or (joints, 4) quaternions,
+    # only the matrix elements the rotate order needs are worked out
+    q = np.asarray(q, dtype=np.float64)
+    rotateOrder = np.broadcast_to(np.asarray(rotateOrder, dtype=np.intc), q.shape[-2:-1])
+
+    angles = np.zeros(q.shape[:-1] + (3,))
+    for order in np.unique(rotateOrder):
+        joints = rotateOrder == order
+        components = np.moveaxis(q[..., joints, :], -1, 0)
+        for axis, radians in zip(rotateOrderAxes[order], euler.orderAngles(lambda row, column: matrixElement(components, row, column), order)):
+            angles[..., joints, axis] = np.degrees(radians)
+
+    if not unwrap:
+        return angles
+
+    return euler.unwrapAngles(angles, rotateOrder, previous)
+
+
+def asQuaternions(rotations):
+    # Per-joint matrices are converted, (joints, 4) arrays are taken as quaternions
+    rotations = np.asarray(rotations)
+    if rotations.ndim >= 3 and rotations.shape[-2:] in ((3, 3), (4, 4)):
+        return matrixToQuaternion(rotations)
+
+    return rotations
+
+
+class QuaternionSourceBind(object):
+    # Same as bindCache.SourceBind, worldRot = left * keyRot * right
+
+    def __init__(self, sOrient, sBindposeRot, sParentMat):
+        self.sOrient = asQuaternions(sOrient)
+        self.sBindposeRot = asQuaternions(sBindposeRot)
+        self.sParentMat = asQuaternions(sParentMat)
+
+        self.left = multiply(multiply(conjugate(self.sOrient), conjugate(self.sParentMat)), conjugate(self.sBindposeRot))
+        self.right = multiply(self.sParentMat, self.sOrient)
+
+    def worldRotations(self, keyRot):
+        return multiply(multiply(self.left, keyRot), self.right)
+
+
+class QuaternionTargetBind(object):
+    # Same as bindCache.TargetBind, targetRot = left * worldRot * right
+
+    def __init__(self, tOrient, tBindposeRot, tParentMat):
+        self.tOrient = asQuaternions(tOrient)
+        self.tBindposeRot = asQuaternions(tBindposeRot)
+        self.tParentMat = asQuaternions(tParentMat)
+
+        self.left = multiply(multiply(self.tBindposeRot, self.tOrient), self.tParentMat)
+        self.right = multiply(conjugate(self.tParentMat), conjugate(self.tOrient))
+
+    def targetRotations(self, worldRot):
+        return multiply(multiply(self.left, worldRot), self.right)
+
+
+class QuaternionBindCache(object):
+    # Drop-in for bindCache.BindCache, rotations are (frames, joints, 4) quaternions
+
+    def __init__(self, sOrient, sBindposeRot, sParentMat, tOrient, tBindposeRot, tParentMat):
+        self.source = QuaternionSourceBind(sOrient, sBindposeRot, sParentMat)
+        self.target = QuaternionTargetBind(tOrient, tBindposeRot, tParentMat)
+
+        self.left = multiply(self.target.left, self.source.left)
+        self.right = multiply(self.source.right, self.target.right)
+
+    def worldRotations(self, keyRot):
+        return self.source.worldRotations(keyRot)
+
+    def targetRotations(self, worldRot):
+        return self.target.targetRotations(worldRot)
+
+    def retarget(self, keyRot):
+        return multiply(multiply(self.left, keyRot), self.right)
+
+
+class QuaternionBatchCache(object):
+    # A batchTransfer.BatchCache on quaternions, every stacked target joint's
+    # left * keyRot * right is one 4x4 matrix, 16 multiplies a joint and frame
+
+    def __init__(self, cache, dtype=np.float32):
+        self.sourceIndex = cache.sourceIndex
+        self.bounds = cache.bounds
+
+        self.left = matrixToQuaternion(np.asarray(cache.left, dtype=np.float64))
+        self.right = matrixToQuaternion(np.asarray(cache.right, dtype=np.float64))
+        self.product = productMatrix(self.left, self.right).astype(dtype)
+
+    def gather(self, keyRot):
+        # Source quaternions lined up with the stacked target joints
+        return np.take(keyRot, self.sourceIndex, axis=-2)
+
+    def split(self, targetRot):
+        return [targetRot[..., start:stop, :] for start, stop in zip(self.bounds[:-1], self.bounds[1:])]
+
+    def retarget(self, keyRot):
+        # (frames, joints, 4) quaternions of the stacked target joints
+        return np.matmul(self.product, np.asarray(keyRot, dtype=self.product.dtype)[..., None])[..., 0]
@@ -0,0 +1,43 @@
+import numpy as np
+
+# Batched retarget math shared by the NumPy and SciPy transfers.
+#
+# Animated inputs are stacks of rotation matrices shaped (frames, joints, 4, 4),
+# data read at the bind pose is shaped (joints, 4, 4) and broadcasts over the
+# frames. Matrices follow Maya's row-vector convention, A * B in Maya is
+# np.matmul(A, B) here, and every joint is computed at once instead of one
+# joint and one frame at a time.
+
+
+def invertRotations(matrices, orthonormal=True):
+    # Rotation matrices are orthonormal, so the transpose is the inverse
+    if orthonormal:
+        return np.swapaxes(matrices, -1, -2)
+
+    return np.linalg.inv(matrices)
+
+
+def sourceWorldRotations(keyRot, sOrient, sBindposeRot, sParentMat, orthonormal=True):
+    # Isolate rotation
+    isolatedRotation = np.matmul(invertRotations(sBindposeRot, orthonormal), keyRot)
+
+    # World rotation
+    f1 = np.matmul(invertRotations(sOrient, orthonormal), invertRotations(sParentMat, orthonormal))
+    f2 = np.matmul(isolatedRotation, sParentMat)
+
+    return np.matmul(np.matmul(f1, f2), sOrient)
+
+
+def targetRotations(worldRot, tOrient, tBindposeRot, tParentMat, orthonormal=True):
+    # Calculate the rotation from the source relative to the target
+    f1 = np.matmul(np.matmul(tOrient, tParentMat), worldRot)
+    f2 = np.matmul(invertRotations(tParentMat, orthonormal), invertRotations(tOrient, orthonormal))
+
+    return np.matmul(tBindposeRot, np.matmul(f1, f2))
+
+
+def retargetRotations(keyRot, sOrient, sBindposeRot, sParentMat, tOrient, tBindposeRot, tParentMat, orthonormal=True):
+    # Source rotations of every frame and joint in, target rotations out
+    worldRot = sourceWorldRotations(keyRot, sOrient, sBindposeRot, sParentMat, orthonormal)
+
+    return targetRotations(worldRot, tOrient, tBindposeRot, tParentMat, orthonormal)
@@ -0,0 +1,87 @@
+import numpy as np
+
+from TransferCore import curveSampler
+
+# Times a transfer samples, retargets and keys at, planned from the key times
+# of the source curves instead of every frame of the clip. Hand-keyed clips
+# are sampled at their keys only, the retargeted keys go at the same times and
+# the curves interpolate between them. Baked clips, keyed on most frames of
+# the output rate, are sampled on that grid. Key times are kept as they are,
+# so sub-frame keys are sampled and keyed where they were set.
+
+# Share of the grid's frames that need a key before a clip counts as baked
+bakedDensity = 0.5
+
+sampleAttributes = curveSampler.rotateAttributes + curveSampler.translateAttributes
+
+
+def keyTimes(source, nodes, attributes=sampleAttributes):
+    # Every time any of the channels has a key, sorted and without repeats
+    times = []
+    for node in nodes:
+        for attribute in attributes:
+            keys = source.keys(node, attribute)
+            if keys is not None:
+                times.append(np.asarray(keys[0], dtype=np.float64))
+
+    if not times:
+        return np.zeros(0)
+
+    return np.unique(np.concatenate(times))
+
+
+def frameGrid(start, end, step=1.0):
+    # start to end every step, end included even off the grid
+    count = int(np.floor((end - start) / step + 1e-9)) + 1
+    grid = start + step * np.arange(max(count, 1))
+
+    return np.union1d(grid, [end])
+
+
+def fillGaps(times, maxGap):
+    # Evenly spaced times added in every gap longer than maxGap
+    pieces = [times[:1]]
+    for start, end in zip(times[:-1], times[1:]):
+        count = int(np.ceil((end - start) / maxGap - 1e-9))
+        pieces.append(np.linspace(start, end, max(count, 1) + 1)[1:])
+
+    return np.concatenate(pieces)
+
+
+class SamplingPlan(object):
+
+    def __init__(self, times, baked, gridCount):
+        self.times = times
+        self.baked = baked
+        self.gridCount = gridCount
+
+    def __len__(self):
+        return len(self.times)
+
+    def reduction(self):
+        # How many times fewer samples than keying every frame
+        return self.gridCount / float(max(len(self.times), 1))
+
+
+def planTimes(source, nodes, start=None, end=None, step=1.0, attributes=sampleAttributes, density=bakedDensity, maxGap=None):
+    # start and end default to the first and last key. maxGap bounds the
+    # distance between samples of a hand-keyed clip, for long holds that
+    # should follow the source more closely
+    keys = keyTimes(source, nodes, attributes)
+    if start is None:
+        start = keys[0] if len(keys) else 0.0
+    if end is None:
+        end = keys[-1] if len(keys) else start
+
+    grid = frameGrid(start, end, step)
+    keys = keys[(keys >= start) & (keys <= end)]
+
+    if len(keys) >= density * len(grid):
+        return SamplingPlan(grid, True, len(grid))
+
+    # The ends are always sampled, a range can start or stop between keys
+    times = np.union1d(keys, [start, end])
+    if maxGap:
+        times = fillGaps(times, maxGap)
+
+    return SamplingPlan(times, False, len(grid))
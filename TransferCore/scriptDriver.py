@@ -0,0 +1,171 @@
+import numpy as np
+
+from TransferCore import batchTransfer
+from TransferCore import benchmark
+from TransferCore import clipCache
+from TransferCore import curveSampler
+from TransferCore import incremental
+from TransferCore import instrument
+from TransferCore import jointMapping
+from TransferCore import keyWriter
+from TransferCore import lazyModule
+from TransferCore import samplingPlan
+from TransferCore import skeleton
+from TransferCore import streaming
+from TransferCore.bindCache import SourceBind, TargetBind
+
+# The transfer the NumPy and SciPy scripts run in Maya. settings is the script
+# module itself, every call reads its mappingMethod, mapFile, memoryBudget,
+# sampling, sampleStep, staticTolerance, precision, engine, keyTolerance,
+# keyInterpolation and clipCacheDir when it runs, so changing one in the
+# script takes effect on the next run. The timed runs read nrOfTimes,
+# resultPath, baselinePath and tracePath the same way.
+
+# Maya and PyMEL are imported on first use, importing this module does no work
+cmds = lazyModule.lazyImport('maya.cmds')
+pm = lazyModule.lazyImport('pymel.core')
+
+# Last transfer of every script, source and targets, for transferIncremental
+transferStates = {}
+
+
+def selectedRoots():
+    # Root joints, the first selected is the source and every other one a target
+    roots = pm.ls(sl=True, type='joint')
+
+    return roots[0], roots[1:]
+
+
+def clipLength(sRoot):
+    # Animation length, from the key count of the root's curves
+    return int(pm.keyframe(sRoot, q=True, kc=True) / 10)
+
+
+def sampleTimes(settings, sRoot, sourceNames):
+    # Times the clip is sampled, retargeted and keyed at
+    if settings.sampling == 'frames':
+        return np.arange(clipLength(sRoot))
+
+    return samplingPlan.planTimes(curveSampler.MayaCurveSource(), sourceNames, step=settings.sampleStep).times
+
+
+@instrument.timed('loadSkeleton')
+def loadSkeleton(root):
+    # Joints under the root in depth-first order and their bind values, in one query
+    return skeleton.fromMaya(str(root))
+
+
+def loadSkeletons(sRoot, tRoots):
+    # Bindposes are read before any key is set
+    cmds.currentTime(0)
+
+    return loadSkeleton(sRoot), [loadSkeleton(tRoot) for tRoot in tRoots]
+
+
+def loadClipCache(settings):
+    return clipCache.ClipCache(settings.clipCacheDir) if settings.clipCacheDir else None
+
+
+def loadCurveSource(settings, sourceNames, times):
+    # The scene's curves, or their samples from the clip cache when they have not changed
+    curveSource = curveSampler.MayaCurveSource()
+    if settings.clipCacheDir:
+        curveSource = clipCache.cachedSource(loadClipCache(settings), curveSource, sourceNames, times)
+
+    return curveSource
+
+
+def loadBinds(settings, source, targets):
+    # Rotation, orientation and parent matrices of every joint, from the skeleton arrays
+    with instrument.phase('loadBindpose'):
+        sBindposeRot, sKeyOrient, sParentMat = source.bindMatrices()
+    sourceBind = SourceBind(sKeyOrient, sBindposeRot, sParentMat)
+
+    # Only target joints with a matching source joint are computed and keyed
+    targetBinds = []
+    sourceIndices = []
+    targetNames = []
+    rotateOrders = []
+    for target in targets:
+        with instrument.phase('jointMapping'):
+            sourceIndex, targetIndex = jointMapping.withoutRoot(*jointMapping.buildMapping(
+                source.names, source.parents, target.names, target.parents, settings.mappingMethod, settings.mapFile))
+
+        with instrument.phase('loadBindpose'):
+            tBindposeRot, tKeyOrient, tParentMat = target.bindMatrices()
+        targetBinds.append(TargetBind(tKeyOrient[targetIndex], tBindposeRot[targetIndex], tParentMat[targetIndex]))
+        sourceIndices.append(sourceIndex)
+        targetNames.append([target.names[i + 1] for i in targetIndex])
+        rotateOrders.append(target.rotateOrder[1:][targetIndex])
+
+    targetRoots = [target.names[0] for target in targets]
+
+    return sourceBind, targetBinds, sourceIndices, targetNames, rotateOrders, targetRoots
+
+
+def transferData(settings, sRoot, tRoots):
+    source, targets = loadSkeletons(sRoot, tRoots)
+    sourceBind, targetBinds, sourceIndices, targetNames, rotateOrders, targetRoots = loadBinds(settings, source, targets)
+
+    # Sample, retarget, decompose and key the clip a window of frames at a time,
+    # long clips are split over threads inside Maya
+    cache = batchTransfer.BatchCache(sourceBind, targetBinds, sourceIndices)
+    times = sampleTimes(settings, sRoot, source.names)
+    result = streaming.streamTransfer(loadCurveSource(settings, source.names, times), keyWriter.MayaCurveStore(), source.names,
+                                      source.rotateOrder[1:], cache, targetNames, rotateOrders, targetRoots, times,
+                                      settings.memoryBudget, settings.precision, settings.staticTolerance, settings.keyTolerance,
+                                      settings.keyInterpolation, settings.engine, resultCache=loadClipCache(settings),
+                                      skeletonKeys=[source.key()] + [target.key() for target in targets], mode='thread')
+
+    for tRoot in tRoots:
+        tRoot.setOrientation(sRoot.getOrientation())
+
+    pm.currentTime(0)
+
+    # Window count and the static joints that were keyed once
+    return result
+
+
+def transferIncremental(settings, sRoot, tRoots):
+    # Reruns only rekey the joints and frames whose source keys changed since
+    # the last run on the same roots, the source skeleton is loaded on the first run
+    key = (settings.__name__, str(sRoot)) + tuple(str(tRoot) for tRoot in tRoots)
+    if key not in transferStates:
+        transferStates[key] = incremental.TransferState()
+        transferStates[key].hierarchy = loadSkeletons(sRoot, tRoots)[0]
+
+    state = transferStates[key]
+    source = state.hierarchy
+
+    times = sampleTimes(settings, sRoot, source.names)
+    report = incremental.transferIncremental(state, loadCurveSource(settings, source.names, times), keyWriter.MayaCurveStore(),
+                                             source.names, source.parents, source.rotateOrder[1:],
+                                             lambda: loadBinds(settings, *loadSkeletons(sRoot, tRoots)), times,
+                                             loadClipCache(settings), [source.key()])
+
+    for tRoot in tRoots:
+        tRoot.setOrientation(sRoot.getOrientation())
+
+    pm.currentTime(0)
+    return report
+
+
+def runTimed(settings, name, sRoot=None, tRoots=None):
+    # Timed transfers of the selected roots, or the ones given, saved under name
+    if sRoot is None:
+        sRoot, tRoots = selectedRoots()
+
+    if settings.tracePath:
+        instrument.enable(allocations=True)
+
+    # Warm-up runs first, then median, p95 and spread with the machine and library versions
+    results = benchmark.runScene(name, lambda: transferData(settings, sRoot, tRoots), lambda: pm.currentTime(0),
+                                 repeats=settings.nrOfTimes, warmups=1)
+    benchmark.saveResults(results, settings.resultPath, settings.baselinePath)
+
+    if settings.tracePath:
+        instrument.report()
+        instrument.writeChromeTrace(settings.tracePath)
+        instrument.disable()
+
+    return results
@@ -0,0 +1,161 @@
+import hashlib
+
+import numpy as np
+
+from TransferCore import euler
+from TransferCore import hierarchy
+
+# A joint hierarchy as parallel arrays in depth-first order, root first: parent
+# index, depth, rotate order, and the rotate, orient and translate values at
+# the bind frame, in degrees and scene units, with a name index for lookups.
+# It is built once per transfer in one bulk query, from Maya or from anything
+# with the same attributes, and handed to the transfer code instead of lists
+# of node wrappers. The arrays are read-only, so a skeleton hashes by content,
+# pickles into worker processes as plain arrays and is sliced into subsets.
+
+attributes = ('names', 'parents', 'rotateOrder', 'rotate', 'orient', 'translate')
+
+
+def frozen(array, dtype, shape=None):
+    array = np.array(array, dtype=dtype)
+    if shape is not None:
+        array = array.reshape(shape)
+    array.flags.writeable = False
+
+    return array
+
+
+class Skeleton(object):
+
+    def __init__(self, names, parents, rotateOrder=0, rotate=None, orient=None, translate=None):
+        self.names = tuple(str(name) for name in names)
+        count = len(self.names)
+
+        self.parents = frozen(parents, np.intc)
+        if self.parents.shape != (count,):
+            raise ValueError("%d joints but %d parents" % (count, self.parents.size))
+        if np.any(self.parents >= np.arange(count)):
+            raise ValueError("every parent must come before its children")
+
+        self.depth = frozen(hierarchy.jointDepths(self.parents), np.intc)
+        self.rotateOrder = frozen(np.broadcast_to(np.asarray(rotateOrder, dtype=np.intc), (count,)), np.intc)
+        self.rotate = frozen(np.zeros((count, 3)) if rotate is None else rotate, np.float64, (count, 3))
+        self.orient = frozen(np.zeros((count, 3)) if orient is None else orient, np.float64, (count, 3))
+        self.translate = frozen(np.zeros((count, 3)) if translate is None else translate, np.float64, (count, 3))
+
+        self.nameIndex = dict((name, i) for i, name in enumerate(self.names))
+        self.hashKey = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __reduce__(self):
+        # Pickled as its arrays, the depth and name index are rebuilt
+        return Skeleton, tuple(getattr(self, attribute) for attribute in attributes)
+
+    def key(self):
+        # Content hash of the names and arrays, for caches keyed on the hierarchy
+        if self.hashKey is None:
+            digest = hashlib.sha1('\0'.join(self.names).encode('utf-8'))
+            for attribute in attributes[1:]:
+                digest.update(np.ascontiguousarray(getattr(self, attribute)).tobytes())
+            self.hashKey = digest.hexdigest()
+
+        return self.hashKey
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __eq__(self, other):
+        return isinstance(other, Skeleton) and self.key() == other.key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def index(self, names):
+        # Joint indices of names, KeyError for a name that is not in the skeleton
+        return np.array([self.nameIndex[name] for name in names], dtype=np.intc)
+
+    def subset(self, joints):
+        # The joints, a mask or indices, in skeleton order. A joint whose
+        # parent is left out hangs from its nearest kept ancestor, or is a root
+        keep = np.zeros(len(self), dtype=bool)
+        keep[joints] = True
+
+        newIndex = np.full(len(self), -1, dtype=np.intc)
+        newIndex[keep] = np.arange(keep.sum())
+
+        # Nearest kept joint at or above every joint, parents come first
+        above = np.full(len(self), -1, dtype=np.intc)
+        for i, parent in enumerate(self.parents):
+            above[i] = i if keep[i] else (above[parent] if parent >= 0 else -1)
+
+        parents = np.where(self.parents >= 0, above[np.maximum(self.parents, 0)], -1)
+        parents = np.where(parents >= 0, newIndex[parents], -1)[keep]
+
+        return Skeleton([name for name, isKept in zip(self.names, keep) if isKept], parents, self.rotateOrder[keep],
+                        self.rotate[keep], self.orient[keep], self.translate[keep])
+
+    def bindMatrices(self, dtype=np.float32):
+        # Rotation, orientation and accumulated parent matrix of every joint,
+        # the root is not part of the arrays, as SourceBind and TargetBind take them
+        rotateMat = euler.eulerToMatrix(self.rotate, self.rotateOrder, 4).astype(dtype)
+        orientMat = euler.eulerToMatrix(self.orient, 0, 4).astype(dtype)
+        parentMat = hierarchy.parentMatrices(np.matmul(rotateMat, orientMat), self.parents)
+
+        return rotateMat[1:], orientMat[1:], parentMat[1:]
+
+    def toDict(self):
+        return {'names': list(self.names), 'parents': self.parents.tolist(), 'rotateOrder': self.rotateOrder.tolist(),
+                'rotate': self.rotate.tolist(), 'orient': self.orient.tolist(), 'translate': self.translate.tolist()}
+
+    @staticmethod
+    def fromDict(data):
+        return Skeleton(data['names'], data['parents'], data['rotateOrder'], data['rotate'], data['orient'], data.get('translate'))
+
+
+def asSkeleton(source):
+    # A skeleton from anything with the same attributes, such as a fake adapter
+    if isinstance(source, Skeleton):
+        return source
+
+    return Skeleton(*[getattr(source, attribute, None) for attribute in attributes])
+
+
+def fromMaya(root):
+    # The joints under root and their values at the current time, in Maya. The
+    # hierarchy is one ls in depth-first order and the values are read through
+    # one selection list, without a node wrapper per joint
+    import maya.api.OpenMaya as om
+    import maya.cmds as cmds
+
+    paths = cmds.ls(root, dag=True, type='joint', long=True)
+    names = cmds.ls(paths)
+
+    # The parent is the nearest joint up the path, joints under other transforms included
+    index = dict((path, i) for i, path in enumerate(paths))
+    parents = []
+    for path in paths:
+        parent = path.rsplit('|', 1)[0]
+        while parent and parent not in index:
+            parent = parent.rsplit('|', 1)[0]
+        parents.append(index.get(parent, -1))
+
+    selection = om.MSelectionList()
+    for path in paths:
+        selection.add(path)
+
+    count = len(paths)
+    rotateOrder = np.zeros(count, dtype=np.intc)
+    values = np.zeros((3, count, 3))
+    for i in range(count):
+        node = om.MFnDependencyNode(selection.getDependNode(i))
+        rotateOrder[i] = node.findPlug('rotateOrder', False).asInt()
+        for a, attribute in enumerate(('rotate', 'jointOrient', 'translate')):
+            plug = node.findPlug(attribute, False)
+            values[a, i] = [plug.child(c).asDouble() for c in range(3)]
+
+    # Plugs hold internal units, radians and centimeters
+    toUnits = om.MDistance(1.0, om.MDistance.kCentimeters).asUnits(om.MDistance.uiUnit())
+
+    return Skeleton(names, parents, rotateOrder, np.degrees(values[0]), np.degrees(values[1]), values[2] * toUnits)
@@ -0,0 +1,104 @@
+import numpy as np
+
+from TransferCore import euler
+from TransferCore import instrument
+from TransferCore import keyWriter
+
+# Source joints whose sampled rotation never moves, twist helpers, unused
+# fingers, locked props, are found from the range of their samples over the
+# whole clip. A target joint following one of them has a constant rotation
+# too, so it is retargeted on one frame, keyed once at the first time and
+# left out of the per-frame math and key writes.
+
+constant = 0
+nearConstant = 1
+animated = 2
+
+labels = ('constant', 'nearConstant', 'animated')
+
+# Degrees a rotate channel may move and still count as near-constant
+defaultTolerance = 1e-3
+
+
+class JointRanges(object):
+    # Running minimum and maximum of every joint's rotate channels, window by window
+
+    def __init__(self):
+        self.low = None
+        self.high = None
+        self.first = None
+
+    def update(self, rotations):
+        # rotations is (frames, joints, 3)
+        if not len(rotations):
+            return
+
+        low = rotations.min(axis=0)
+        high = rotations.max(axis=0)
+        if self.low is None:
+            self.low, self.high, self.first = low, high, np.array(rotations[0])
+        else:
+            np.minimum(self.low, low, out=self.low)
+            np.maximum(self.high, high, out=self.high)
+
+    def ranges(self):
+        # Largest peak to peak of the three channels of every joint
+        return (self.high - self.low).max(axis=-1)
+
+
+def sampleRanges(samples):
+    # Ranges over windows of (times, rotations, rootTranslations) from streaming.sampleWindows
+    ranges = JointRanges()
+    for times, rotations, rootTranslations in samples:
+        ranges.update(rotations)
+
+    return ranges
+
+
+def classify(ranges, tolerance=defaultTolerance):
+    kinds = np.full(len(ranges), animated, dtype=np.intc)
+    kinds[ranges <= tolerance] = nearConstant
+    kinds[ranges == 0.0] = constant
+
+    return kinds
+
+
+def writeStatic(store, cache, rotateOrder, rotations, static, targetNames, rotateOrders, time):
+    # One key at time for every static target joint. rotations is one frame
+    # of every source joint, root first, static a mask of the stacked target joints
+    keyRot = euler.eulerToMatrix(rotations[None, 1:], rotateOrder, 4).astype(np.float32)
+
+    for names, order, targetRot, start, stop in zip(targetNames, rotateOrders, cache.retarget(keyRot), cache.bounds[:-1], cache.bounds[1:]):
+        joints = static[start:stop]
+        if not joints.any():
+            continue
+
+        angles = euler.matrixToEuler(targetRot[:, joints], np.asarray(order)[joints])
+        keyWriter.writeRotations(store, [name for name, isStatic in zip(names, joints) if isStatic], [time], angles)
+
+
+def moving(cache, targetNames, rotateOrders, static):
+    # The cache, names and rotate orders without the static target joints
+    names = []
+    orders = []
+    for targetName, order, start, stop in zip(targetNames, rotateOrders, cache.bounds[:-1], cache.bounds[1:]):
+        joints = ~static[start:stop]
+        names.append([name for name, isMoving in zip(targetName, joints) if isMoving])
+        orders.append(np.asarray(order)[joints])
+
+    return cache.subset(~static), names, orders
+
+
+def report(kinds, static, frames):
+    # Source joints of every kind and the target work left out
+    skipped = int(static.sum())
+    summary = dict((label, int((kinds == kind).sum())) for kind, label in enumerate(labels))
+    summary.update({
+        'staticTargets': skipped,
+        'targetJoints': len(static),
+        'skippedJointFrames': skipped * max(frames - 1, 0),
+        'skippedKeys': skipped * 3 * max(frames - 1, 0),
+    })
+    instrument.count('skippedKeys', summary['skippedKeys'])
+
+    return summary
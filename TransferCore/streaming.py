@@ -0,0 +1,237 @@
+import numpy as np
+
+from TransferCore import clipCache
+from TransferCore import curveReduction
+from TransferCore import curveSampler
+from TransferCore import euler
+from TransferCore import instrument
+from TransferCore import kernel
+from TransferCore import keyWriter
+from TransferCore import parallel
+from TransferCore import quaternion
+from TransferCore import staticChannels
+
+# Long clips are transferred a window of frames at a time through a chain of
+# generators, sample, retarget, decompose and write, so only one window of
+# samples, matrices and angles is alive at once whatever the clip length. The
+# bind data is computed once, in the cache, and used by every window, and the
+# last angles of a window are carried over so the next one unwraps against them.
+# With a precision the retarget runs in a kernel whose buffers are sized for one
+# window and reused by the next. With a static tolerance the target joints that
+# follow a source joint that never moves are keyed once and left out. With a
+# key tolerance every window's channels are reduced to the fewest keys that stay
+# within it before they are written, the ends of every window are always keys.
+# With a result cache the keys written are stored under the source keys, binds,
+# mapping and options, and a transfer that finds them replays them instead.
+
+# How the key rotations are converted and retargeted when there is no precision
+# for the kernel, the quaternion engine goes from angles to quaternions and back
+engines = ('matrix', 'scipy', 'quaternion')
+
+# Bytes of window data kept alive by default
+defaultBudget = 256 * 1024 * 1024
+
+
+def bytesPerFrame(sourceJoints, targetJoints, itemSize=4):
+    # Samples and angles are float64, matrices itemSize, gathered keys, results
+    # and the product between them are alive together
+    return sourceJoints * (3 * 8 + 16 * itemSize) + targetJoints * (3 * 16 * itemSize + 2 * 3 * 8)
+
+
+def windowSize(memoryBudget, sourceJoints, targetJoints, itemSize=4):
+    return max(1, int(memoryBudget // bytesPerFrame(sourceJoints, targetJoints, itemSize)))
+
+
+def frameWindows(times, size):
+    times = np.asarray(times)
+    for start in range(0, len(times), size):
+        yield times[start:start + size]
+
+
+def sampleWindows(source, sourceNames, windows):
+    # Rotations of every source joint and the root translation, in UI units
+    for times in windows:
+        with instrument.phase('sample'):
+            rotations = curveSampler.sampleChannels(source, sourceNames, curveSampler.rotateAttributes, times)
+            rootTranslations = curveSampler.sampleChannels(source, sourceNames[:1], curveSampler.translateAttributes, times)[:, 0]
+
+        yield times, rotations, rootTranslations
+
+
+def retargetWindows(cache, rotateOrder, samples, retargetKernel=None, engine='matrix', **parallelOptions):
+    # cache is a BatchCache, rotateOrder the source joints' without the root.
+    # The scipy engine builds the key matrices with scipy's Rotation, the
+    # quaternion engine yields quaternions instead of matrices
+    toMatrix = euler.scipyEulerToMatrix if engine == 'scipy' else euler.eulerToMatrix
+    quaternionCache = quaternion.QuaternionBatchCache(cache) if engine == 'quaternion' and retargetKernel is None else None
+    for times, rotations, rootTranslations in samples:
+        if retargetKernel is not None:
+            with instrument.phase('retarget'):
+                targetRots = retargetKernel.retarget(rotations, **parallelOptions)
+
+            yield times, rotations[:, 0], rootTranslations, targetRots
+            continue
+
+        if quaternionCache is not None:
+            with instrument.phase('eulerToQuaternion'):
+                keyRot = quaternion.eulerToQuaternion(rotations[:, 1:], rotateOrder).astype(np.float32)
+
+            with instrument.phase('retarget'):
+                targetRots = quaternionCache.split(quaternionCache.retarget(quaternionCache.gather(keyRot)))
+            del keyRot
+
+            yield times, rotations[:, 0], rootTranslations, targetRots
+            continue
+
+        with instrument.phase('eulerToMatrix'):
+            keyRot = toMatrix(rotations[:, 1:], rotateOrder, 4).astype(np.float32)
+
+        with instrument.phase('retarget'):
+            targetRots = cache.split(parallel.retargetFrames(cache, cache.gather(keyRot), **parallelOptions))
+        del keyRot
+
+        yield times, rotations[:, 0], rootTranslations, targetRots
+
+
+def decomposeWindows(rotateOrders, windows, quaternions=False):
+    # Euler angles per target, unwrapped across window borders, from quaternions
+    # if the windows hold them
+    toEuler = quaternion.quaternionToEuler if quaternions else euler.matrixToEuler
+    previous = [None] * len(rotateOrders)
+    for times, rootRotations, rootTranslations, targetRots in windows:
+        angles = []
+        with instrument.phase('matrixToEuler'):
+            for i, (rotateOrder, targetRot) in enumerate(zip(rotateOrders, targetRots)):
+                angles.append(toEuler(targetRot, rotateOrder, previous[i]))
+                if len(times):
+                    previous[i] = angles[-1][-1]
+
+        yield times, rootRotations, rootTranslations, angles
+
+
+def reduceWindow(times, rootRotations, rootTranslations, angles, tolerance, interpolation, workers=1):
+    # Every channel of the window fitted at once, the root's first, then every
+    # target's joints. Returns the keep masks and slopes split the same way
+    channels = [rootRotations, rootTranslations] + [targetAngles.reshape(len(times), -1) for targetAngles in angles]
+    keep, slopes = curveReduction.fitChannels(times, np.concatenate(channels, axis=1), tolerance, interpolation, workers)
+
+    bounds = np.cumsum([0] + [channel.shape[1] for channel in channels])
+    split = lambda array: None if array is None else [array[:, start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    return split(keep), split(slopes)
+
+
+def writeReducedWindow(store, targetNames, targetRoots, times, rootRotations, rootTranslations, angles, keep, slopes, interpolation):
+    slopes = slopes or [None] * len(keep)
+    for i, (names, root, targetAngles) in enumerate(zip(targetNames, targetRoots, angles)):
+        targetKeep = keep[i + 2].reshape(targetAngles.shape)
+        targetSlopes = None if slopes[i + 2] is None else slopes[i + 2].reshape(targetAngles.shape)
+        for j, node in enumerate(names):
+            keyWriter.writeReduced(store, node, keyWriter.rotateAttributes, times, targetAngles[:, j], targetKeep[:, j],
+                                   None if targetSlopes is None else targetSlopes[:, j], interpolation)
+        keyWriter.writeReduced(store, root, keyWriter.rotateAttributes, times, rootRotations, keep[0], slopes[0], interpolation)
+        keyWriter.writeReduced(store, root, keyWriter.translateAttributes, times, rootTranslations, keep[1], slopes[1], interpolation)
+
+
+def writeWindows(store, targetNames, targetRoots, windows, keyTolerance=None, keyInterpolation='linear', workers=1):
+    # Every window merges its keys into the curves the earlier ones wrote, a
+    # reduced window keeps its first and last frame so the clip stays in tolerance
+    for times, rootRotations, rootTranslations, angles in windows:
+        if keyTolerance is not None and len(times):
+            with instrument.phase('reduceKeys'):
+                keep, slopes = reduceWindow(times, rootRotations, rootTranslations, angles, keyTolerance, keyInterpolation, workers)
+
+            with instrument.phase('writeKeys'):
+                writeReducedWindow(store, targetNames, targetRoots, times, rootRotations, rootTranslations, angles,
+                                   keep, slopes, keyInterpolation)
+
+            yield times
+            continue
+
+        with instrument.phase('writeKeys'):
+            for names, root, targetAngles in zip(targetNames, targetRoots, angles):
+                keyWriter.writeRotations(store, names, times, targetAngles)
+                keyWriter.writeChannels(store, root, keyWriter.rotateAttributes, times, rootRotations)
+                keyWriter.writeChannels(store, root, keyWriter.translateAttributes, times, rootTranslations)
+
+        yield times
+
+
+def streamTransfer(source, store, sourceNames, rotateOrder, cache, targetNames, rotateOrders, targetRoots, times,
+                   memoryBudget=None, precision=None, staticTolerance=None, keyTolerance=None, keyInterpolation='linear',
+                   engine='matrix', resultCache=None, skeletonKeys=(), **parallelOptions):
+    # Source joints from the root down, every target's mapped joints and their
+    # rotate orders lined up with the cache. Without a budget the clip is one
+    # window, with a precision, 'float32' or 'float64', it runs in the kernel.
+    # With a key tolerance the written curves are reduced, keyInterpolation is
+    # 'linear' or 'bezier'. engine, 'matrix', 'scipy' or 'quaternion', converts
+    # and retargets the key rotations when there is no precision. resultCache is a ClipCache, the
+    # skeletons' keys go into its key. Returns the window count and, with a
+    # static tolerance, what was skipped
+    times = np.asarray(times)
+    if engine not in engines:
+        raise ValueError("engine must be one of %s, not %r" % (engines, engine))
+    if keyTolerance is not None and keyInterpolation not in curveReduction.interpolations:
+        raise ValueError("keyInterpolation must be one of %s, not %r" % (curveReduction.interpolations, keyInterpolation))
+
+    resultKey = None
+    if resultCache is not None:
+        with instrument.phase('resultCache'):
+            contentHash = clipCache.sourceHash(source, sourceNames, clipCache.sampleAttributes, times)
+            resultKey = clipCache.resultKey('stream', contentHash,
+                                            [cache.left, cache.right, cache.sourceIndex, cache.bounds, np.asarray(rotateOrder)] +
+                                            [np.asarray(order) for order in rotateOrders],
+                                            [[list(names) for names in targetNames], list(targetRoots)], skeletonKeys,
+                                            memoryBudget=memoryBudget, precision=precision, staticTolerance=staticTolerance,
+                                            keyTolerance=keyTolerance, keyInterpolation=keyInterpolation, engine=engine)
+            entry = resultCache.get(resultKey)
+
+        if entry is not None:
+            with instrument.phase('writeKeys'):
+                return dict(clipCache.replayResult(entry, store), cached=True)
+        store = clipCache.RecordingStore(store)
+
+    # Windows merge their keys into the curves, what was there before goes first
+    with instrument.phase('writeKeys'):
+        keyWriter.clearTargets(store, targetNames, targetRoots)
+
+    size = len(times) or 1
+    if memoryBudget is not None:
+        size = windowSize(memoryBudget, len(sourceNames), len(cache.sourceIndex), np.dtype(np.float32).itemsize)
+
+    samples = None
+    result = {}
+    if staticTolerance is not None and len(times):
+        with instrument.phase('staticChannels'):
+            # Classified over the whole clip, clips longer than a window are sampled twice
+            windows = sampleWindows(source, sourceNames, frameWindows(times, size))
+            if size >= len(times):
+                windows = samples = list(windows)
+            ranges = staticChannels.sampleRanges(windows)
+
+            kinds = staticChannels.classify(ranges.ranges()[1:], staticTolerance)
+            static = kinds[cache.sourceIndex] != staticChannels.animated
+            staticChannels.writeStatic(store, cache, rotateOrder, ranges.first, static, targetNames, rotateOrders, times[0])
+            cache, targetNames, rotateOrders = staticChannels.moving(cache, targetNames, rotateOrders, static)
+            result['static'] = staticChannels.report(kinds, static, len(times))
+
+    retargetKernel = None if precision is None else kernel.RetargetKernel(cache, rotateOrder, precision)
+    if memoryBudget is not None and retargetKernel is not None and samples is None:
+        # Samples and angles stay float64 around the kernel's buffers
+        size = max(1, int(memoryBudget // (retargetKernel.bytesPerFrame() + len(sourceNames) * 3 * 8 + len(cache.sourceIndex) * 2 * 3 * 8)))
+
+    if samples is None:
+        samples = sampleWindows(source, sourceNames, frameWindows(times, size))
+    retargeted = retargetWindows(cache, rotateOrder, samples, retargetKernel, engine, **parallelOptions)
+    decomposed = decomposeWindows(rotateOrders, retargeted, engine == 'quaternion' and retargetKernel is None)
+
+    result['windows'] = 0
+    for written in writeWindows(store, targetNames, targetRoots, decomposed, keyTolerance, keyInterpolation,
+                                parallelOptions.get('workers') or 1):
+        result['windows'] += 1
+
+    if resultKey is not None:
+        with instrument.phase('resultCache'):
+            clipCache.storeResult(resultCache, resultKey, store, contentHash, result)
+
+    return result
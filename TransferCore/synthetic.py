@@ -0,0 +1,272 @@
+import numpy as np
+
+from TransferCore import batchTransfer
+from TransferCore import curveSampler
+from TransferCore import euler
+from TransferCore import hierarchy
+from TransferCore import incremental
+from TransferCore import instrument
+from TransferCore import jointMapping
+from TransferCore import keyWriter
+from TransferCore import streaming
+from TransferCore.bindCache import SourceBind, TargetBind
+from TransferCore.skeleton import Skeleton
+
+# Skeletons and animation made up from a seed, for load tests without Maya or
+# a hand-built scene. A FakeScene puts them behind the same curve source and
+# curve store the Maya scripts read from and write to, so transferScene runs
+# the scripts' pipeline, sampling, retarget, Euler decomposition and keying,
+# on any skeleton size and clip length.
+
+
+def randomParents(jointCount, maxDepth=None, branching=3, rng=None):
+    # Random tree in depth-first order, no joint deeper than maxDepth or with
+    # more than branching children. Joint 0 is the root
+    rng = rng if rng is not None else np.random.default_rng(0)
+    maxDepth = maxDepth if maxDepth is not None else jointCount
+    if branching < 2 and maxDepth < jointCount - 1:
+        raise ValueError("a chain of %d joints is deeper than %d" % (jointCount, maxDepth))
+
+    children = [[] for i in range(jointCount)]
+    depths = [0]
+    openJoints = [0]
+    for joint in range(1, jointCount):
+        if not openJoints:
+            raise ValueError("%d joints do not fit in depth %d with %d children each" % (jointCount, maxDepth, branching))
+
+        slot = rng.integers(len(openJoints))
+        parent = openJoints[slot]
+        children[parent].append(joint)
+        depths.append(depths[parent] + 1)
+
+        if len(children[parent]) >= branching:
+            openJoints[slot] = openJoints[-1]
+            openJoints.pop()
+        if depths[joint] < maxDepth:
+            openJoints.append(joint)
+
+    order, parents = hierarchy.flattenHierarchy(0, lambda joint: children[joint])
+
+    return parents
+
+
+def balancedParents(depth, branching):
+    # Full tree, every joint above depth has branching children
+    count = [1]
+
+    def getChildren(joint):
+        level, index = joint
+        if level >= depth:
+            return []
+        start = count[0]
+        count[0] += branching
+        return [(level + 1, start + i) for i in range(branching)]
+
+    order, parents = hierarchy.flattenHierarchy((0, 0), getChildren)
+
+    return parents
+
+
+class SyntheticSkeleton(Skeleton):
+    # Random orients and bindposes, angles in degrees like the Maya attributes
+
+    def __init__(self, parents, rotateOrder=0, orientRange=90.0, bindRange=30.0, prefix='', seed=0):
+        rng = np.random.default_rng(seed)
+
+        count = len(parents)
+        if isinstance(rotateOrder, str) and rotateOrder == 'random':
+            rotateOrder = rng.integers(0, 6, count)
+
+        orient = rng.uniform(-orientRange, orientRange, (count, 3))
+        rotate = rng.uniform(-bindRange, bindRange, (count, 3))
+        translate = rng.uniform(-10.0, 10.0, (count, 3))
+
+        Skeleton.__init__(self, ['%sjoint%d' % (prefix, i) for i in range(count)], parents, rotateOrder, rotate, orient, translate)
+
+
+def makeSkeleton(jointCount=50, maxDepth=None, branching=3, rotateOrder='random', orientRange=90.0,
+                 bindRange=30.0, prefix='', seed=0):
+    rng = np.random.default_rng(seed)
+    parents = randomParents(jointCount, maxDepth, branching, rng)
+
+    return SyntheticSkeleton(parents, rotateOrder, orientRange, bindRange, prefix, seed + 1)
+
+
+class ProceduralAnimation(object):
+    # Every rotate channel is a few sines of random frequency and phase, a
+    # smooth noise that is the same whichever frames are asked for, so long
+    # clips can be made in pieces. A staticShare of the joints below the root
+    # hold still, like twist helpers and unused fingers
+
+    def __init__(self, jointCount, amplitude=45.0, frequencies=(0.002, 0.05), octaves=3, seed=0, staticShare=0.0):
+        rng = np.random.default_rng(seed)
+
+        shape = (octaves, jointCount, 3)
+        self.amplitude = amplitude / np.arange(1, octaves + 1)[:, None, None] * rng.uniform(0.5, 1.0, shape)
+        self.frequency = 2.0 * np.pi * rng.uniform(frequencies[0], frequencies[1], shape)
+        self.phase = rng.uniform(0.0, 2.0 * np.pi, shape)
+        self.offset = rng.uniform(-amplitude, amplitude, (jointCount, 3))
+
+        # Root moves forward with a little sway
+        self.speed = rng.uniform(0.5, 2.0)
+
+        if staticShare:
+            static = rng.random(jointCount) < staticShare
+            static[0] = False
+            self.amplitude[:, static] = 0.0
+
+    def rotations(self, times, dtype=np.float64):
+        # (frames, joints, 3) rotations in degrees
+        times = np.asarray(times, dtype=np.float64)
+        rotations = np.empty((len(times),) + self.offset.shape, dtype=dtype)
+        rotations[...] = self.offset
+
+        for octave in range(len(self.amplitude)):
+            rotations += self.amplitude[octave] * np.sin(times[:, None, None] * self.frequency[octave] + self.phase[octave])
+
+        return rotations
+
+    def channel(self, times, joint, axis):
+        # One joint's rotation about one axis, (frames,) in degrees, the same
+        # values as rotations without working out the other joints
+        times = np.asarray(times, dtype=np.float64)
+        values = np.full(len(times), self.offset[joint, axis])
+
+        for octave in range(len(self.amplitude)):
+            values += self.amplitude[octave, joint, axis] * np.sin(times * self.frequency[octave, joint, axis] + self.phase[octave, joint, axis])
+
+        return values
+
+    def rootTranslations(self, times):
+        times = np.asarray(times, dtype=np.float64)
+
+        return np.stack((np.sin(times * 0.05) * 5.0, np.zeros_like(times), times * self.speed), axis=-1)
+
+
+class ProceduralCurve(object):
+    # A curve keyed at keyTimes whose key values come from channel, a function
+    # of times, when they are asked for. Linear between keys and flat outside
+    # them like curveSampler.FakeCurve, only the keys around the asked times
+    # are worked out
+
+    def __init__(self, channel, keyTimes):
+        self.channel = channel
+        self.keyTimes = keyTimes
+
+    def evaluate(self, times):
+        times = np.asarray(times, dtype=np.float64)
+        if not len(times):
+            return np.zeros(0)
+
+        first = max(np.searchsorted(self.keyTimes, times.min(), 'right') - 1, 0)
+        last = min(np.searchsorted(self.keyTimes, times.max(), 'left') + 1, len(self.keyTimes))
+        keyTimes = self.keyTimes[first:last]
+
+        return np.interp(times, keyTimes, self.channel(keyTimes))
+
+    def keys(self):
+        return self.keyTimes, self.channel(self.keyTimes)
+
+
+class FakeScene(object):
+    # A source and its targets as curves and static values, and a store for
+    # the transferred keys. The source is keyed every keyStep frames, 1 is a
+    # baked clip, larger steps stand in for hand-keyed ones. Key values are
+    # worked out from the animation when the transfer samples them, so only
+    # the key times and what the transfer writes are kept
+
+    def __init__(self, source, targets, animation, frames, keyStep=1):
+        self.source = source
+        self.targets = list(targets)
+        self.times = np.arange(frames)
+        keyTimes = np.union1d(self.times[::keyStep], self.times[-1:]).astype(np.float64)
+
+        self.curves = curveSampler.FakeCurveSet()
+        self.store = keyWriter.FakeCurveStore()
+
+        for skeleton in [source] + self.targets:
+            setStatic(self.curves, skeleton)
+
+        for j, name in enumerate(source.names):
+            for c, attribute in enumerate(curveSampler.rotateAttributes):
+                self.curves.setCurve(name, attribute, ProceduralCurve(lambda times, j=j, c=c: animation.channel(times, j, c), keyTimes))
+
+        for c, attribute in enumerate(curveSampler.translateAttributes):
+            self.curves.setCurve(source.names[0], attribute,
+                                 ProceduralCurve(lambda times, c=c: animation.rootTranslations(times)[:, c], keyTimes))
+
+
+def setStatic(curves, skeleton):
+    for j, name in enumerate(skeleton.names):
+        for c in range(3):
+            curves.setValue(name, curveSampler.rotateAttributes[c], skeleton.rotate[j, c])
+            curves.setValue(name, curveSampler.orientAttributes[c], skeleton.orient[j, c])
+            curves.setValue(name, curveSampler.translateAttributes[c], skeleton.translate[j, c])
+
+
+def makeScene(jointCount=50, frames=100, targetCount=1, seed=0, keyStep=1, staticShare=0.0, **skeletonOptions):
+    # Targets share the source hierarchy and names but not orients or bindposes
+    source = makeSkeleton(jointCount, seed=seed, **skeletonOptions)
+    targets = [SyntheticSkeleton(source.parents, source.rotateOrder, prefix='target%d:' % i, seed=seed + 10 + i)
+               for i in range(targetCount)]
+
+    return FakeScene(source, targets, ProceduralAnimation(jointCount, seed=seed, staticShare=staticShare), frames, keyStep)
+
+
+@instrument.timed('loadBindpose')
+def loadBindpose(curves, skeleton):
+    # Same arrays as Skeleton.bindMatrices, read through the curve source at
+    # frame 0 where the source's curves start
+    rotate = curveSampler.sampleChannels(curves, skeleton.names, curveSampler.rotateAttributes, [0])[0]
+    orient = curveSampler.sampleChannels(curves, skeleton.names, curveSampler.orientAttributes, [0])[0]
+
+    rotateMat = euler.eulerToMatrix(rotate, skeleton.rotateOrder, 4).astype(np.float32)
+    orientMat = euler.eulerToMatrix(orient, 0, 4).astype(np.float32)
+    parentMat = hierarchy.parentMatrices(np.matmul(rotateMat, orientMat), skeleton.parents)
+
+    return rotateMat[1:], orientMat[1:], parentMat[1:]
+
+
+def loadBinds(scene, mappingMethod='auto', mapFile=None):
+    # Source bind, mapped target binds and what the targets are keyed through,
+    # like the scripts build them before sampling
+    source = scene.source
+    sBindposeRot, sKeyOrient, sParentMat = loadBindpose(scene.curves, source)
+    sourceBind = SourceBind(sKeyOrient, sBindposeRot, sParentMat)
+
+    targetBinds = []
+    sourceIndices = []
+    targetNames = []
+    rotateOrders = []
+    for target in scene.targets:
+        with instrument.phase('jointMapping'):
+            sourceIndex, targetIndex = jointMapping.withoutRoot(*jointMapping.buildMapping(
+                source.names, source.parents, target.names, target.parents, mappingMethod, mapFile))
+
+        tBindposeRot, tKeyOrient, tParentMat = loadBindpose(scene.curves, target)
+        targetBinds.append(TargetBind(tKeyOrient[targetIndex], tBindposeRot[targetIndex], tParentMat[targetIndex]))
+        sourceIndices.append(sourceIndex)
+        targetNames.append([target.names[j + 1] for j in targetIndex])
+        rotateOrders.append(target.rotateOrder[targetIndex + 1])
+
+    return sourceBind, targetBinds, sourceIndices, targetNames, rotateOrders, [target.names[0] for target in scene.targets]
+
+
+def transferScene(scene, mappingMethod='auto', mapFile=None, memoryBudget=None, times=None, **parallelOptions):
+    # The NumPy script's transferData on a fake scene, a window of frames at a
+    # time when there is a memory budget in bytes. Every frame unless times are given
+    times = scene.times if times is None else times
+    sourceBind, targetBinds, sourceIndices, targetNames, rotateOrders, targetRoots = loadBinds(scene, mappingMethod, mapFile)
+
+    cache = batchTransfer.BatchCache(sourceBind, targetBinds, sourceIndices)
+    streaming.streamTransfer(scene.curves, scene.store, scene.source.names, scene.source.rotateOrder[1:], cache,
+                             targetNames, rotateOrders, targetRoots, times, memoryBudget, **parallelOptions)
+
+    return scene.store
+
+
+def transferSceneIncremental(scene, state, mappingMethod='auto', mapFile=None):
+    # Reruns on the same state only redo what changed in the source curves
+    return incremental.transferIncremental(state, scene.curves, scene.store, scene.source.names, scene.source.parents,
+                                           scene.source.rotateOrder[1:], lambda: loadBinds(scene, mappingMethod, mapFile),
+                                           scene.times)
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Tests run on the fakes that stand in for Maya, from the repo root with
+# python -m pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def fakeMaya(monkeypatch):
+    # The fake Maya API in sys.modules, for MayaCurveStore and the scripts
+    import fakeMaya
+
+    return fakeMaya.install(monkeypatch)
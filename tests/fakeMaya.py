@@ -0,0 +1,183 @@
+import sys
+import types
+
+import numpy as np
+
+# Just enough of maya.api.OpenMaya, maya.api.OpenMayaAnim and maya.cmds for
+# keyWriter.MayaCurveStore, keyed the way Maya keys: addKeys merges into the
+# curve when asked to keep the existing keys, replacing keys at the same
+# times, and cutKey -clear deletes the emptied curves. Rotations are stored in
+# radians, translations in centimeters with the UI unit set to centimeters.
+
+
+class Plug(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+class MSelectionList(object):
+
+    def __init__(self):
+        self.names = []
+
+    def add(self, name):
+        self.names.append(name)
+
+    def getPlug(self, index):
+        return Plug(self.names[index])
+
+
+class MTime(object):
+    kFilm = 6
+
+    def __init__(self, value=0.0, unit=kFilm):
+        self.value = value
+        self.unit = unit
+
+    @staticmethod
+    def uiUnit():
+        return MTime.kFilm
+
+
+class MTimeArray(list):
+    pass
+
+
+class MDoubleArray(list):
+    pass
+
+
+class MDistance(object):
+    kCentimeters = 2
+
+    def __init__(self, value=0.0, unit=kCentimeters):
+        self.value = value
+
+    @staticmethod
+    def uiUnit():
+        return MDistance.kCentimeters
+
+    def asCentimeters(self):
+        return self.value
+
+
+class AnimCurve(object):
+
+    def __init__(self, curveType):
+        self.curveType = curveType
+        self.times = []
+        self.values = []
+        self.slopes = []
+
+
+class MAnimUtil(object):
+    curves = {}
+
+    @staticmethod
+    def findAnimation(plug):
+        curve = MAnimUtil.curves.get(plug.name)
+        return [curve] if curve is not None else []
+
+
+class MFnAnimCurve(object):
+    kAnimCurveTA = 0
+    kAnimCurveTL = 1
+    kTangentGlobal = 0
+    kTangentFixed = 1
+    kTangentLinear = 2
+
+    def __init__(self, curve=None):
+        self.curve = curve
+
+    def timedAnimCurveTypeForPlug(self, plug):
+        return self.kAnimCurveTA if '.rotate' in plug.name else self.kAnimCurveTL
+
+    def create(self, plug, curveType):
+        self.curve = MAnimUtil.curves[plug.name] = AnimCurve(curveType)
+
+    @property
+    def animCurveType(self):
+        return self.curve.curveType
+
+    @property
+    def numKeys(self):
+        return len(self.curve.times)
+
+    def addKeys(self, times, values, tangentInType, tangentOutType, keepExistingKeys=False):
+        keys = {}
+        if keepExistingKeys:
+            keys = dict((t, (value, slope)) for t, value, slope in zip(self.curve.times, self.curve.values, self.curve.slopes))
+        for time, value in zip(times, values):
+            keys[time.value] = (value, np.nan)
+
+        self.curve.times = sorted(keys)
+        self.curve.values = [keys[t][0] for t in self.curve.times]
+        self.curve.slopes = [keys[t][1] for t in self.curve.times]
+
+    def find(self, time):
+        if time.value in self.curve.times:
+            return self.curve.times.index(time.value)
+        return None
+
+    def remove(self, index):
+        for keys in (self.curve.times, self.curve.values, self.curve.slopes):
+            del keys[index]
+
+    def setTangent(self, index, x, y, inTangent):
+        self.curve.slopes[index] = y / x
+
+
+def cutKey(nodes, attribute=(), clear=False):
+    for node in nodes:
+        for name in attribute:
+            MAnimUtil.curves.pop(node + '.' + name, None)
+
+
+def keys(node, attribute):
+    # A channel's (times, values) in UI units like FakeCurveStore.keys
+    curve = MAnimUtil.curves[node + '.' + attribute]
+    values = np.array(curve.values, dtype=np.float64)
+    if curve.curveType == MFnAnimCurve.kAnimCurveTA:
+        values = np.degrees(values)
+
+    return np.array(curve.times, dtype=np.float64), values
+
+
+def slopes(node, attribute):
+    return np.array(MAnimUtil.curves[node + '.' + attribute].slopes, dtype=np.float64)
+
+
+def channels():
+    return set(tuple(name.split('.', 1)) for name in MAnimUtil.curves)
+
+
+def modules():
+    # The module objects to put in sys.modules, the package attributes linked
+    # so import maya.api.OpenMaya as om finds them either way
+    maya = types.ModuleType('maya')
+    api = types.ModuleType('maya.api')
+    om = types.ModuleType('maya.api.OpenMaya')
+    oma = types.ModuleType('maya.api.OpenMayaAnim')
+    cmds = types.ModuleType('maya.cmds')
+
+    for cls in (MSelectionList, MTime, MTimeArray, MDoubleArray, MDistance):
+        setattr(om, cls.__name__, cls)
+    oma.MAnimUtil = MAnimUtil
+    oma.MFnAnimCurve = MFnAnimCurve
+    cmds.cutKey = cutKey
+
+    maya.api = api
+    maya.cmds = cmds
+    api.OpenMaya = om
+    api.OpenMayaAnim = oma
+
+    return {'maya': maya, 'maya.api': api, 'maya.api.OpenMaya': om, 'maya.api.OpenMayaAnim': oma, 'maya.cmds': cmds}
+
+
+def install(monkeypatch):
+    MAnimUtil.curves = {}
+    for name, module in modules().items():
+        monkeypatch.setitem(sys.modules, name, module)
+
+    return sys.modules[__name__]
@@ -0,0 +1,19 @@
+import os
+
+from TransferCore import benchmark
+
+timerFile = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'C++ API', 'C++Medium.txt')
+
+
+def testTimerFileBaseline(tmp_path):
+    # The old text files compare against every result of a scene run
+    times = benchmark.readTimerFile(timerFile)
+    median = benchmark.summarize(times)['median']
+    results = benchmark.runScene('NumPy', lambda: None, repeats=3, warmups=0)
+    results['results'][0]['stats']['median'] = median * 2.0
+
+    regressions = benchmark.saveResults(results, str(tmp_path / 'result.json'), timerFile)
+    assert len(regressions) == 1 and regressions[0]['ratio'] == 2.0
+
+    results['results'][0]['stats']['median'] = median
+    assert benchmark.saveResults(results, str(tmp_path / 'result.json'), timerFile) == []
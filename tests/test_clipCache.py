@@ -0,0 +1,55 @@
+import numpy as np
+
+from TransferCore import clipCache, incremental, keyWriter, synthetic
+from test_streaming import transfer
+
+# A cached result replays into the same curves, one write per channel
+
+
+def curves(fakeMaya):
+    return dict((channel, fakeMaya.keys(*channel)) for channel in fakeMaya.channels())
+
+
+def assertSameCurves(a, b):
+    assert set(a) == set(b)
+    for channel in a:
+        np.testing.assert_array_equal(a[channel][0], b[channel][0])
+        np.testing.assert_allclose(a[channel][1], b[channel][1])
+
+
+def testStreamReplay(fakeMaya, tmp_path):
+    scene = synthetic.makeScene(jointCount=12, frames=80, seed=5, staticShare=0.3)
+    cache = clipCache.ClipCache(str(tmp_path))
+    options = dict(memoryBudget=32768, staticTolerance=1e-3, keyTolerance=0.5, keyInterpolation='bezier', resultCache=cache)
+
+    result = transfer(scene, keyWriter.MayaCurveStore(), **options)
+    assert result['windows'] > 1 and 'cached' not in result
+    written = curves(fakeMaya)
+
+    # Stale keys on the targets go, every channel is keyed in one call
+    names = scene.targets[0].names[1:]
+    store = keyWriter.MayaCurveStore()
+    keyWriter.writeRotations(store, names, [500.0], np.zeros((1, len(names), 3)))
+    store.calls = 0
+    replayed = transfer(scene, store, **options)
+    assert replayed == dict(result, cached=True)
+    assert store.calls == len(written)
+    assertSameCurves(curves(fakeMaya), written)
+
+
+def testIncrementalReplay(fakeMaya, tmp_path):
+    scene = synthetic.makeScene(jointCount=10, frames=50, keyStep=5, seed=1)
+    cache = clipCache.ClipCache(str(tmp_path))
+    state = incremental.TransferState()
+    store = keyWriter.MayaCurveStore()
+    incremental.transferIncremental(state, scene.curves, store, scene.source.names, scene.source.parents,
+                                    scene.source.rotateOrder[1:], lambda: synthetic.loadBinds(scene), scene.times, cache)
+    written = curves(fakeMaya)
+
+    replayState = incremental.TransferState()
+    result = incremental.transferIncremental(replayState, scene.curves, keyWriter.MayaCurveStore(), scene.source.names,
+                                             scene.source.parents, scene.source.rotateOrder[1:],
+                                             lambda: synthetic.loadBinds(scene), scene.times, cache)
+    assert result['cached']
+    assertSameCurves(curves(fakeMaya), written)
+    np.testing.assert_array_equal(replayState.world, state.world)
@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+from TransferCore import commandPort
+
+# Jobs spread over several fake sessions come back in job order
+
+
+def handler(command):
+    # The timings query gets JSON back, like Maya, every other command nothing
+    if 'summary' in command:
+        return json.dumps({'replies': 1})
+
+    return ''
+
+
+def testDispatch():
+    scenes = ['scene%d.mb' % i for i in range(6)]
+    jobs = [commandPort.transferJob(scene, ['sourceRoot', 'targetRoot'], 'NumPy_AnimTransfer') for scene in scenes]
+
+    async def run():
+        async with commandPort.FakeCommandPort(handler, delay=0.01) as first, commandPort.FakeCommandPort(handler, delay=0.01) as second:
+            replies = await commandPort.dispatch(jobs, [(first.host, first.port), (second.host, second.port)], connections=2)
+            return replies, [first, second]
+
+    replies, ports = asyncio.run(run())
+
+    assert [commandPort.timings(reply) for reply in replies] == [{'replies': 1}] * len(jobs)
+    assert all(port.connections == 2 for port in ports)
+
+    # Every job ran in order on one connection of one session
+    ran = []
+    for port in ports:
+        perConnection = {}
+        for connection, command in port.commands:
+            perConnection.setdefault(connection, []).append(command)
+        for commands in perConnection.values():
+            for start in range(0, len(commands), len(jobs[0])):
+                ran.append(commands[start:start + len(jobs[0])])
+    assert sorted(ran) == sorted(jobs)
+    assert 'doTest' in jobs[0][3]
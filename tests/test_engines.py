@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from TransferCore import keyWriter, synthetic
+from test_streaming import transfer
+
+# Every engine and kernel precision keys the curves the matrix engine keys, to
+# the float32 the matrix engine retargets in
+
+
+@pytest.fixture(scope='module')
+def scene():
+    return synthetic.makeScene(jointCount=20, frames=50, targetCount=2, seed=8, rotateOrder='random')
+
+
+@pytest.fixture(scope='module')
+def reference(scene):
+    store = keyWriter.FakeCurveStore()
+    transfer(scene, store)
+
+    return store
+
+
+@pytest.mark.parametrize('options', [{'engine': 'scipy'}, {'engine': 'quaternion'}, {'precision': 'float32'},
+                                     {'precision': 'float64'}, {'engine': 'quaternion', 'memoryBudget': 8192}])
+def testEnginesAgree(scene, reference, options):
+    store = keyWriter.FakeCurveStore()
+    transfer(scene, store, **options)
+
+    assert set(store.curves) == set(reference.curves)
+    for channel in reference.curves:
+        np.testing.assert_array_equal(store.keys(*channel)[0], reference.keys(*channel)[0])
+        np.testing.assert_allclose(store.keys(*channel)[1], reference.keys(*channel)[1], atol=1e-3)
@@ -0,0 +1,85 @@
+import numpy as np
+
+from TransferCore import incremental, keyWriter, samplingPlan, synthetic
+
+# Reruns that only redo what changed key the same curves as a fresh transfer
+
+
+def transfer(scene, state, store):
+    times = samplingPlan.planTimes(scene.curves, scene.source.names).times
+
+    return incremental.transferIncremental(state, scene.curves, store, scene.source.names, scene.source.parents,
+                                           scene.source.rotateOrder[1:], lambda: synthetic.loadBinds(scene), times)
+
+
+def assertFresh(scene, fakeMaya):
+    fresh = keyWriter.FakeCurveStore()
+    transfer(scene, incremental.TransferState(), fresh)
+
+    assert fakeMaya.channels() == set(fresh.curves)
+    for node, attribute in fresh.curves:
+        times, values = fakeMaya.keys(node, attribute)
+        np.testing.assert_array_equal(times, fresh.keys(node, attribute)[0])
+        np.testing.assert_allclose(values, fresh.keys(node, attribute)[1], atol=1e-6)
+
+
+def setKey(scene, node, attribute, time, value):
+    times, values = scene.curves.curve(node, attribute).keys()
+    keep = times != time
+    times, values = np.append(times[keep], time), np.append(values[keep], value)
+    order = np.argsort(times)
+    scene.curves.addCurve(node, attribute, times[order], values[order])
+
+
+def testRerunKeepsUnchangedKeys(fakeMaya):
+    scene = synthetic.makeScene(jointCount=15, frames=100, keyStep=10, seed=2)
+    state = incremental.TransferState()
+    store = keyWriter.MayaCurveStore()
+    assert transfer(scene, state, store)['full']
+
+    setKey(scene, scene.source.names[4], 'rotateY', 40.0, 60.0)
+    result = transfer(scene, state, store)
+    assert not result['full'] and 0 < result['frames'] < 100
+    assertFresh(scene, fakeMaya)
+
+    # Only the root's curves change
+    setKey(scene, scene.source.names[0], 'translateX', 70.0, 5.0)
+    transfer(scene, state, store)
+    assertFresh(scene, fakeMaya)
+
+
+def testFullTransferReplacesOldKeys(fakeMaya):
+    scene = synthetic.makeScene(jointCount=10, frames=50, keyStep=5, seed=1)
+    store = keyWriter.MayaCurveStore()
+    keyWriter.writeRotations(store, scene.targets[0].names[1:], [500.0], np.zeros((1, len(scene.targets[0].names) - 1, 3)))
+
+    transfer(scene, incremental.TransferState(), store)
+    assertFresh(scene, fakeMaya)
+
+
+def testRetime(fakeMaya):
+    scene = synthetic.makeScene(jointCount=15, frames=100, keyStep=10, seed=4)
+    state = incremental.TransferState()
+    store = keyWriter.MayaCurveStore()
+    transfer(scene, state, store)
+
+    # A key between the sampled times
+    name = scene.source.names[6]
+    setKey(scene, name, 'rotateX', 35.5, scene.curves.curve(name, 'rotateX').evaluate([35.5])[0] + 10.0)
+    assert not transfer(scene, state, store)['full']
+    assertFresh(scene, fakeMaya)
+
+    # The key moved
+    times, values = scene.curves.curve(name, 'rotateX').keys()
+    times = np.where(times == 35.5, 45.5, times)
+    scene.curves.addCurve(name, 'rotateX', times, values)
+    transfer(scene, state, store)
+    assertFresh(scene, fakeMaya)
+
+    # A time no channel keys any more
+    for (node, attribute), curve in list(scene.curves.curves.items()):
+        times, values = curve.keys()
+        scene.curves.addCurve(node, attribute, times[times != 60.0], values[times != 60.0])
+    transfer(scene, state, store)
+    assert 60.0 not in fakeMaya.keys(scene.targets[0].names[1], 'rotateX')[0]
+    assertFresh(scene, fakeMaya)
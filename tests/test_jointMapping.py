@@ -0,0 +1,27 @@
+import json
+
+import numpy as np
+
+from TransferCore import jointMapping
+
+sourceNames = ['hips', 'spine', 'armL', 'armR']
+targetNames = ['Hips', 'Spine', 'LeftArm', 'RightArm']
+parents = [-1, 0, 1, 1]
+
+
+def testEditedMapFile(tmp_path):
+    # The same path with other contents is a new mapping, in memory and on disk
+    mapFile = str(tmp_path / 'map.json')
+    directory = str(tmp_path / 'mappings')
+    with open(mapFile, 'w') as f:
+        json.dump({'hips': 'Hips', 'armL': 'LeftArm'}, f)
+    cache = jointMapping.MappingCache(directory)
+    first = jointMapping.buildMapping(sourceNames, parents, targetNames, parents, 'file', mapFile, cache=cache)
+    np.testing.assert_array_equal(first[0], [0, 2])
+
+    with open(mapFile, 'w') as f:
+        json.dump({'hips': 'Hips', 'armL': 'RightArm', 'armR': 'LeftArm'}, f)
+    for cache in (cache, jointMapping.MappingCache(directory)):
+        sourceIndex, targetIndex = jointMapping.buildMapping(sourceNames, parents, targetNames, parents, 'file', mapFile,
+                                                             cache=cache)
+        assert dict(zip(sourceIndex.tolist(), targetIndex.tolist())) == {0: 0, 2: 3, 3: 2}
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from TransferCore import keyWriter
+
+# Both stores must key the same way, the fake stands in for Maya everywhere
+# else in the tests
+
+
+@pytest.fixture(params=['fake', 'maya'])
+def store(request):
+    # (store, keys) where keys reads a channel back as (times, values)
+    if request.param == 'fake':
+        fake = keyWriter.FakeCurveStore()
+        return fake, fake.keys
+
+    fakeMaya = request.getfixturevalue('fakeMaya')
+    return keyWriter.MayaCurveStore(), fakeMaya.keys
+
+
+def assertKeys(keys, node, attribute, times, values):
+    keyTimes, keyValues = keys(node, attribute)
+    np.testing.assert_array_equal(keyTimes, times)
+    np.testing.assert_allclose(keyValues, values)
+
+
+def testSetKeysMerges(store):
+    store, keys = store
+    store.setKeys('joint1', 'rotateX', [0, 1, 2, 3], [10.0, 11.0, 12.0, 13.0])
+    store.setKeys('joint1', 'rotateX', [2, 3, 4], [22.0, 23.0, 24.0])
+
+    assertKeys(keys, 'joint1', 'rotateX', [0, 1, 2, 3, 4], [10.0, 11.0, 22.0, 23.0, 24.0])
+
+
+def testSetKeysBetweenKeys(store):
+    store, keys = store
+    store.setKeys('joint1', 'translateY', [0, 4], [1.0, 5.0])
+    store.setKeys('joint1', 'translateY', [2], [3.0])
+
+    assertKeys(keys, 'joint1', 'translateY', [0, 2, 4], [1.0, 3.0, 5.0])
+
+
+def testRemoveKeys(store):
+    store, keys = store
+    store.setKeys('joint1', 'rotateY', [0, 1, 2], [1.0, 2.0, 3.0])
+    keyWriter.removeChannels(store, 'joint1', ['rotateY', 'rotateZ'], [1, 5])
+
+    assertKeys(keys, 'joint1', 'rotateY', [0, 2], [1.0, 3.0])
+
+
+def testClearTargets(store):
+    store, keys = store
+    for node in ('root', 'joint1', 'joint2'):
+        keyWriter.writeChannels(store, node, keyWriter.rotateAttributes + keyWriter.translateAttributes, [0, 1],
+                                np.ones((2, 6)))
+    keyWriter.clearTargets(store, [['joint1']], ['root'])
+    keyWriter.writeRotations(store, ['joint1'], [5], np.full((1, 1, 3), 2.0))
+
+    assertKeys(keys, 'joint1', 'rotateX', [5], [2.0])
+    assertKeys(keys, 'joint1', 'translateX', [0, 1], [1.0, 1.0])
+    assertKeys(keys, 'joint2', 'rotateZ', [0, 1], [1.0, 1.0])
+    with pytest.raises(KeyError):
+        keys('root', 'translateZ')
+
+
+def testSlopes(fakeMaya):
+    fake = keyWriter.FakeCurveStore()
+    maya = keyWriter.MayaCurveStore()
+    for store in (fake, maya):
+        store.setKeys('joint1', 'rotateX', [0, 1, 2], [0.0, 1.0, 2.0], 'bezier', [1.0, 1.0, 1.0])
+        store.setKeys('joint1', 'rotateX', [1, 3], [5.0, 6.0], 'bezier', [2.0, 3.0])
+        store.setKeys('joint1', 'rotateX', [4], [7.0])
+
+    np.testing.assert_array_equal(fake.keys('joint1', 'rotateX')[0], fakeMaya.keys('joint1', 'rotateX')[0])
+    np.testing.assert_allclose(fake.slopes[('joint1', 'rotateX')], fakeMaya.slopes('joint1', 'rotateX'))
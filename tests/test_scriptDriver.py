@@ -0,0 +1,60 @@
+import types
+
+import numpy as np
+import pytest
+
+from TransferCore import backends, scriptDriver, synthetic
+
+# The NumPy and SciPy scripts run the shared driver with their own settings,
+# here on a fake scene with the Maya edges swapped out
+
+
+class Root(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+    def getOrientation(self):
+        return None
+
+    def setOrientation(self, orientation):
+        pass
+
+
+@pytest.fixture
+def scene(fakeMaya, monkeypatch):
+    scene = synthetic.makeScene(jointCount=12, frames=40, targetCount=2, seed=6)
+    skeletons = dict((skeleton.names[0], skeleton) for skeleton in [scene.source] + scene.targets)
+
+    monkeypatch.setattr(scriptDriver, 'transferStates', {})
+    monkeypatch.setattr(scriptDriver, 'pm', types.SimpleNamespace(currentTime=lambda time: None))
+    monkeypatch.setattr(scriptDriver, 'loadSkeletons', lambda sRoot, tRoots: (skeletons[str(sRoot)], [skeletons[str(tRoot)] for tRoot in tRoots]))
+    monkeypatch.setattr(scriptDriver, 'sampleTimes', lambda settings, sRoot, sourceNames: scene.times)
+    monkeypatch.setattr(scriptDriver, 'loadCurveSource', lambda settings, sourceNames, times: scene.curves)
+
+    return scene
+
+
+@pytest.mark.parametrize('folder, module', [('NumPy', 'NumPy_AnimTransfer'), ('SciPy', 'AnimationTransfer_SciPy')])
+def testScripts(scene, fakeMaya, monkeypatch, folder, module):
+    script = backends.loadScript(folder, module)
+    monkeypatch.setattr(script, 'staticTolerance', None)
+    sRoot, tRoots = Root(scene.source.names[0]), [Root(target.names[0]) for target in scene.targets]
+
+    assert script.transferData(sRoot, tRoots)['windows'] == 1
+    whole = dict((channel, fakeMaya.keys(*channel)) for channel in fakeMaya.channels())
+
+    monkeypatch.setattr(script, 'memoryBudget', 8192)
+    assert script.transferData(sRoot, tRoots)['windows'] > 1
+    assert fakeMaya.channels() == set(whole)
+    for channel in whole:
+        times, values = fakeMaya.keys(*channel)
+        np.testing.assert_array_equal(times, whole[channel][0])
+        np.testing.assert_allclose(values, whole[channel][1], atol=1e-3)
+
+    # The first incremental run transfers everything, a rerun with nothing changed rekeys nothing
+    assert script.transferIncremental(sRoot, tRoots)['full']
+    assert script.transferIncremental(sRoot, tRoots)['frames'] == 0
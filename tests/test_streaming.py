@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from TransferCore import batchTransfer, curveReduction, keyWriter, streaming, synthetic
+
+# A clip streamed over several windows keys the same curves as one window
+
+
+def transfer(scene, store, **options):
+    sourceBind, targetBinds, sourceIndices, targetNames, rotateOrders, targetRoots = synthetic.loadBinds(scene)
+    cache = batchTransfer.BatchCache(sourceBind, targetBinds, sourceIndices)
+
+    return streaming.streamTransfer(scene.curves, store, scene.source.names, scene.source.rotateOrder[1:], cache,
+                                    targetNames, rotateOrders, targetRoots, scene.times, **options)
+
+
+def channels(scene):
+    for target in scene.targets:
+        for name in target.names[1:]:
+            for attribute in keyWriter.rotateAttributes:
+                yield name, attribute
+        for attribute in keyWriter.rotateAttributes + keyWriter.translateAttributes:
+            yield target.names[0], attribute
+
+
+@pytest.mark.parametrize('options', [{}, {'precision': 'float32'}, {'engine': 'quaternion'}])
+def testWindowsMatchOneWindow(fakeMaya, options):
+    scene = synthetic.makeScene(jointCount=12, frames=60, targetCount=2, seed=3)
+    whole = keyWriter.FakeCurveStore()
+    assert transfer(scene, whole, **options)['windows'] == 1
+
+    # Keys from an earlier transfer are replaced, not merged with
+    store = keyWriter.MayaCurveStore()
+    names = scene.targets[0].names[1:]
+    keyWriter.writeRotations(store, names, [100.0], np.zeros((1, len(names), 3)))
+    assert transfer(scene, store, memoryBudget=4096, **options)['windows'] > 1
+
+    for node, attribute in channels(scene):
+        times, values = fakeMaya.keys(node, attribute)
+        np.testing.assert_array_equal(times, whole.keys(node, attribute)[0])
+        np.testing.assert_allclose(values, whole.keys(node, attribute)[1], atol=1e-3)
+
+
+@pytest.mark.parametrize('interpolation', ['linear', 'bezier'])
+def testReducedWindows(fakeMaya, interpolation):
+    scene = synthetic.makeScene(jointCount=12, frames=80, seed=5)
+    whole = keyWriter.FakeCurveStore()
+    transfer(scene, whole)
+
+    tolerance = 0.5
+    assert transfer(scene, keyWriter.MayaCurveStore(), memoryBudget=32768, keyTolerance=tolerance,
+                    keyInterpolation=interpolation)['windows'] > 1
+
+    dropped = 0
+    for node, attribute in channels(scene):
+        keyTimes, keyValues = fakeMaya.keys(node, attribute)
+        keySlopes = fakeMaya.slopes(node, attribute) if interpolation == 'bezier' else None
+        times, values = whole.keys(node, attribute)
+        np.testing.assert_allclose(curveReduction.evaluate(times, keyTimes, keyValues, keySlopes), values, atol=tolerance + 1e-6)
+        dropped += len(times) - len(keyTimes)
+    assert dropped > 0